@@ -0,0 +1,21 @@
+"""
+Lets main.py save the keymap to the CIRCUITPY drive (config/store.py).
+
+CircuitPython only lets code write to the drive while the computer can't, so
+it is remounted for the firmware unless the encoder button is held while
+plugging the macropad in, which keeps the drive editable over USB.
+"""
+
+import board
+import digitalio
+import storage
+
+button = digitalio.DigitalInOut(board.D8)
+button.direction = digitalio.Direction.INPUT
+button.pull = digitalio.Pull.UP
+
+# Pressed reads low
+if button.value:
+    storage.remount("/", readonly=False)
+
+button.deinit()
@@ -0,0 +1,22 @@
+"""
+Key names that travel as a single byte in binary frames (see protocol.py).
+
+The index of a name is its wire ID, so entries may only ever be appended;
+Software/GUI/FrameProtocol.py carries the same table. Names not listed here
+are sent escaped, spelled out in full.
+"""
+
+KEY_NAMES = (
+    "NO", "TRNS",
+    "A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M",
+    "N", "O", "P", "Q", "R", "S", "T", "U", "V", "W", "X", "Y", "Z",
+    "1", "2", "3", "4", "5", "6", "7", "8", "9", "0",
+    "ENTER", "ESC", "BACKSPACE", "TAB", "SPACE", "MINUS", "EQUAL",
+    "LBRC", "RBRC", "BSLS", "SCLN", "QUOT", "GRV", "COMM", "DOT", "SLSH",
+    "CAPS", "F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9", "F10",
+    "F11", "F12", "PSCR", "SLCK", "PAUS", "INS", "HOME", "PGUP", "DELETE",
+    "END", "PGDN", "RIGHT", "LEFT", "DOWN", "UP",
+    "LCTL", "LSFT", "LALT", "LGUI", "RCTL", "RSFT", "RALT", "RGUI",
+    "CTRL", "SHIFT", "ALT", "CMD",
+    "MUTE", "VOLU", "VOLD", "MNXT", "MPRV", "MPLY", "MSTP",
+)  # fmt: skip
@@ -0,0 +1,77 @@
+"""
+Resolves the key names the GUI sends to KMK keys.
+
+`KC.X` goes through `KeyAttrDict`, which scans its cache partitions and, for a
+key that doesn't exist yet, tries every function in `KEY_GENERATORS` until one
+recognises the name. Here the name is binary searched in the sorted table of
+comms/keytable.py instead, which also says which generator makes the key, and
+the key is kept in a slot of that table so looking it up again costs a search
+and a list index, without allocating. `KC` is given the same table to pick
+generators with, so `KC.X` skips the generators that can't make X as well.
+
+Regenerate the table with Software/HostShim/gen_keytable.py whenever keys are
+added to kmk/keys.py or the modules used by main.py.
+"""
+
+from kmk.keys import KC, KEY_GENERATORS
+
+from comms.keytable import GENERATOR_COUNT, GENERATORS, NAMES
+
+# Keys registered by modules and extensions rather than a generator
+FROM_KC = 0xFF
+
+_keys = [None] * len(NAMES)
+# A table generated against other KMK sources can't use the generator indices
+_generators_match = GENERATOR_COUNT == len(KEY_GENERATORS)
+
+
+def find(name):
+    """Index of `name` in the table, or -1"""
+    names = NAMES
+    lo = 0
+    hi = len(names)
+    while lo < hi:
+        mid = (lo + hi) >> 1
+        if names[mid] < name:
+            lo = mid + 1
+        else:
+            hi = mid
+    if lo < len(names) and names[lo] == name:
+        return lo
+    return -1
+
+
+def resolve_key(name):
+    """The key called `name` ("A", not "KC.A"), or None if it isn't in the table"""
+    idx = find(name)
+    if idx < 0:
+        return None
+
+    key = _keys[idx]
+    if key is None:
+        # Created the first time it's needed, unless someone already did
+        key = KC.get_cached(name)
+        if key is None:
+            generator = GENERATORS[idx]
+            if generator == FROM_KC:
+                # The module that makes this key isn't loaded
+                return None
+            if _generators_match:
+                key = KEY_GENERATORS[generator](name)
+            else:
+                key = KC.get(name)
+        _keys[idx] = key
+    return key
+
+
+def generator_for(name):
+    """Index into KEY_GENERATORS of the generator making `name`, -1 for none"""
+    if not _generators_match:
+        return None
+    idx = find(name)
+    if idx < 0 or GENERATORS[idx] == FROM_KC:
+        return -1
+    return GENERATORS[idx]
+
+
+KC.set_generator_index(generator_for)
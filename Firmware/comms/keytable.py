@@ -0,0 +1,109 @@
+"""
+Sorted KMK key names for comms/keylookup.py.
+
+Generated by Software/HostShim/gen_keytable.py, do not edit. Freeze it into
+the firmware or compile it with mpy-cross so the tables stay in flash.
+"""
+
+# len(kmk.keys.KEY_GENERATORS) when this was generated
+GENERATOR_COUNT = 12
+
+NAMES = (
+    "\t", "\n", " ", "!", "\"", "#", "$", "%",
+    "&", "'", "(", ")", "*", "+", ",", "-",
+    ".", "/", "0", "1", "2", "3", "4", "5",
+    "6", "7", "8", "9", ":", ";", "<", "=",
+    ">", "?", "@", "A", "AMPERSAND", "AMPR", "ANY", "ASTERISK",
+    "ASTR", "AT", "AUDIO_MUTE", "AUDIO_VOL_DOWN", "AUDIO_VOL_UP", "B", "BACKSLASH", "BACKSPACE",
+    "BKDL", "BKSP", "BLE_DISCONNECT", "BLE_REFRESH", "BOOTLOADER", "BRID", "BRIGHTNESS_DOWN", "BRIGHTNESS_UP",
+    "BRIU", "BRK", "BSLASH", "BSLS", "BSPACE", "BSPC", "C", "CAPS",
+    "CAPSLOCK", "CAPS_LOCK", "CIRC", "CIRCUMFLEX", "CLCK", "COLN", "COLON", "COMM",
+    "COMMA", "D", "DEL", "DELETE", "DLR", "DOLLAR", "DOT", "DOUBLE_QUOTE",
+    "DOWN", "DQT", "DQUO", "E", "EJCT", "END", "ENT", "ENTER",
+    "EQL", "EQUAL", "ESC", "ESCAPE", "EXCLAIM", "EXLM", "F", "F1",
+    "F10", "F11", "F12", "F13", "F14", "F15", "F16", "F17",
+    "F18", "F19", "F2", "F20", "F21", "F22", "F23", "F24",
+    "F3", "F4", "F5", "F6", "F7", "F8", "F9", "G",
+    "GESC", "GRAVE", "GRAVE_ESC", "GRV", "H", "HASH", "HID", "HID_SWITCH",
+    "HOME", "HYPER", "HYPR", "I", "INS", "INSERT", "J", "K",
+    "KP_0", "KP_1", "KP_2", "KP_3", "KP_4", "KP_5", "KP_6", "KP_7",
+    "KP_8", "KP_9", "KP_ASTERISK", "KP_COMMA", "KP_DOT", "KP_ENTER", "KP_EQUAL", "KP_EQUAL_AS400",
+    "KP_MINUS", "KP_PLUS", "KP_SLASH", "L", "LABK", "LALT", "LBRACKET", "LBRC",
+    "LCBR", "LCMD", "LCTL", "LCTRL", "LEFT", "LEFT_ALT", "LEFT_ANGLE_BRACKET", "LEFT_CONTROL",
+    "LEFT_CURLY_BRACE", "LEFT_PAREN", "LEFT_SHIFT", "LEFT_SUPER", "LGUI", "LOPT", "LPRN", "LSFT",
+    "LSHIFT", "LWIN", "M", "MEDIA_EJECT", "MEDIA_FAST_FORWARD", "MEDIA_NEXT_TRACK", "MEDIA_PLAY_PAUSE", "MEDIA_PREV_TRACK",
+    "MEDIA_REWIND", "MEDIA_STOP", "MEH", "MFFD", "MINS", "MINUS", "MNXT", "MPLY",
+    "MPRV", "MRWD", "MSTP", "MUTE", "N", "N0", "N1", "N2",
+    "N3", "N4", "N5", "N6", "N7", "N8", "N9", "NLCK",
+    "NO", "NUMLOCK", "NUMPAD_0", "NUMPAD_1", "NUMPAD_2", "NUMPAD_3", "NUMPAD_4", "NUMPAD_5",
+    "NUMPAD_6", "NUMPAD_7", "NUMPAD_8", "NUMPAD_9", "NUMPAD_ASTERISK", "NUMPAD_COMMA", "NUMPAD_DOT", "NUMPAD_ENTER",
+    "NUMPAD_EQUAL", "NUMPAD_EQUAL_AS400", "NUMPAD_MINUS", "NUMPAD_PLUS", "NUMPAD_SLASH", "NUM_LOCK", "O", "OLED_NXT",
+    "OLED_PRV", "OLED_TOG", "P", "P0", "P1", "P2", "P3", "P4",
+    "P5", "P6", "P7", "P8", "P9", "PAST", "PAUS", "PAUSE",
+    "PCMM", "PDOT", "PENT", "PEQL", "PERC", "PERCENT", "PGDN", "PGDOWN",
+    "PGUP", "PIPE", "PLUS", "PMNS", "POUND", "PPLS", "PRINT_SCREEN", "PSCR",
+    "PSCREEN", "PSLS", "Q", "QUES", "QUESTION", "QUOT", "QUOTE", "R",
+    "RABK", "RALT", "RBRACKET", "RBRC", "RCBR", "RCMD", "RCTL", "RCTRL",
+    "RELOAD", "RESET", "RGHT", "RGUI", "RIGHT", "RIGHT_ALT", "RIGHT_ANGLE_BRACKET", "RIGHT_CONTROL",
+    "RIGHT_CURLY_BRACE", "RIGHT_PAREN", "RIGHT_SHIFT", "RIGHT_SUPER", "RLD", "ROPT", "RPRN", "RSFT",
+    "RSHIFT", "RWIN", "S", "SCLN", "SCOLON", "SCROLLLOCK", "SCROLL_LOCK", "SEMICOLON",
+    "SLASH", "SLCK", "SLSH", "SPACE", "SPC", "T", "TAB", "TILD",
+    "TILDE", "TRANSPARENT", "TRNS", "U", "UC_MODE_IBUS", "UC_MODE_MACOS", "UC_MODE_WINC", "UNDERSCORE",
+    "UNDS", "UP", "V", "VOLD", "VOLU", "W", "X", "XXXXXXX",
+    "Y", "Z", "ZKHK", "[", "\\", "]", "^", "_",
+    "`", "a", "b", "c", "d", "e", "f", "g",
+    "h", "i", "j", "k", "l", "m", "n", "o",
+    "p", "q", "r", "s", "t", "u", "v", "w",
+    "x", "y", "z", "{", "|", "}", "~",
+)  # fmt: skip
+
+# Index into KEY_GENERATORS of the function making each key, 0xFF for keys
+# registered by modules and extensions
+GENERATORS = (
+    0x07, 0x07, 0x07, 0x0b, 0x0b, 0x0b, 0x0b, 0x0b,
+    0x0b, 0x07, 0x0b, 0x0b, 0x0b, 0x0b, 0x07, 0x07,
+    0x07, 0x07, 0x02, 0x02, 0x02, 0x02, 0x02, 0x02,
+    0x02, 0x02, 0x02, 0x02, 0x0b, 0x07, 0x0b, 0x07,
+    0x0b, 0x0b, 0x0b, 0x01, 0x0b, 0x0b, 0x03, 0x0b,
+    0x0b, 0x0b, 0xff, 0xff, 0xff, 0x01, 0x07, 0x07,
+    0x04, 0x07, 0x03, 0x03, 0x03, 0xff, 0xff, 0xff,
+    0xff, 0x09, 0x07, 0x07, 0x07, 0x07, 0x01, 0x09,
+    0x09, 0x09, 0x0b, 0x0b, 0x09, 0x0b, 0x0b, 0x07,
+    0x07, 0x01, 0x09, 0x09, 0x0b, 0x0b, 0x07, 0x0b,
+    0x09, 0x0b, 0x0b, 0x01, 0xff, 0x09, 0x07, 0x07,
+    0x07, 0x07, 0x07, 0x07, 0x0b, 0x0b, 0x01, 0x08,
+    0x08, 0x08, 0x08, 0x08, 0x08, 0x08, 0x08, 0x08,
+    0x08, 0x08, 0x08, 0x08, 0x08, 0x08, 0x08, 0x08,
+    0x08, 0x08, 0x08, 0x08, 0x08, 0x08, 0x08, 0x01,
+    0x05, 0x07, 0x05, 0x07, 0x01, 0x0b, 0x03, 0x03,
+    0x09, 0x06, 0x06, 0x01, 0x09, 0x09, 0x01, 0x01,
+    0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a,
+    0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a,
+    0x0a, 0x0a, 0x0a, 0x01, 0x0b, 0x06, 0x07, 0x07,
+    0x0b, 0x06, 0x06, 0x06, 0x09, 0x06, 0x0b, 0x06,
+    0x0b, 0x0b, 0x06, 0x06, 0x06, 0x06, 0x0b, 0x06,
+    0x06, 0x06, 0x01, 0xff, 0xff, 0xff, 0xff, 0xff,
+    0xff, 0xff, 0x06, 0xff, 0x07, 0x07, 0xff, 0xff,
+    0xff, 0xff, 0xff, 0xff, 0x01, 0x02, 0x02, 0x02,
+    0x02, 0x02, 0x02, 0x02, 0x02, 0x02, 0x02, 0x0a,
+    0x00, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a,
+    0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a,
+    0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x01, 0xff,
+    0xff, 0xff, 0x01, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a,
+    0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x0a, 0x09, 0x09,
+    0x0a, 0x0a, 0x0a, 0x0a, 0x0b, 0x0b, 0x09, 0x09,
+    0x09, 0x0b, 0x0b, 0x0a, 0x0b, 0x0a, 0x09, 0x09,
+    0x09, 0x0a, 0x01, 0x0b, 0x0b, 0x07, 0x07, 0x01,
+    0x0b, 0x06, 0x07, 0x07, 0x0b, 0x06, 0x06, 0x06,
+    0x03, 0x03, 0x09, 0x06, 0x09, 0x06, 0x0b, 0x06,
+    0x0b, 0x0b, 0x06, 0x06, 0x03, 0x06, 0x0b, 0x06,
+    0x06, 0x06, 0x01, 0x07, 0x07, 0x09, 0x09, 0x07,
+    0x07, 0x09, 0x07, 0x07, 0x07, 0x01, 0x07, 0x0b,
+    0x0b, 0x00, 0x00, 0x01, 0xff, 0xff, 0xff, 0x0b,
+    0x0b, 0x09, 0x01, 0xff, 0xff, 0x01, 0x01, 0x00,
+    0x01, 0x01, 0x07, 0x07, 0x07, 0x07, 0x0b, 0x0b,
+    0x07, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01,
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01,
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01,
+    0x01, 0x01, 0x01, 0x0b, 0x0b, 0x0b, 0x0b,
+)  # fmt: skip
@@ -0,0 +1,407 @@
+"""
+Binary framing for the serial link between the GUI and the macropad.
+
+A frame on the wire is a SYNC byte followed by the byte-stuffed body:
+
+    version (1) | type (1) | request id (2) | length (2) | payload | crc32 (4)
+
+Multi-byte fields are little endian and the CRC covers everything from the
+version byte to the end of the payload. SYNC, ESC and Ctrl-C (which would
+interrupt CircuitPython) never appear inside a body: they are sent as ESC
+followed by the byte XOR 0x20. Anything received outside of a frame, like the
+firmware's `print` output, is left alone, so JSON lines and frames can share
+the console.
+
+Commands and responses are the same dicts the JSON protocol uses;
+`encode_command`/`decode_command` and `encode_response`/`decode_response`
+convert them. Key names are sent as one byte indices into `KEY_NAMES`, or as
+KEY_ESCAPE followed by the length-prefixed name.
+
+Software/GUI/FrameProtocol.py mirrors this module; keep the two in sync.
+"""
+
+import json
+import struct
+
+from comms.keycodes import KEY_NAMES
+
+try:
+    from binascii import crc32
+except ImportError:
+    crc32 = None
+
+VERSION = 1
+
+SYNC = 0x7E
+ESC = 0x7D
+CTRL_C = 0x03
+_ESCAPED = (SYNC, ESC, CTRL_C)
+
+HEADER_SIZE = 6
+CRC_SIZE = 4
+MAX_PAYLOAD = 1024
+
+# Message types, responses echo the request type with RESPONSE set
+PING = 0x01
+SET_KEYBINDINGS = 0x02
+GET_CURRENT_KEYMAP = 0x03
+SAVE_CONFIG = 0x04
+LOAD_CONFIG = 0x05
+GET_CONFIG_INFO = 0x06
+GET_LAYER_HASHES = 0x07
+PATCH_KEYS = 0x08
+JSON_COMMAND = 0x7F
+RESPONSE = 0x80
+
+ACTIONS = {
+    PING: "ping",
+    SET_KEYBINDINGS: "set_keybindings",
+    GET_CURRENT_KEYMAP: "get_current_keymap",
+    SAVE_CONFIG: "save_config",
+    LOAD_CONFIG: "load_config",
+    GET_CONFIG_INFO: "get_config_info",
+    GET_LAYER_HASHES: "get_layer_hashes",
+    PATCH_KEYS: "patch_keys",
+}
+ACTION_TYPES = {action: msg_type for msg_type, action in ACTIONS.items()}
+
+KEY_ESCAPE = 0xFF
+KEY_PREFIX = "KC."
+KEY_IDS = {name: idx for idx, name in enumerate(KEY_NAMES)}
+
+STATUSES = ("success", "error")
+
+# Response flags
+_HAS_KEYMAP = 0x01
+_HAS_EXTRA = 0x02
+
+# Response fields carried natively, everything else goes in the JSON extra.
+# "keybindings_received" only echoes the request back and is dropped.
+_RESPONSE_FIELDS = ("status", "message", "keymap", "layers", "keybindings_received")
+
+
+def _crc32_fallback(data, crc=0):
+    crc ^= 0xFFFFFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ (0xEDB88320 & -(crc & 1))
+    return crc ^ 0xFFFFFFFF
+
+
+if crc32 is None:
+    crc32 = _crc32_fallback
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class Frame:
+    def __init__(self, msg_type, request_id, payload):
+        self.msg_type = msg_type
+        self.request_id = request_id
+        self.payload = payload
+
+    def __repr__(self):
+        return "Frame(type=0x{:02x}, id={}, {} bytes)".format(
+            self.msg_type, self.request_id, len(self.payload)
+        )
+
+
+def encode_frame(msg_type, request_id, payload=b""):
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError("Payload too large: {} bytes".format(len(payload)))
+
+    body = bytearray(
+        struct.pack("<BBHH", VERSION, msg_type, request_id & 0xFFFF, len(payload))
+    )
+    body.extend(payload)
+    body.extend(struct.pack("<I", crc32(body) & 0xFFFFFFFF))
+
+    frame = bytearray((SYNC,))
+    for byte in body:
+        if byte in _ESCAPED:
+            frame.append(ESC)
+            frame.append(byte ^ 0x20)
+        else:
+            frame.append(byte)
+    return bytes(frame)
+
+
+class FrameDecoder:
+    """
+    Incremental decoder: feed it received bytes, get complete frames back.
+
+    Frames are assembled in a buffer allocated once, sized for `max_payload`.
+    Bytes outside of frames are returned by `feed` as-is (as `bytes`), so the
+    caller can still handle text such as JSON lines; a frame only starts at
+    the beginning of a line, a SYNC byte within text (a '~' in a layer name)
+    stays text. Frames with a bad CRC, an unknown version or an oversized
+    length are dropped and counted in `errors`.
+    """
+
+    def __init__(self, max_payload=MAX_PAYLOAD):
+        self.max_payload = max_payload
+        self.errors = 0
+        self._body = bytearray(HEADER_SIZE + max_payload + CRC_SIZE)
+        self._size = 0
+        self._in_frame = False
+        self._escaped = False
+        self._expected = 0
+        # Whether text fed to `feed` is at the start of a line
+        self._line_start = True
+
+    @property
+    def in_frame(self):
+        return self._in_frame
+
+    def reset(self):
+        self._size = 0
+        self._in_frame = False
+        self._escaped = False
+        self._expected = 0
+
+    def feed_byte(self, byte):
+        """Consume one byte of a frame. Returns a `Frame` once complete."""
+        if byte == SYNC:
+            if self._in_frame:
+                self.errors += 1
+            self.reset()
+            self._in_frame = True
+            return None
+
+        if not self._in_frame:
+            return None
+
+        if byte == ESC:
+            self._escaped = True
+            return None
+        if self._escaped:
+            byte ^= 0x20
+            self._escaped = False
+
+        body = self._body
+        body[self._size] = byte
+        self._size += 1
+        size = self._size
+
+        if size == HEADER_SIZE:
+            version, _, _, length = struct.unpack_from("<BBHH", body)
+            if version != VERSION or length > self.max_payload:
+                self.errors += 1
+                self.reset()
+                return None
+            self._expected = HEADER_SIZE + length + CRC_SIZE
+
+        if size == self._expected:
+            self.reset()
+            end = size - CRC_SIZE
+            (crc,) = struct.unpack_from("<I", body, end)
+            if crc != crc32(memoryview(body)[:end]) & 0xFFFFFFFF:
+                self.errors += 1
+                return None
+            _, msg_type, request_id, _ = struct.unpack_from("<BBHH", body)
+            return Frame(msg_type, request_id, bytes(body[HEADER_SIZE:end]))
+
+        return None
+
+    def feed(self, data):
+        """
+        Consume `data`, returning a list of `Frame`s and `bytes` chunks of
+        out-of-frame data in the order they were received.
+        """
+        items = []
+        text_start = None
+        for idx, byte in enumerate(data):
+            if not self._in_frame and (byte != SYNC or not self._line_start):
+                if text_start is None:
+                    text_start = idx
+                self._line_start = byte == 0x0A
+                continue
+
+            if text_start is not None:
+                items.append(bytes(data[text_start:idx]))
+                text_start = None
+
+            frame = self.feed_byte(byte)
+            if frame is not None:
+                items.append(frame)
+
+        if text_start is not None:
+            items.append(bytes(data[text_start:]))
+        return items
+
+
+def _pack_str(out, text, size_format="<B"):
+    data = (text or "").encode()
+    # struct doesn't range check on CircuitPython
+    if len(data) >= 1 << (8 * struct.calcsize(size_format)):
+        raise ProtocolError("String too long: {} bytes".format(len(data)))
+    out.extend(struct.pack(size_format, len(data)))
+    out.extend(data)
+
+
+def _unpack_str(payload, offset, size_format="<B"):
+    (size,) = struct.unpack_from(size_format, payload, offset)
+    offset += struct.calcsize(size_format)
+    return str(payload[offset : offset + size], "utf-8"), offset + size
+
+
+def encode_key(out, key):
+    """Append one "KC.X" string to `out`."""
+    name = key[len(KEY_PREFIX) :] if key.startswith(KEY_PREFIX) else None
+    key_id = KEY_IDS.get(name)
+    if key_id is None:
+        out.append(KEY_ESCAPE)
+        _pack_str(out, key)
+    else:
+        out.append(key_id)
+
+
+def decode_key(payload, offset):
+    """Returns the "KC.X" string at `offset` and the next offset."""
+    key_id = payload[offset]
+    offset += 1
+    if key_id == KEY_ESCAPE:
+        return _unpack_str(payload, offset)
+    if key_id < len(KEY_NAMES):
+        return KEY_PREFIX + KEY_NAMES[key_id], offset
+    raise ProtocolError("Unknown key id {}".format(key_id))
+
+
+def encode_keys(out, keys):
+    """Append a key count and `keys` ("KC.X" strings) to `out`."""
+    out.append(len(keys))
+    for key in keys:
+        encode_key(out, key)
+
+
+def decode_keys(payload, offset=0):
+    """Returns the list of "KC.X" strings at `offset` and the next offset."""
+    count = payload[offset]
+    offset += 1
+    keys = []
+    for _ in range(count):
+        key, offset = decode_key(payload, offset)
+        keys.append(key)
+    return keys, offset
+
+
+def layer_hash(name, keys):
+    """
+    Content hash of a layer as `get_layer_hashes` reports it: the CRC32 of
+    its name and "KC.X" key names, one per line.
+    """
+    text = "\n".join([name or ""] + list(keys))
+    return crc32(text.encode()) & 0xFFFFFFFF
+
+
+def encode_command(command):
+    """Returns the message type and payload for a command dict."""
+    action = command.get("action")
+    msg_type = ACTION_TYPES.get(action)
+    payload = bytearray()
+
+    if msg_type is None:
+        return JSON_COMMAND, json.dumps(command).encode()
+
+    if msg_type == SET_KEYBINDINGS:
+        payload.append(command.get("layer", 0))
+        _pack_str(payload, command.get("layer_name"))
+        encode_keys(payload, command.get("keybindings", []))
+    elif msg_type == PATCH_KEYS:
+        # [layer, index, key] changes, then [layer, name] renames
+        changes = command.get("changes", [])
+        payload.append(len(changes))
+        for layer, index, key in changes:
+            payload.append(layer)
+            payload.append(index)
+            encode_key(payload, key)
+        layer_names = command.get("layer_names", [])
+        payload.append(len(layer_names))
+        for layer, name in layer_names:
+            payload.append(layer)
+            _pack_str(payload, name)
+
+    return msg_type, bytes(payload)
+
+
+def decode_command(msg_type, payload):
+    """Inverse of `encode_command`."""
+    if msg_type == JSON_COMMAND:
+        return json.loads(str(payload, "utf-8"))
+
+    action = ACTIONS.get(msg_type)
+    if action is None:
+        raise ProtocolError("Unknown message type 0x{:02x}".format(msg_type))
+
+    command = {"action": action}
+    if msg_type == SET_KEYBINDINGS:
+        command["layer"] = payload[0]
+        layer_name, offset = _unpack_str(payload, 1)
+        command["layer_name"] = layer_name or None
+        command["keybindings"], _ = decode_keys(payload, offset)
+    elif msg_type == PATCH_KEYS:
+        changes = []
+        offset = 1
+        for _ in range(payload[0]):
+            layer, index = payload[offset], payload[offset + 1]
+            key, offset = decode_key(payload, offset + 2)
+            changes.append([layer, index, key])
+        layer_names = []
+        count = payload[offset]
+        offset += 1
+        for _ in range(count):
+            layer = payload[offset]
+            name, offset = _unpack_str(payload, offset + 1)
+            layer_names.append([layer, name])
+        command["changes"] = changes
+        command["layer_names"] = layer_names
+    return command
+
+
+def encode_response(response):
+    """Payload for a response dict."""
+    status = response.get("status")
+    keymap = response.get("keymap")
+    extra = {k: v for k, v in response.items() if k not in _RESPONSE_FIELDS}
+
+    flags = 0
+    if keymap is not None:
+        flags |= _HAS_KEYMAP
+    if extra:
+        flags |= _HAS_EXTRA
+
+    payload = bytearray(
+        (STATUSES.index(status) if status in STATUSES else len(STATUSES), flags)
+    )
+    _pack_str(payload, response.get("message"), "<H")
+    if keymap is not None:
+        payload.append(len(keymap))
+        for layer in keymap:
+            encode_keys(payload, layer)
+    if extra:
+        payload.extend(json.dumps(extra).encode())
+    return bytes(payload)
+
+
+def decode_response(payload):
+    """Inverse of `encode_response`."""
+    status, flags = payload[0], payload[1]
+    response = {"status": STATUSES[status] if status < len(STATUSES) else "unknown"}
+    message, offset = _unpack_str(payload, 2, "<H")
+    if message:
+        response["message"] = message
+    if flags & _HAS_KEYMAP:
+        layers = payload[offset]
+        offset += 1
+        keymap = []
+        for _ in range(layers):
+            keys, offset = decode_keys(payload, offset)
+            keymap.append(keys)
+        response["keymap"] = keymap
+        response["layers"] = layers
+    if flags & _HAS_EXTRA:
+        response.update(json.loads(str(payload[offset:], "utf-8")))
+    return response
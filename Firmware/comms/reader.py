@@ -0,0 +1,99 @@
+"""
+Non-blocking reader for commands arriving on the USB console.
+
+`poll()` drains whatever the host has sent in small chunks, for at most
+`budget_us` per call, and keeps partial messages across calls, so a long
+`set_keybindings` transfer is spread over several loop iterations instead of
+stalling key scanning until its newline arrives. Binary frames go through
+`protocol.FrameDecoder`, everything else is collected into JSON lines. A
+frame can only start between lines: a SYNC byte inside a line, like a '~' in
+a layer name, is part of the text.
+"""
+
+import time
+
+from comms import protocol
+
+MAX_LINE = 2048
+CHUNK_SIZE = 64
+BUDGET_US = 1000
+
+
+class SerialReader:
+    def __init__(
+        self, stream, max_line=MAX_LINE, chunk_size=CHUNK_SIZE, budget_us=BUDGET_US
+    ):
+        self.stream = stream
+        self.budget_us = budget_us
+        self.decoder = protocol.FrameDecoder()
+        # Lines longer than the buffer are dropped and counted
+        self.overflows = 0
+
+        # Don't let readinto() wait for a full chunk
+        if hasattr(stream, "timeout"):
+            stream.timeout = 0
+
+        self._chunk = bytearray(chunk_size)
+        self._pos = 0
+        self._end = 0
+        self._line = bytearray(max_line)
+        self._line_size = 0
+        self._line_overflow = False
+
+    @property
+    def pending(self):
+        """True while a message has only been partially received"""
+        return (
+            self._pos < self._end
+            or self._line_size > 0
+            or self._line_overflow
+            or self.decoder.in_frame
+        )
+
+    def poll(self):
+        """
+        Returns the next complete message, a `protocol.Frame` or a line of
+        text as `bytes` without the newline, or None if there is none yet.
+        """
+        stream = self.stream
+        chunk = self._chunk
+        decoder = self.decoder
+        deadline = time.monotonic_ns() + self.budget_us * 1000
+
+        while True:
+            if self._pos >= self._end:
+                if not stream.in_waiting or time.monotonic_ns() > deadline:
+                    return None
+                self._pos = 0
+                self._end = stream.readinto(chunk) or 0
+                if not self._end:
+                    return None
+
+            while self._pos < self._end:
+                byte = chunk[self._pos]
+                self._pos += 1
+
+                if decoder.in_frame or (
+                    byte == protocol.SYNC
+                    and not self._line_size
+                    and not self._line_overflow
+                ):
+                    frame = decoder.feed_byte(byte)
+                    if frame is not None:
+                        return frame
+                    continue
+
+                if byte == 0x0A:
+                    size = self._line_size
+                    self._line_size = 0
+                    if self._line_overflow:
+                        self._line_overflow = False
+                        self.overflows += 1
+                        continue
+                    return bytes(self._line[:size])
+
+                if self._line_size < len(self._line):
+                    self._line[self._line_size] = byte
+                    self._line_size += 1
+                else:
+                    self._line_overflow = True
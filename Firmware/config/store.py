@@ -0,0 +1,187 @@
+"""
+Keeps the keymap and layer names on the CIRCUITPY drive across power cycles.
+
+The file is small and binary, all fields little endian:
+
+    magic "MPKM" | version (1) | layer count (1)
+    per layer: name length (1) | name | keys, as `comms.protocol.encode_keys`
+    crc32 of everything before it (4)
+
+Saving writes a temporary file next to the keymap and renames it over the old
+one, so a reset halfway through leaves either the old or the new keymap. FAT
+can't rename onto an existing file, so the old one is removed first and
+`load_config` falls back to the temporary file if that is all there is.
+Nothing is written when the keymap is the same as the one on flash, and edits
+from the GUI are saved once they have settled for `save_delay_ms`.
+
+The code can only write to the drive after boot.py remounts it, see there.
+"""
+
+import os
+import struct
+import time
+
+from kmk.keys import KC
+from kmk.scheduler import cancel_task, create_task
+
+from comms import protocol
+from comms.keylookup import resolve_key
+
+DEFAULT_PATH = "/keymap.bin"
+MAGIC = b"MPKM"
+VERSION = 1
+SAVE_DELAY_MS = 2000
+# Layer names are stored with a one byte length
+MAX_NAME_BYTES = 255
+
+
+class KeymapStore:
+    def __init__(self, keyboard, serial_module, path=DEFAULT_PATH, save_delay_ms=SAVE_DELAY_MS):
+        self.keyboard = keyboard
+        # Tracks the "KC.X" names of the keymap, which is what gets stored
+        self.serial_module = serial_module
+        self.path = path
+        self.save_delay_ms = save_delay_ms
+
+        self.saves = 0
+        self.skipped_saves = 0
+        self.restore_ms = None
+        self._saved_crc = None
+        self._save_task = None
+
+    def encode(self):
+        """The current keymap in the file format"""
+        layer_names = self.keyboard.layer_names
+        key_names = self.serial_module.layer_key_names()
+
+        data = bytearray(MAGIC)
+        data.append(VERSION)
+        data.append(len(key_names))
+        for idx, keys in enumerate(key_names):
+            name = (layer_names[idx] if idx < len(layer_names) else None) or ""
+            name = name.encode()
+            if len(name) > MAX_NAME_BYTES:
+                raise ValueError(f"Name of layer {idx} too long")
+            data.append(len(name))
+            data.extend(name)
+            protocol.encode_keys(data, keys)
+        data.extend(struct.pack("<I", protocol.crc32(data) & 0xFFFFFFFF))
+        return data
+
+    def decode(self, data):
+        """Layer names and "KC.X" names per layer, or None if `data` is damaged"""
+        if len(data) < len(MAGIC) + 6 or data[: len(MAGIC)] != MAGIC:
+            return None
+        (crc,) = struct.unpack_from("<I", data, len(data) - 4)
+        if crc != protocol.crc32(memoryview(data)[:-4]) & 0xFFFFFFFF:
+            return None
+        if data[len(MAGIC)] != VERSION:
+            return None
+
+        layer_names = []
+        key_names = []
+        offset = len(MAGIC) + 2
+        try:
+            for _ in range(data[len(MAGIC) + 1]):
+                size = data[offset]
+                layer_names.append(str(data[offset + 1 : offset + 1 + size], "utf-8") or None)
+                keys, offset = protocol.decode_keys(data, offset + 1 + size)
+                key_names.append(keys)
+        except (IndexError, protocol.ProtocolError):
+            return None
+        return layer_names, key_names
+
+    def read(self):
+        """Contents of the keymap file, or of the temporary one left by a reset"""
+        for path in (self.path, self.path + ".tmp"):
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            decoded = self.decode(data)
+            if decoded is not None:
+                return data, decoded
+        return None, None
+
+    def load_config(self):
+        """Replace the keymap with the one on flash, False if there is none"""
+        start = time.monotonic_ns()
+        data, decoded = self.read()
+        if decoded is None:
+            return False
+
+        layer_names, key_names = decoded
+        self.keyboard.keymap = [[self.resolve(key) for key in keys] for keys in key_names]
+        self.keyboard.layer_names[:] = layer_names
+        self.serial_module.keymap_names = key_names
+        self.keyboard.invalidate_key_table()
+        self._saved_crc = protocol.crc32(data) & 0xFFFFFFFF
+
+        self.restore_ms = (time.monotonic_ns() - start) / 1e6
+        print(f"Restored {len(key_names)} layers from {self.path} in {self.restore_ms:.1f} ms")
+        return True
+
+    @staticmethod
+    def resolve(key_string):
+        if not key_string.startswith("KC."):
+            return KC.NO
+        key = resolve_key(key_string[3:])
+        if key is None:
+            key = KC.get(key_string[3:], KC.NO)
+        return key
+
+    def force_save(self):
+        """Write the keymap now if it changed, False if the drive is read-only"""
+        if self._save_task is not None:
+            cancel_task(self._save_task)
+            self._save_task = None
+
+        data = self.encode()
+        crc = protocol.crc32(data) & 0xFFFFFFFF
+        if crc == self._saved_crc:
+            self.skipped_saves += 1
+            return True
+
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            try:
+                os.rename(temp_path, self.path)
+            except OSError:
+                os.remove(self.path)
+                os.rename(temp_path, self.path)
+            if hasattr(os, "sync"):
+                os.sync()
+        except OSError as e:
+            print(f"Could not save keymap to {self.path}: {e}")
+            return False
+
+        self._saved_crc = crc
+        self.saves += 1
+        return True
+
+    def schedule_save(self):
+        """Save once edits stop coming in for `save_delay_ms`"""
+        if self._save_task is not None:
+            cancel_task(self._save_task)
+        self._save_task = create_task(self._deferred_save, after_ms=self.save_delay_ms)
+
+    def _deferred_save(self):
+        self._save_task = None
+        self.force_save()
+
+    def get_config_info(self):
+        data, decoded = self.read()
+        return {
+            "path": self.path,
+            "saved": decoded is not None,
+            "bytes": len(data) if data is not None else 0,
+            "layers": len(decoded[1]) if decoded is not None else 0,
+            "in_sync": self._saved_crc is not None
+            and self._saved_crc == protocol.crc32(self.encode()) & 0xFFFFFFFF,
+            "saves": self.saves,
+            "skipped_saves": self.skipped_saves,
+            "restore_ms": self.restore_ms,
+        }
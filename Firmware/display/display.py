@@ -3,17 +3,20 @@ This file is adapted from Tonasz's display.py in https://github.com/Tonasz/kmk_f
 
 Thanks to Tonasz for their contribution.
 """
+import gc
 from supervisor import ticks_ms
+from time import monotonic_ns
 
-import adafruit_displayio_ssd1306
+import bitmaptools
 import displayio
-import i2cdisplaybus
 import terminalio   
-from adafruit_display_text import label
 
+from display.renderer import Renderer, read_bmp
 from kmk.extensions import Extension
 from kmk.handlers.stock import passthrough as handler_passthrough
 from kmk.keys import make_key
+from kmk.kmktime import ticks_diff
+from kmk.scheduler import Task, create_task
 
 
 class Display(Extension):
@@ -23,20 +26,60 @@ class Display(Extension):
         self, i2c, scenes, *, width=128, height=64, rotation=0, address=I2C_ADDRESS
     ):
 
-        display_bus = i2cdisplaybus.I2CDisplayBus(i2c, device_address=address)
         self.width = width
         self.height = height
-        self._display = adafruit_displayio_ssd1306.SSD1306(
-            display_bus, width=width, height=height, rotation=rotation
+        # Sends the panel only what changed, see display/renderer.py
+        self._display = Renderer(
+            i2c, width=width, height=height, rotation=rotation, address=address
         )
-        self._scenes = scenes
+        # Scenes can be given as a class or function that makes the scene,
+        # it is then only built, and its group loaded, when first shown. Such
+        # scenes are dropped again when they're not shown and free memory is
+        # below `evict_below_bytes` (0 never drops them).
+        self._scenes = list(scenes)
+        self._factories = [
+            None if isinstance(scene, DisplayScene) else scene for scene in scenes
+        ]
+        self.evict_below_bytes = 0
         self._current_scene = 0
         self._saved_scene = 0
         self._redraw_forced = False
         self._asleep = False
-        self.polling_interval = 100
         self._last_tick = ticks_ms()
 
+        # How often the active scene is asked whether it needs drawing: every
+        # `scene.polling_interval` ms while keys are in use, and once nothing
+        # changed for `linger_ms`, twice as long after every check, up to
+        # `polling_interval`. Changes are spotted by the keyboard's counters.
+        self.polling_interval = 1000
+        self.linger_ms = 500
+        self._interval = 0
+        self._changes = None
+        self._last_change = self._last_tick
+        # Checks that led to drawing the scene and those that didn't
+        self.frames_drawn = 0
+        self.frames_skipped = 0
+
+        # Drawing and sending to the panel happen in a scheduler task that
+        # waits for a cycle without key events or HID reports to deliver,
+        # and stops sending pages after `render_budget_us` (0 for no limit);
+        # what's left is sent on the next cycles.
+        self.render_budget_us = 1000
+        # Built once, queued with create_task(self._job) when needed
+        self._job = Task(self._render)
+        self._job_queued = False
+        self._draw_pending = False
+        self._draw_forced = False
+        self._keyboard = None
+        # Time spent drawing scenes and sending to the panel, and how often
+        # the render job had to wait for the keyboard
+        self.draw_ns = 0
+        self.io_ns = 0
+        self.jobs = 0
+        self.deferrals = 0
+        self.loads = 0
+        self.evictions = 0
+
         make_key(
             names=('OLED_NXT',),
             on_press=self._tb_next_scene,
@@ -56,19 +99,8 @@ class Display(Extension):
         )
 
     def during_bootup(self, keyboard):
-        self._redraw_forced = True
-        for scene in self._scenes:
-            scene.initialize(self, keyboard)
-        self._display.root_group = self._get_active_scene().scene_group
-
-    def before_matrix_scan(self, keyboard):
-        pass
-
-    def after_matrix_scan(self, keyboard):
-        pass
-
-    def before_hid_send(self, keyboard):
-        pass
+        self._keyboard = keyboard
+        self._show_scene(self._current_scene)
 
     def after_hid_send(self, keyboard):
         if self._asleep:
@@ -76,18 +108,70 @@ class Display(Extension):
 
         scene = self._get_active_scene()
         now = ticks_ms()
-        ready = (
-            now - self._last_tick >= scene.polling_interval
-        ) and scene.is_redraw_needed(keyboard)
-        if self._redraw_forced or ready:
-            if self._redraw_forced:
-                scene.forced_draw(self, keyboard)
-            else:
-                scene.draw(self, keyboard)
+        # Hooks get the sandbox, the counters are on the keyboard
+        changes = self._keyboard.key_changes + self._keyboard.reports_sent
+        if changes != self._changes:
+            self._changes = changes
+            self._last_change = now
+            self._interval = scene.polling_interval
+
+        if self._redraw_forced:
+            self._draw_pending = True
+            self._draw_forced = True
             self._redraw_forced = False
             self._last_tick = now
+            self.frames_drawn += 1
+        elif ticks_diff(now, self._last_tick) >= self._interval:
+            if scene.is_redraw_needed(keyboard):
+                self._draw_pending = True
+                self.frames_drawn += 1
+            else:
+                self.frames_skipped += 1
+            self._last_tick = now
+            if ticks_diff(now, self._last_change) >= self.linger_ms:
+                self._interval = min(
+                    max(self._interval, scene.polling_interval) * 2,
+                    self.polling_interval,
+                )
+        if (self._draw_pending or self._display.pending) and not self._job_queued:
+            self._job_queued = True
+            create_task(self._job)
         return
 
+    def bitmap_changed(self, bitmap):
+        """Scenes call this after drawing into a bitmap, or dropping one"""
+        self._display.forget(bitmap)
+
+    def redraw(self):
+        """Draws the active scene in full on the next render job"""
+        self._redraw_forced = True
+
+    def _render(self):
+        self._job_queued = False
+        keyboard = self._keyboard
+        if keyboard.hid_pending or keyboard.matrix_update_queue:
+            self.deferrals += 1
+            return
+        for matrix in keyboard.matrix:
+            if matrix.pending:
+                self.deferrals += 1
+                return
+
+        self.jobs += 1
+        start = monotonic_ns()
+        if self._draw_pending:
+            scene = self._get_active_scene()
+            if self._draw_forced:
+                scene.forced_draw(self, keyboard)
+            else:
+                scene.draw(self, keyboard)
+            self._draw_pending = False
+            self._draw_forced = False
+        drawn = monotonic_ns()
+        self._display.refresh(self.render_budget_us)
+        self.draw_ns += drawn - start
+        self.io_ns += monotonic_ns() - drawn
+
     def on_runtime_enable(self, keyboard):
         pass
 
@@ -104,19 +188,51 @@ class Display(Extension):
         if len(self._scenes) > self._current_scene:
             return self._scenes[self._current_scene]
 
-    def _tb_next_scene(self, *args, **kwargs):
-        self._current_scene += 1
-        if self._current_scene >= len(self._scenes):
-            self._current_scene = 0
+    def _load_scene(self, scene_num):
+        scene = self._scenes[scene_num]
+        if self._factories[scene_num] is scene:
+            scene = self._scenes[scene_num] = scene()
+        scene.keyboard = self._keyboard
+        if scene.scene_group is None:
+            scene.initialize(self, self._keyboard)
+            self.loads += 1
+        return scene
+
+    def _show_scene(self, scene_num):
+        self._current_scene = scene_num
         self._redraw_forced = True
-        self._display.root_group = self._get_active_scene().scene_group
+        self._display.root_group = self._load_scene(scene_num).scene_group
+        if self.evict_below_bytes and gc.mem_free() < self.evict_below_bytes:
+            self.evict()
+
+    def evict(self):
+        """Drops every scene not shown that can be built again"""
+        for scene_num, factory in enumerate(self._factories):
+            scene = self._scenes[scene_num]
+            if factory is None or scene is factory or scene_num == self._current_scene:
+                continue
+            groups = [scene.scene_group] if scene.scene_group is not None else []
+            while groups:
+                for node in groups.pop():
+                    if hasattr(node, "bitmap"):
+                        self._display.forget(node.bitmap)
+                    elif hasattr(node, "__iter__") and not hasattr(node, "text"):
+                        groups.append(node)
+            self._scenes[scene_num] = factory
+            self.evictions += 1
+        gc.collect()
+
+    def _tb_next_scene(self, *args, **kwargs):
+        scene_num = self._current_scene + 1
+        if scene_num >= len(self._scenes):
+            scene_num = 0
+        self._show_scene(scene_num)
 
     def _tb_prev_scene(self, *args, **kwargs):
-        self._current_scene -= 1
-        if self._current_scene < 0:
-            self._current_scene = len(self._scenes) - 1
-        self._redraw_forced = True
-        self._display.root_group = self._get_active_scene().scene_group
+        scene_num = self._current_scene - 1
+        if scene_num < 0:
+            scene_num = len(self._scenes) - 1
+        self._show_scene(scene_num)
 
     def _tb_toggle(self, *args, **kwargs):
         if self._asleep:
@@ -143,9 +259,7 @@ class Display(Extension):
             
         # Only change if needed
         if self._current_scene != scene_num:
-            self._current_scene = scene_num
-            self._redraw_forced = True
-            self._display.root_group = self._get_active_scene().scene_group
+            self._show_scene(scene_num)
             
         return self._current_scene  # Return the actual scene number used
     
@@ -171,7 +285,9 @@ class DisplayScene:
 
     _display_layer = 0
     _current_layer = 0
-    polling_interval = 40
+    # Shortest time between redraw checks, while keys are in use
+    polling_interval = 20
+    scene_group = None
 
     def is_redraw_needed(self, sandbox):
         '''Obligatory check, if we can skip draw logic.
@@ -179,7 +295,7 @@ class DisplayScene:
         raise NotImplementedError
 
     def initialize(self, oled, sandbox):
-        '''Called once during_bootup'''
+        '''Called when the scene is first shown'''
         self.scene_group = None
 
     def forced_draw(self, oled, sandbox):
@@ -204,15 +320,121 @@ class BitmapLogoScene(DisplayScene):
     def initialize(self, oled, sandbox):
         self.scene_group = displayio.Group()
 
-        bitmap = displayio.OnDiskBitmap(self._path)
-        tile_grid = displayio.TileGrid(bitmap, pixel_shader=bitmap.pixel_shader)
+        bitmap = read_bmp(self._path)
+        palette = displayio.Palette(2)
+        palette[1] = 0xFFFFFF
+        tile_grid = displayio.TileGrid(bitmap, pixel_shader=palette)
         self.scene_group.append(tile_grid)
 
     def draw(self, oled, sandbox):
         pass
 
 
-from kmk.extensions.rgb import AnimationModes
+class SelectionScene(DisplayScene):
+    '''Displays the layer picked with the encoder, marked when it is active'''
+
+    last_selection = None
+    last_active = None
+    # Longest layer name shown, in characters
+    name_length = 10
+
+    def __init__(self, *, layers_names=None):
+        self.layers_names = layers_names
+
+    def is_redraw_needed(self, sandbox):
+        if self.last_selection != DisplayScene._current_layer:
+            return True
+        if self.last_active != sandbox.active_layers[0]:
+            return True
+        return False
+
+    def initialize(self, oled, sandbox):
+        from adafruit_display_text import label
+
+        self.scene_group = displayio.Group()
+        # Layer names are drawn once into the tiles of a bitmap, one tile
+        # per layer, and scrolling only changes which tile is shown
+        self._cell_width, self._cell_height = terminalio.FONT.get_bounding_box()[:2]
+        self._palette = displayio.Palette(2)
+        self._palette[1] = 0xFFFFFF
+        self._names = []
+        self._atlas = None
+        self._name_grid = None
+        self._name_group = displayio.Group(x=4, y=10 - self._cell_height, scale=2)
+        self.scene_group.append(self._name_group)
+        self.info_text = label.Label(terminalio.FONT, text=" " * 20, color=0xFFFFFF)
+        self.info_text.x = 4
+        self.info_text.y = 26
+        self.scene_group.append(self.info_text)
+
+    def draw(self, oled, sandbox):
+        self.last_selection = DisplayScene._current_layer
+        self.last_active = sandbox.active_layers[0]
+        marker = "*" if self.last_selection == self.last_active else " "
+        self._show_name(oled, self.last_selection)
+        self.info_text.text = f"{marker} {self.last_selection + 1}/{len(self.keyboard.keymap)}"
+
+    def _show_name(self, oled, layer_no):
+        if layer_no >= len(self._names):
+            self._build_atlas(oled, max(layer_no + 1, len(self.keyboard.keymap)))
+        name = self._get_layer_name(layer_no)
+        # Names only change when the GUI sends new ones
+        if self._names[layer_no] != name:
+            self._draw_name(layer_no, name)
+            self._names[layer_no] = name
+            oled.bitmap_changed(self._atlas)
+        self._name_grid[0] = layer_no
+
+    def _build_atlas(self, oled, layers):
+        if self._atlas is not None:
+            self._name_group.remove(self._name_grid)
+            oled.bitmap_changed(self._atlas)
+        tile_width = self.name_length * self._cell_width
+        self._atlas = displayio.Bitmap(tile_width, self._cell_height * layers, 2)
+        self._name_grid = displayio.TileGrid(
+            self._atlas,
+            pixel_shader=self._palette,
+            tile_width=tile_width,
+            tile_height=self._cell_height,
+        )
+        self._name_group.append(self._name_grid)
+        self._names = [None] * layers
+
+    def _draw_name(self, layer_no, name):
+        atlas = self._atlas
+        top = layer_no * self._cell_height
+        bitmaptools.fill_region(atlas, 0, top, atlas.width, top + self._cell_height, 0)
+        x = 0
+        for char in name:
+            glyph = terminalio.FONT.get_glyph(ord(char))
+            if glyph is None:
+                continue
+            if x + glyph.dx + glyph.width > atlas.width:
+                break
+            columns = glyph.bitmap.width // glyph.width
+            src_x = (glyph.tile_index % columns) * glyph.width
+            src_y = (glyph.tile_index // columns) * glyph.height
+            bitmaptools.blit(
+                atlas,
+                glyph.bitmap,
+                x + glyph.dx,
+                top + self._cell_height - glyph.height - glyph.dy,
+                x1=src_x,
+                y1=src_y,
+                x2=src_x + glyph.width,
+                y2=src_y + glyph.height,
+            )
+            x += glyph.shift_x
+
+    def _get_layer_name(self, layer_no):
+        if (
+            self.layers_names is None
+            or layer_no >= len(self.layers_names)
+            or not self.layers_names[layer_no]
+        ):
+            return f"Layer {layer_no}"
+        return self.layers_names[layer_no]
+
 
 class StatusScene(DisplayScene):
     '''Displays basic status info: current layer, default layer, rgb mode (optional)'''
@@ -237,6 +459,8 @@ class StatusScene(DisplayScene):
         return False
 
     def initialize(self, oled, sandbox):
+        from adafruit_display_text import label
+
         scene_height = 20 if self.rgb_ext is None else 30
         y_pos = int((oled.height - scene_height) / 2)
         self.scene_group = displayio.Group(x=5, y=y_pos)
@@ -279,6 +503,8 @@ class StatusScene(DisplayScene):
         return self.layers_names[layer_no]
 
     def _get_rgb_mode_name(self, rgb_mode):
+        from kmk.extensions.rgb import AnimationModes
+
         if rgb_mode == AnimationModes.OFF:
             return 'Off mode'
         if (
@@ -309,17 +535,20 @@ class ShowcaseScene(DisplayScene):
 
     def __init__(self):
         super().__init__()
-        self.last_keys = set()
+        self.last_changes = None
         self.last_display_text = "None"
 
     def is_redraw_needed(self, sandbox):
-        current_keys = set(self.keyboard.keys_pressed)
-        if current_keys != self.last_keys:
-            self.last_keys = current_keys
+        # Pressed keys only change with a key event or a report to the host
+        changes = self.keyboard.key_changes + self.keyboard.reports_sent
+        if changes != self.last_changes:
+            self.last_changes = changes
             return True
         return False
 
     def initialize(self, oled, sandbox):
+        from adafruit_display_text import label
+
         self.scene_group = displayio.Group()
 
         # Key display text
@@ -0,0 +1,436 @@
+"""
+SSD1306 output for the display scenes that only sends what changed.
+
+The SSD1306 keeps its memory in pages, rows of 8 pixels with one byte per
+column. `Renderer` keeps the same layout in `buffer`, next to a copy of what
+the panel shows. `refresh()` walks the root group, compares every label and
+tile grid with how it was drawn the last time and marks the area it covered
+before and covers now as dirty. Only dirty columns of dirty pages are drawn
+again, and of those only columns that differ from the panel are written,
+one column/page window per page.
+
+Label glyphs and tile grid bitmaps are converted to page format once and
+cached. Everything is drawn white on black: any pixel that isn't 0 is lit,
+and layers are ORed together.
+"""
+
+from struct import unpack_from
+from time import monotonic_ns
+
+import displayio
+from micropython import const
+
+_CONTROL_COMMAND = const(0x00)
+_CONTROL_DATA = const(0x40)
+_SET_COLUMNS = const(0x21)
+_SET_PAGES = const(0x22)
+_DISPLAY_OFF = const(0xAE)
+_DISPLAY_ON = const(0xAF)
+
+
+class Sprite:
+    """Pixels in page format: `pages` rows of `width` bytes, bit 0 on top"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.pages = (height + 7) // 8
+        self.data = bytearray(width * self.pages)
+
+    def blit(self, src, x, y, page, lo=0, hi=None):
+        """OR what `src` at (x, y) puts on `page`, from column lo to hi"""
+        width = self.width
+        if hi is None or hi >= width:
+            hi = width - 1
+        if x > lo:
+            lo = x
+        if x + src.width - 1 < hi:
+            hi = x + src.width - 1
+        # Rows of `src` that land on `page`, and how far they are shifted
+        top = page * 8 - y
+        first = top >> 3
+        shift = top & 7
+        if lo > hi or first >= src.pages or first < -1:
+            return
+        if first < 0 and not shift:
+            return
+
+        data = self.data
+        src_data = src.data
+        src_width = src.width
+        dst = page * width
+        upper = first * src_width - x
+        lower = upper + src_width
+        has_upper = first >= 0
+        has_lower = first + 1 < src.pages and shift
+        for col in range(lo, hi + 1):
+            byte = 0
+            if has_upper:
+                byte = src_data[upper + col] >> shift
+            if has_lower:
+                byte |= (src_data[lower + col] << (8 - shift)) & 0xFF
+            data[dst + col] |= byte
+
+
+def bitmap_sprite(bitmap, x, y, width, height, scale=1):
+    """`Sprite` of a width x height area of a displayio Bitmap"""
+    sprite = Sprite(width * scale, height * scale)
+    data = sprite.data
+    row_size = sprite.width
+    for by in range(height):
+        for bx in range(width):
+            if not bitmap[x + bx, y + by]:
+                continue
+            for sy in range(by * scale, (by + 1) * scale):
+                mask = 1 << (sy & 7)
+                offset = (sy >> 3) * row_size
+                for sx in range(bx * scale, (bx + 1) * scale):
+                    data[offset + sx] |= mask
+    return sprite
+
+
+def tile_sprite(bitmap, tile_width, tile_height, index, scale=1):
+    columns = bitmap.width // tile_width
+    return bitmap_sprite(
+        bitmap,
+        (index % columns) * tile_width,
+        (index // columns) * tile_height,
+        tile_width,
+        tile_height,
+        scale,
+    )
+
+
+def read_bmp(path):
+    """
+    Two colour `displayio.Bitmap` of an uncompressed 1, 24 or 32 bit BMP
+    file, 1 where the picture is bright.
+    """
+    with open(path, "rb") as f:
+        header = f.read(54)
+        if header[:2] != b"BM":
+            raise ValueError("not a BMP file")
+        offset, header_size, width, height = unpack_from("<IIii", header, 10)
+        bits, compression = unpack_from("<HI", header, 28)
+        if bits not in (1, 24, 32) or compression not in (0, 3):
+            raise ValueError("unsupported BMP format")
+
+        if bits == 1:
+            f.seek(14 + header_size)
+            palette = f.read(8)
+            # Which palette index is the brighter colour
+            bright = int(sum(palette[4:7]) > sum(palette[0:3]))
+
+        bottom_up = height > 0
+        height = abs(height)
+        bitmap = displayio.Bitmap(width, height, 2)
+        row = bytearray((width * bits + 31) // 32 * 4)
+        step = bits // 8
+        f.seek(offset)
+        for idx in range(height):
+            f.readinto(row)
+            y = height - 1 - idx if bottom_up else idx
+            for x in range(width):
+                if bits == 1:
+                    lit = (row[x >> 3] >> (7 - (x & 7)) & 1) == bright
+                else:
+                    pixel = x * step
+                    lit = row[pixel] + row[pixel + 1] + row[pixel + 2] > 384
+                if lit:
+                    bitmap[x, y] = 1
+    return bitmap
+
+
+class Renderer:
+    """
+    Draws `root_group` on an SSD1306 over I2C. `rotation` is 0 or 180, done
+    by the panel's segment and COM scan direction.
+
+    `frames` counts refreshes that wrote something, `bytes_sent` all bytes
+    on the bus and `last_frame_bytes` those of the latest refresh, commands
+    and control bytes included.
+    """
+
+    def __init__(self, i2c, *, width=128, height=32, rotation=0, address=0x3C):
+        if rotation not in (0, 180):
+            raise ValueError("rotation must be 0 or 180")
+        self.i2c = i2c
+        self.address = address
+        self.width = width
+        self.height = height
+        self.pages = height // 8
+        self.frames = 0
+        self.bytes_sent = 0
+        self.last_frame_bytes = 0
+
+        self._screen = Sprite(width, height)
+        self.buffer = self._screen.data
+        self._shown = bytearray(len(self.buffer))
+        self._view = memoryview(self.buffer)
+        self._blank = memoryview(bytes(width))
+        # Dirty columns per page, none while lo > hi
+        self._dirty_lo = bytearray([width] * self.pages)
+        self._dirty_hi = bytearray(self.pages)
+        # node: (state, sprite, x, y) as drawn last
+        self._drawn = {}
+        self._glyphs = {}
+        self._tiles = {}
+        self._root_group = None
+
+        self._command = bytearray(7)
+        self._command[0] = _CONTROL_COMMAND
+        self._data = bytearray(width + 1)
+        self._data[0] = _CONTROL_DATA
+
+        flipped = rotation == 180
+        self._write_commands(
+            bytes(
+                (
+                    _CONTROL_COMMAND,
+                    _DISPLAY_OFF,
+                    0x20, 0x00,  # horizontal addressing
+                    0x40,  # start line 0
+                    0xA0 if flipped else 0xA1,  # segment remap
+                    0xA8, height - 1,  # multiplex ratio
+                    0xC0 if flipped else 0xC8,  # COM scan direction
+                    0xD3, 0x00,  # display offset
+                    0xDA, 0x02 if height == 32 else 0x12,  # COM pins
+                    0xD5, 0x80,  # clock divide
+                    0xD9, 0xF1,  # pre-charge
+                    0xDB, 0x30,  # VCOM deselect
+                    0x81, 0xCF,  # contrast
+                    0xA4,  # show RAM
+                    0xA6,  # not inverted
+                    0x8D, 0x14,  # charge pump
+                )
+            )
+        )  # fmt: skip
+        # Panel RAM is random after power up: the first frame is sent in
+        # full, with the panel only switched on after it, instead of clearing
+        # it here during boot
+        self._unsent = bytearray([1] * self.pages)
+        self._lit = False
+        self.invalidate(0, 0, width, height)
+        self.bytes_sent = 0
+
+    @property
+    def root_group(self):
+        return self._root_group
+
+    @root_group.setter
+    def root_group(self, group):
+        if group is not self._root_group:
+            self._root_group = group
+            self._drawn = {}
+            self.invalidate(0, 0, self.width, self.height)
+
+    def invalidate(self, x, y, width, height):
+        """Mark an area to be drawn again on the next `refresh()`"""
+        lo = max(x, 0)
+        hi = min(x + width, self.width) - 1
+        if lo > hi or height <= 0:
+            return
+        last = min((y + height - 1) >> 3, self.pages - 1)
+        for page in range(max(y, 0) >> 3, last + 1):
+            if lo < self._dirty_lo[page]:
+                self._dirty_lo[page] = lo
+            if hi > self._dirty_hi[page]:
+                self._dirty_hi[page] = hi
+
+    def forget(self, bitmap):
+        """
+        Drop what's cached of `bitmap`, whose pixels changed or which isn't
+        shown any more. Tile grids showing it are drawn again.
+        """
+        for key in [key for key in self._tiles if key[0] is bitmap]:
+            del self._tiles[key]
+        for node, entry in list(self._drawn.items()):
+            if entry[0][0] is bitmap:
+                self._invalidate_entry(entry)
+                del self._drawn[node]
+
+    def sleep(self):
+        self._write_commands(bytes((_CONTROL_COMMAND, _DISPLAY_OFF)))
+
+    def wake(self):
+        self._write_commands(bytes((_CONTROL_COMMAND, _DISPLAY_ON)))
+
+    @property
+    def pending(self):
+        """True while part of the panel is out of date"""
+        for page in range(self.pages):
+            if self._dirty_lo[page] <= self._dirty_hi[page]:
+                return True
+        return False
+
+    def refresh(self, budget_us=0):
+        """
+        Bring the panel up to date with `root_group`, returns bytes sent.
+        With a `budget_us` no further pages are sent once it has run out,
+        they stay `pending` for the next call.
+        """
+        deadline = monotonic_ns() + budget_us * 1000 if budget_us else 0
+        drawn = {}
+        if self._root_group is not None:
+            self._collect(self._root_group, 0, 0, 1, drawn)
+        for node, entry in self._drawn.items():
+            if drawn.get(node, (None,))[0] != entry[0]:
+                self._invalidate_entry(entry)
+        for node, entry in drawn.items():
+            if self._drawn.get(node, (None,))[0] != entry[0]:
+                self._invalidate_entry(entry)
+        self._drawn = drawn
+
+        sent = 0
+        screen = self._screen
+        buffer = self.buffer
+        shown = self._shown
+        width = self.width
+        for page in range(self.pages):
+            lo = self._dirty_lo[page]
+            hi = self._dirty_hi[page]
+            if lo > hi:
+                continue
+            self._dirty_lo[page] = width
+            self._dirty_hi[page] = 0
+
+            start = page * width
+            buffer[start + lo : start + hi + 1] = self._blank[: hi - lo + 1]
+            for _, sprite, x, y in drawn.values():
+                screen.blit(sprite, x, y, page, lo, hi)
+
+            # Only what the panel doesn't show already
+            if self._unsent[page]:
+                self._unsent[page] = 0
+            else:
+                while lo <= hi and buffer[start + lo] == shown[start + lo]:
+                    lo += 1
+                while hi >= lo and buffer[start + hi] == shown[start + hi]:
+                    hi -= 1
+                if lo > hi:
+                    continue
+            if not sent:
+                self._lock()
+            try:
+                sent += self._send(page, lo, hi)
+            except Exception:
+                self.i2c.unlock()
+                raise
+            if deadline and monotonic_ns() > deadline:
+                break
+
+        if sent:
+            self.i2c.unlock()
+            self.frames += 1
+            self.bytes_sent += sent
+            if not self._lit and not any(self._unsent):
+                self._lit = True
+                self.wake()
+        self.last_frame_bytes = sent
+        return sent
+
+    def _invalidate_entry(self, entry):
+        _, sprite, x, y = entry
+        self.invalidate(x, y, sprite.width, sprite.height)
+
+    def _collect(self, group, x, y, scale, drawn):
+        for node in group:
+            if node.hidden:
+                continue
+            node_x = x + node.x * scale
+            node_y = y + node.y * scale
+            if hasattr(node, "text"):
+                node_scale = scale * node.scale
+                state = (node.text, node.font, node_x, node_y, node_scale)
+                entry = self._drawn.get(node)
+                if entry is not None and entry[0] == state:
+                    drawn[node] = entry
+                    continue
+                sprite = self._text_sprite(node.text, node.font, node_scale)
+                # Labels are positioned by the middle of their line
+                top = node_y - sprite.height // 2
+                drawn[node] = (state, sprite, node_x, top)
+            elif hasattr(node, "bitmap"):
+                self._collect_tiles(node, node_x, node_y, scale, drawn)
+            else:
+                self._collect(node, node_x, node_y, scale * node.scale, drawn)
+
+    def _collect_tiles(self, grid, x, y, scale, drawn):
+        tiles = tuple(grid[idx] for idx in range(grid.width * grid.height))
+        state = (grid.bitmap, tiles, x, y, scale)
+        entry = self._drawn.get(grid)
+        if entry is not None and entry[0] == state:
+            drawn[grid] = entry
+            return
+
+        tile_width = grid.tile_width * scale
+        tile_height = grid.tile_height * scale
+        sprite = Sprite(grid.width * tile_width, grid.height * tile_height)
+        for idx, tile in enumerate(tiles):
+            key = (grid.bitmap, grid.tile_width, grid.tile_height, tile, scale)
+            cached = self._tiles.get(key)
+            if cached is None:
+                cached = tile_sprite(
+                    grid.bitmap, grid.tile_width, grid.tile_height, tile, scale
+                )
+                self._tiles[key] = cached
+            tile_x = (idx % grid.width) * tile_width
+            tile_y = (idx // grid.width) * tile_height
+            for page in range(sprite.pages):
+                sprite.blit(cached, tile_x, tile_y, page)
+        drawn[grid] = (state, sprite, x, y)
+
+    def _text_sprite(self, text, font, scale):
+        line_height = font.get_bounding_box()[1]
+        glyphs = []
+        width = 0
+        for char in text:
+            glyph = font.get_glyph(ord(char))
+            if glyph is None:
+                continue
+            glyphs.append((width, glyph))
+            width += glyph.shift_x
+        sprite = Sprite(width * scale, line_height * scale)
+        for x, glyph in glyphs:
+            key = (font, glyph.tile_index, scale)
+            glyph_sprite = self._glyphs.get(key)
+            if glyph_sprite is None:
+                glyph_sprite = tile_sprite(
+                    glyph.bitmap, glyph.width, glyph.height, glyph.tile_index, scale
+                )
+                self._glyphs[key] = glyph_sprite
+            glyph_x = (x + glyph.dx) * scale
+            glyph_y = (line_height - glyph.height - glyph.dy) * scale
+            for page in range(sprite.pages):
+                sprite.blit(glyph_sprite, glyph_x, glyph_y, page)
+        return sprite
+
+    def _lock(self):
+        while not self.i2c.try_lock():
+            pass
+
+    def _write_commands(self, commands):
+        self._lock()
+        try:
+            self.i2c.writeto(self.address, commands)
+        finally:
+            self.i2c.unlock()
+        self.bytes_sent += len(commands)
+
+    def _send(self, page, lo, hi):
+        command = self._command
+        command[1] = _SET_COLUMNS
+        command[2] = lo
+        command[3] = hi
+        command[4] = _SET_PAGES
+        command[5] = page
+        command[6] = page
+        self.i2c.writeto(self.address, command)
+
+        count = hi - lo + 1
+        start = page * self.width + lo
+        view = self._view[start : start + count]
+        self._data[1 : count + 1] = view
+        self.i2c.writeto(self.address, self._data, end=count + 1)
+        self._shown[start : start + count] = view
+        return len(command) + count + 1
@@ -25,18 +25,6 @@ class StringyKeymaps(Extension):
                         debug('Replacing ', key, ' with ', replacement)
                     layer[key_idx] = replacement
 
-    def before_matrix_scan(self, keyboard):
-        return
-
-    def after_matrix_scan(self, keyboard):
-        return
-
-    def before_hid_send(self, keyboard):
-        return
-
-    def after_hid_send(self, keyboard):
-        return
-
     def on_powersave_enable(self, keyboard):
         return
 
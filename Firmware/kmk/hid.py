@@ -1,10 +1,12 @@
 import supervisor
 import usb_hid
 from micropython import const
+from supervisor import ticks_ms
 
-from struct import pack, pack_into
+from struct import pack_into
 
 from kmk.keys import Axis, ConsumerKey, KeyboardKey, ModifierKey, MouseKey
+from kmk.kmktime import check_deadline
 from kmk.scheduler import cancel_task, create_task
 from kmk.utils import Debug, clamp
 
@@ -46,6 +48,9 @@ _REPORT_SIZE_MOUSE = const(4)
 _REPORT_SIZE_MOUSE_HSCROLL = const(5)
 _REPORT_SIZE_SYSCONTROL = const(8)
 
+# Initial number of keys `AbstractHID` tracks, grows when exceeded
+_APPLIED_KEYS = const(8)
+
 
 def find_device(devices, usage_page, usage):
     for device in devices:
@@ -58,6 +63,14 @@ def find_device(devices, usage_page, usage):
 
 
 class Report:
+    '''
+    A HID report buffer, allocated once and updated in place.
+
+    Keys are applied with `add_*`/`remove_*` as they are pressed and
+    released; anything that changes the buffer sets `pending` so the next
+    `AbstractHID.send` transmits it.
+    '''
+
     def __init__(self, size):
         self.buffer = bytearray(size)
         self.pending = False
@@ -68,49 +81,69 @@ class Report:
                 self.buffer[k] = 0x00
                 self.pending = True
 
+    def sent(self):
+        pass
+
     def get_action_map(self):
         return {}
 
 
 class KeyboardReport(Report):
     def __init__(self, size=_REPORT_SIZE_KEYBOARD):
-        self.buffer = bytearray(size)
-        self.prev_buffer = bytearray(size)
-
-    @property
-    def pending(self):
-        return self.buffer != self.prev_buffer
-
-    @pending.setter
-    def pending(self, v):
-        if v is False:
-            self.prev_buffer[:] = self.buffer[:]
+        super().__init__(size)
+        # Modifier keys can share bits (KC.MEH and KC.LSFT), count the keys
+        # holding each bit so releasing one leaves the others in place.
+        self._modifier_counts = bytearray(8)
 
     def clear(self):
-        for idx in range(len(self.buffer)):
-            self.buffer[idx] = 0x00
+        super().clear()
+        for idx in range(8):
+            self._modifier_counts[idx] = 0
 
     def add_key(self, key):
         # Find the first empty slot in the key report, and fill it; drop key if
-        # report is full.
+        # report is full and tell the caller so.
         idx = self.buffer.find(b'\x00', 2)
 
         if 0 < idx < _REPORT_SIZE_KEYBOARD:
             self.buffer[idx] = key.code
+            self.pending = True
+            return True
+        return False
 
     def remove_key(self, key):
-        idx = self.buffer.find(pack('B', key.code), 2)
-        if 0 < idx:
-            self.buffer[idx] = 0x00
+        buffer = self.buffer
+        code = key.code
+        for idx in range(2, _REPORT_SIZE_KEYBOARD):
+            if buffer[idx] == code:
+                buffer[idx] = 0x00
+                self.pending = True
+                return
 
     def add_modifier(self, modifier):
-        self.buffer[0] |= modifier.code
+        self._update_modifiers(modifier.code, 1)
 
     def remove_modifier(self, modifier):
-        self.buffer[0] &= ~modifier.code
+        self._update_modifiers(modifier.code, -1)
+
+    def _update_modifiers(self, code, delta):
+        counts = self._modifier_counts
+        modifiers = 0
+        for bit in range(8):
+            if code & (1 << bit) and counts[bit] + delta >= 0:
+                counts[bit] += delta
+            if counts[bit]:
+                modifiers |= 1 << bit
+
+        if modifiers != self.buffer[0]:
+            self.buffer[0] = modifiers
+            self.pending = True
 
     def get_action_map(self):
-        return {KeyboardKey: self.add_key, ModifierKey: self.add_modifier}
+        return {
+            KeyboardKey: (self.add_key, self.remove_key),
+            ModifierKey: (self.add_modifier, self.remove_modifier),
+        }
 
 
 class NKROKeyboardReport(KeyboardReport):
@@ -118,10 +151,19 @@ class NKROKeyboardReport(KeyboardReport):
         super().__init__(_REPORT_SIZE_KEYBOARD_NKRO)
 
     def add_key(self, key):
-        self.buffer[(key.code >> 3) + 1] |= 1 << (key.code & 0x07)
+        idx = (key.code >> 3) + 1
+        bits = self.buffer[idx] | (1 << (key.code & 0x07))
+        if bits != self.buffer[idx]:
+            self.buffer[idx] = bits
+            self.pending = True
+        return True
 
     def remove_key(self, key):
-        self.buffer[(key.code >> 3) + 1] &= ~(1 << (key.code & 0x07))
+        idx = (key.code >> 3) + 1
+        bits = self.buffer[idx] & ~(1 << (key.code & 0x07))
+        if bits != self.buffer[idx]:
+            self.buffer[idx] = bits
+            self.pending = True
 
 
 class ConsumerControlReport(Report):
@@ -132,13 +174,19 @@ class ConsumerControlReport(Report):
         pack_into('<H', self.buffer, 0, cc.code)
         self.pending = True
 
-    def remove_cc(self):
-        if self.buffer != b'\x00\x00':
-            self.buffer = b'\x00\x00'
+    def remove_cc(self, cc=None):
+        # Only one usage fits the report, releasing a key that has since been
+        # replaced by another one leaves the report alone.
+        buffer = self.buffer
+        if cc is not None and buffer[0] | (buffer[1] << 8) != cc.code:
+            return
+        if buffer[0] or buffer[1]:
+            buffer[0] = 0x00
+            buffer[1] = 0x00
             self.pending = True
 
     def get_action_map(self):
-        return {ConsumerKey: self.add_cc}
+        return {ConsumerKey: (self.add_cc, self.remove_cc)}
 
 
 class PointingDeviceReport(Report):
@@ -154,17 +202,34 @@ class PointingDeviceReport(Report):
         self.pending = True
 
     def move_axis(self, axis):
-        delta = clamp(axis.delta, -127, 127)
-        axis.delta -= delta
         try:
+            # Add to movement that hasn't been sent yet
+            current = self.buffer[axis.code + 1]
+            if current > 127:
+                current -= 256
+            delta = clamp(current + axis.delta, -127, 127)
+            axis.delta -= delta - current
             self.buffer[axis.code + 1] = 0xFF & delta
             self.pending = True
         except IndexError:
+            axis.delta = 0
             if debug.enabled:
                 debug(axis, ' not supported')
 
+    def sent(self):
+        # Movement is relative: once reported, the axes go back to rest and
+        # the next report says so.
+        buffer = self.buffer
+        for idx in range(1, len(buffer)):
+            if buffer[idx]:
+                buffer[idx] = 0x00
+                self.pending = True
+
     def get_action_map(self):
-        return {Axis: self.move_axis, MouseKey: self.add_button}
+        return {
+            Axis: (self.move_axis, None),
+            MouseKey: (self.add_button, self.remove_button),
+        }
 
 
 class HSPointingDeviceReport(PointingDeviceReport):
@@ -176,24 +241,152 @@ class AbstractHID:
     def __init__(self):
         self.report_map = {}
         self.device_map = {}
+        # Keys currently applied to the reports, in a list that is allocated
+        # once so that tracking presses and releases doesn't allocate.
+        self._applied = [None] * _APPLIED_KEYS
+        self._applied_count = 0
+        # Changes applied since the last `send`: whether any, whether a key
+        # was pressed, and the keys that were released.
+        self._unsent = False
+        self._unsent_press = False
+        self._released = [None] * _APPLIED_KEYS
+        self._released_count = 0
+        # Reports handed to the devices, and updates merged into a report
+        # that was still waiting to be sent.
+        self.reports_sent = 0
+        self.reports_coalesced = 0
+        self.last_send = None
         self._setup_task = create_task(self.setup, period_ms=100)
 
     def __repr__(self):
         return self.__class__.__name__
 
     def create_report(self, keys):
+        '''
+        Bring the reports in line with `keys`, the set of pressed keys.
+
+        Only the difference to the previous call is applied: keys that are
+        gone are removed from their report, new keys are added. Axes are
+        applied on every call, they report movement rather than state.
+
+        Changes pile up in the reports until `send`. Where merging them would
+        change what the host sees, the reports are sent first: releasing
+        anything or pressing a modifier after a press that hasn't been sent,
+        and pressing a key whose release hasn't been sent.
+        '''
+        report_map = self.report_map
+        applied = self._applied
+        count = self._applied_count
+        # Whether this call's changes join ones that are still unsent
+        merged = self._unsent
+        changed = False
+
+        idx = 0
+        while idx < count:
+            key = applied[idx]
+            if key in keys:
+                idx += 1
+                continue
+            count -= 1
+            applied[idx] = applied[count]
+            applied[count] = None
+            actions = report_map.get(type(key))
+            if actions is None or actions[1] is None:
+                continue
+            if self._unsent_press:
+                self.send()
+                merged = False
+            actions[1](key)
+            self._unsent = True
+            changed = True
+            if self._released_count < len(self._released):
+                self._released[self._released_count] = key
+                self._released_count += 1
+            else:
+                self.send()
+                merged = False
+
+        # Everything still applied is pressed, so unless there are more keys
+        # than applied ones nothing is new.
+        if len(keys) != count:
+            # A new modifier would apply to the keys pressed before it.
+            if self._unsent_press:
+                for key in keys:
+                    if type(key) is ModifierKey and key not in applied:
+                        self.send()
+                        merged = False
+                        break
+
+            for key in keys:
+                if key in applied:
+                    continue
+                actions = report_map.get(type(key))
+                if actions is not None:
+                    if actions[1] is None:
+                        actions[0](key)
+                        continue
+                    # The host has to see the release before the next press.
+                    if self._released_count and key in self._released:
+                        self.send()
+                        merged = False
+                    # A key that doesn't fit its report is retried next time.
+                    if actions[0](key) is False:
+                        continue
+                    self._unsent = True
+                    self._unsent_press = True
+                    changed = True
+                if count == len(applied):
+                    applied.extend([None] * _APPLIED_KEYS)
+                applied[count] = key
+                count += 1
+
+        self._applied_count = count
+        if merged and changed:
+            self.reports_coalesced += 1
+
+    def clear_reports(self):
+        '''Release everything and forget which keys were applied.'''
         for report in self.device_map.keys():
             report.clear()
+        for idx in range(self._applied_count):
+            self._applied[idx] = None
+        self._applied_count = 0
+        for idx in range(self._released_count):
+            self._released[idx] = None
+        self._released_count = 0
+        self._unsent = False
+        self._unsent_press = False
+
+    def send(self, window_ms=0):
+        '''
+        Send the pending reports. With `window_ms`, changes made less than
+        that long after the previous send are held back, to be merged with
+        whatever follows; returns False if the reports were held back.
+        '''
+        if (
+            window_ms
+            and self._unsent
+            and self.last_send is not None
+            and check_deadline(ticks_ms(), self.last_send, window_ms)
+        ):
+            return False
 
-        for key in keys:
-            if action := self.report_map.get(type(key)):
-                action(key)
-
-    def send(self):
+        sent = self.reports_sent
         for report in self.device_map.keys():
             if report.pending:
                 self.device_map[report].send_report(report.buffer)
                 report.pending = False
+                report.sent()
+                self.reports_sent += 1
+        if self.reports_sent != sent:
+            self.last_send = ticks_ms()
+
+        self._unsent = False
+        self._unsent_press = False
+        for idx in range(self._released_count):
+            self._released[idx] = None
+        self._released_count = 0
+        return True
 
     def setup(self):
         if not self.connected:
@@ -203,6 +396,9 @@ class AbstractHID:
             self.setup_keyboard_hid()
             self.setup_consumer_control()
             self.setup_mouse_hid()
+            # Keys pressed before the reports existed were tracked without
+            # being applied.
+            self.clear_reports()
 
             cancel_task(self._setup_task)
             self._setup_task = None
@@ -3,6 +3,8 @@ try:
 except ImportError:
     pass
 
+from array import array
+
 import kmk.handlers.stock as handlers
 from kmk.utils import Debug
 
@@ -340,30 +342,70 @@ KEY_GENERATORS = (
 
 
 class KeyAttrDict:
-    # Instead of relying on the uncontrollable availability of a big chunk of
-    # contiguous memory for key caching, we can manually fragment the cache into
-    # reasonably small partitions. The partition size is chosen from the magic
-    # values of CPs hash allocation sizes.
-    # (https://github.com/adafruit/circuitpython/blob/main/py/map.c, 2023-02)
-    __partition_size = 37
-    __cache = [{}]
+    # Every name lives in one sorted list, next to the slot of its key in
+    # `__slots`; aliases share the slot of their key. That is two small
+    # entries per name instead of a hash table entry, and names given to
+    # `make_key` are literals, so the strings themselves cost no RAM.
+    # Distinct keys are kept in `__keys`, with their canonical name (the
+    # first one they were registered with) in `__canonical`. `__slot_of`,
+    # from key back to its slot, is only built once `get_name` needs it;
+    # until then a key registered again apart from its other names gets a
+    # slot of its own, which `get_name` resolves to the first one.
+    __names = []
+    __slots = array('H')
+    __keys = []
+    __canonical = []
+    __slot_of = None
+    # Optional `func(name)` returning the index into `KEY_GENERATORS` of the
+    # generator making `name`, -1 if none does, or None if it doesn't know.
+    __generator_index = None
 
     def __iter__(self):
-        for partition in self.__cache:
-            for name in partition:
-                yield name
+        for name in self.__names:
+            yield name
+
+    def __find(self, name: str) -> int:
+        names = self.__names
+        lo = 0
+        hi = len(names)
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if names[mid] < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __slot(self, key: Key) -> int:
+        slot_of = self.__slot_of
+        if slot_of is None:
+            keys = self.__keys
+            # make_key registers all names of a key in a row
+            if keys and keys[-1] is key:
+                return len(keys) - 1
+            return -1
+        try:
+            return slot_of.get(key, -1)
+        except TypeError:
+            return -1
 
     def __setitem__(self, name: str, key: Key):
-        # Overwrite existing reference.
-        for partition in self.__cache:
-            if name in partition:
-                partition[name] = key
-                return key
-
-        # Insert new reference.
-        if len(self.__cache[-1]) >= self.__partition_size:
-            self.__cache.append({})
-        self.__cache[-1][name] = key
+        slot = self.__slot(key)
+        if slot < 0:
+            slot = len(self.__keys)
+            self.__keys.append(key)
+            self.__canonical.append(name)
+            if self.__slot_of is not None:
+                self.__slot_of[key] = slot
+
+        names = self.__names
+        idx = self.__find(name)
+        if idx < len(names) and names[idx] == name:
+            # Overwrite existing reference.
+            self.__slots[idx] = slot
+        else:
+            names.insert(idx, name)
+            self.__slots[idx:idx] = array('H', (slot,))
         return key
 
     def __getattr__(self, name: str):
@@ -375,19 +417,62 @@ class KeyAttrDict:
         except Exception:
             return default
 
+    def get_cached(self, name: str) -> Optional[Key]:
+        '''Look `name` up without generating a key if it doesn't exist yet.'''
+        names = self.__names
+        idx = self.__find(name)
+        if idx < len(names) and names[idx] == name:
+            return self.__keys[self.__slots[idx]]
+
+    def get_name(self, key: Key) -> Optional[str]:
+        '''Canonical name of `key`, None for keys that aren't in `KC`.'''
+        if self.__slot_of is None:
+            slot_of = {}
+            for slot, known in enumerate(self.__keys):
+                try:
+                    if known not in slot_of:
+                        slot_of[known] = slot
+                except TypeError:
+                    pass
+            KeyAttrDict.__slot_of = slot_of
+        slot = self.__slot(key)
+        if slot < 0:
+            return None
+        return self.__canonical[slot]
+
+    def set_generator_index(self, index: Optional[Callable[[str], int]]) -> None:
+        '''
+        Let `index(name)` pick the generator for names that aren't cached
+        instead of trying all of `KEY_GENERATORS` in turn.
+        '''
+        self.__generator_index = index
+
     def clear(self):
-        self.__cache.clear()
-        self.__cache.append({})
+        self.__names.clear()
+        self.__slots[:] = array('H')
+        self.__keys.clear()
+        self.__canonical.clear()
+        KeyAttrDict.__slot_of = None
 
     def __getitem__(self, name: str):
-        for partition in self.__cache:
-            if name in partition:
-                return partition[name]
+        key = self.get_cached(name)
+        if key is not None:
+            return key
+
+        maybe_key = None
+        generator = None
+        if self.__generator_index is not None:
+            generator = self.__generator_index(name)
 
-        for func in KEY_GENERATORS:
-            maybe_key = func(name)
-            if maybe_key:
-                break
+        if generator is not None and generator >= 0:
+            maybe_key = KEY_GENERATORS[generator](name)
+
+        # A stale index is no worse than none
+        if generator is None or (generator >= 0 and not maybe_key):
+            for func in KEY_GENERATORS:
+                maybe_key = func(name)
+                if maybe_key:
+                    break
 
         if not maybe_key:
             if debug.enabled:
@@ -405,6 +490,8 @@ KC = KeyAttrDict()
 class Key:
     '''Generic Key class with assignable handlers.'''
 
+    __slots__ = ('_on_press', '_on_release')
+
     def __init__(
         self,
         on_press: Callable[[object, Key, Keyboard, ...], None] = handlers.passthrough,
@@ -426,6 +513,8 @@ class Key:
 class _DefaultKey(Key):
     '''Meta class implementing handlers for Keys with HID codes.'''
 
+    __slots__ = ('code',)
+
     def __init__(self, code: Optional[int] = None):
         self.code = code
 
@@ -449,10 +538,12 @@ class _DefaultKey(Key):
 
 
 class KeyboardKey(_DefaultKey):
-    pass
+    __slots__ = ()
 
 
 class ModifierKey(_DefaultKey):
+    __slots__ = ()
+
     def __call__(self, key: Key) -> Key:
         # don't duplicate when applying the same modifier twice
         if (
@@ -463,10 +554,14 @@ class ModifierKey(_DefaultKey):
         elif isinstance(key, ModifierKey) and key.code & self.code == key.code:
             return key
 
+        # Not interned: each use needs a modifier of its own, see
+        # `ModifiedKey.on_press` and `implicit_modifier`.
         return ModifiedKey(key, self)
 
 
 class ModifiedKey(Key):
+    __slots__ = ('key', 'modifier')
+
     def __init__(self, code: [Key, int], modifier: [ModifierKey]):
         # generate from code by maybe_make_shifted_key
         if isinstance(code, int):
@@ -521,11 +616,11 @@ class ModifiedKey(Key):
 
 
 class ConsumerKey(_DefaultKey):
-    pass
+    __slots__ = ()
 
 
 class MouseKey(_DefaultKey):
-    pass
+    __slots__ = ()
 
 
 def make_key(
@@ -555,19 +650,36 @@ def make_key(
 
 # Argumented keys are implicitly internal, so auto-gen of code
 # is almost certainly the best plan here
+#
+# Keys of stateless constructors can be `intern`ed: calls with the same
+# positional arguments then return the same key instead of a new one each.
 def make_argumented_key(
     names: Tuple[str, ...],
     constructor: [Key, Callable[[...], Key]],
+    intern: bool = False,
     **_kwargs,
 ) -> Key:
+    interned = {} if intern else None
 
     def argumented_key(*args, **kwargs) -> Key:
+        if interned is not None and not kwargs:
+            try:
+                return interned[args]
+            except KeyError:
+                pass
+            except TypeError:
+                # Unhashable arguments
+                return constructor(*args, **_kwargs)
+
         # This is a very ugly workaround for missing syntax in mpy-cross 8.x
         # and, once EOL, can be replaced by:
         # return constructor(*args, **_kwargs, **kwargs)
         k = _kwargs.copy()
         k.update(**kwargs)
-        return constructor(*args, **k)
+        key = constructor(*args, **k)
+        if interned is not None and not kwargs:
+            interned[args] = key
+        return key
 
     for name in names:
         KC[name] = argumented_key
@@ -3,20 +3,116 @@ try:
 except ImportError:
     pass
 
-from collections import namedtuple
 from keypad import Event as KeyEvent
+from micropython import const
+from time import sleep
 
+from kmk.extensions import Extension
 from kmk.hid import BLEHID, USBHID, AbstractHID, HIDModes
-from kmk.keys import KC, Axis, Key
+from kmk.keys import AX, KC, Key
 from kmk.modules import Module
 from kmk.scanners.keypad import MatrixScanner
-from kmk.scheduler import Task, cancel_task, create_task, get_due_task
+from kmk.scheduler import (
+    Task,
+    cancel_task,
+    create_task,
+    get_due_task,
+    next_due_ms,
+)
 from kmk.utils import Debug
 
 debug = Debug('kmk.keyboard')
 
-KeyBufferFrame = namedtuple(
-    'KeyBufferFrame', ('key', 'is_pressed', 'int_coord', 'index')
+_RESUME_BUFFER_SIZE = const(16)
+# Longest single sleep while idle, how late a key event may be noticed
+_IDLE_NAP_MS = const(1)
+
+_AXES = (AX.P, AX.W, AX.X, AX.Y)
+
+
+class KeyBufferFrame:
+    __slots__ = ('key', 'is_pressed', 'int_coord', 'index')
+
+    def __init__(self, key=None, is_pressed=False, int_coord=None, index=0):
+        self.key = key
+        self.is_pressed = is_pressed
+        self.int_coord = int_coord
+        self.index = index
+
+
+class KeyBuffer:
+    '''
+    FIFO of key events in a ring of preallocated, reused `KeyBufferFrame`s,
+    so that buffering and replaying key events doesn't allocate.
+
+    A frame returned by `pop` is handed back to the ring and is only valid
+    until the next `push`. If the ring is full it grows, which does
+    allocate; `overflows` counts how often that happened.
+    '''
+
+    def __init__(self, capacity: int = _RESUME_BUFFER_SIZE) -> None:
+        self._frames = [KeyBufferFrame() for _ in range(capacity)]
+        self._head = 0
+        self._len = 0
+        self.overflows = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _grow(self) -> None:
+        frames = self._frames
+        capacity = len(frames)
+        self._frames = frames[self._head :] + frames[: self._head]
+        self._frames.extend(KeyBufferFrame() for _ in range(capacity))
+        self._head = 0
+        self.overflows += 1
+
+        if debug.enabled:
+            debug('key buffer overflow: capacity=', len(self._frames))
+
+    def push(
+        self,
+        key: Key,
+        is_pressed: bool,
+        int_coord: Optional[int] = None,
+        index: int = 0,
+    ) -> None:
+        if self._len == len(self._frames):
+            self._grow()
+        frame = self._frames[(self._head + self._len) % len(self._frames)]
+        frame.key = key
+        frame.is_pressed = is_pressed
+        frame.int_coord = int_coord
+        frame.index = index
+        self._len += 1
+
+    def pop(self) -> KeyBufferFrame:
+        frame = self._frames[self._head]
+        self._head = (self._head + 1) % len(self._frames)
+        self._len -= 1
+        return frame
+
+    def promote(self, count: int) -> None:
+        '''
+        Move the `count` most recently pushed frames to the front, keeping
+        their order.
+        '''
+        frames = self._frames
+        capacity = len(frames)
+        for _ in range(count):
+            tail = (self._head + self._len - 1) % capacity
+            self._head = (self._head - 1) % capacity
+            frames[tail], frames[self._head] = frames[self._head], frames[tail]
+
+
+# Hooks dispatched through the registry, see `KMKKeyboard.subscribe`.
+HOOKS = (
+    'before_matrix_scan',
+    'after_matrix_scan',
+    'before_hid_send',
+    'after_hid_send',
+    'on_powersave_enable',
+    'on_powersave_disable',
 )
 
 
@@ -49,10 +145,32 @@ class KMKKeyboard:
         self.extensions = []
         self.sandbox = Sandbox()
 
+        # Maximum number of matrix events handled per main loop cycle. The
+        # default of 1 processes one key per cycle; larger values drain
+        # queued events (fast chords, bursts during long macros) in one go.
+        self.matrix_event_budget = 1
+
+        # Window in ms during which HID changes are merged into one report
+        # instead of being sent as they happen. 0 sends every change right
+        # away; the host's poll interval (1 ms for full speed USB, 7.5 ms or
+        # more for BLE) is a sensible upper bound. Presses and releases the
+        # host has to see separately are never merged, see
+        # `AbstractHID.create_report`.
+        self.hid_coalesce_ms = 0
+
+        # Longest the main loop sleeps at a time when there's nothing to do,
+        # in ms. It sleeps until the next scheduled task is due, at most this
+        # long, and wakes early for key events; hooks and scanners that poll
+        # pins (encoders, serial) run at least this often. 0 never sleeps.
+        self.idle_sleep_ms = 0
+
         #####
         # Internal State
         self.keys_pressed = set()
         self._coordkeys_pressed = {}
+        # Presses and releases processed; with `reports_sent` a cheap way to
+        # tell that keyboard state changed, for anything polling it.
+        self.key_changes = 0
         self.implicit_modifier = None
         self.hid_type = HIDModes.USB
         self.secondary_hid_type = None
@@ -65,8 +183,14 @@ class KMKKeyboard:
         self._trigger_powersave_enable = False
         self._trigger_powersave_disable = False
         self._go_args = None
-        self._resume_buffer = []
-        self._resume_buffer_x = []
+        self._resume_buffer = KeyBuffer()
+        self._hooks = {hook: () for hook in HOOKS}
+
+        # Resolved key per int_coord for the current layer stack, see
+        # `_find_key_in_map`.
+        self._key_table = None
+        self._key_table_keymap = None
+        self._key_table_layers = None
 
         # this should almost always be PREpended to, replaces
         # former use of reversed_active_layers which had pointless
@@ -76,6 +200,13 @@ class KMKKeyboard:
     def __repr__(self) -> str:
         return self.__class__.__name__
 
+    @property
+    def reports_sent(self) -> int:
+        '''HID reports sent so far, they only go out when something changed.'''
+        if self._hid_helper is None:
+            return 0
+        return self._hid_helper.reports_sent
+
     def _send_hid(self) -> None:
         if not self._hid_send_enabled:
             return
@@ -86,28 +217,34 @@ class KMKKeyboard:
 
         self._hid_helper.create_report(self.keys_pressed)
         try:
-            self._hid_helper.send()
+            sent = self._hid_helper.send(self.hid_coalesce_ms)
         except Exception as err:
             debug_error(self._hid_helper, 'send', err)
+            sent = True
 
-        self.hid_pending = False
+        # Reports held back stay pending, the main loop comes back for them
+        # until the coalescing window has passed.
+        self.hid_pending = not sent
 
-        for key in self.keys_pressed:
-            if isinstance(key, Axis):
-                key.move(self, 0)
+        # Axes drop out of `keys_pressed` once their movement is reported;
+        # going through them rather than the set lets `move` discard.
+        for axis in _AXES:
+            if axis in self.keys_pressed:
+                axis.move(self, 0)
 
     def _handle_matrix_report(self, kevent: KeyEvent) -> None:
         if kevent is not None:
             self._on_matrix_changed(kevent)
 
-    def _find_key_in_map(self, int_coord: int) -> Key:
-        try:
-            idx = self.coord_mapping.index(int_coord)
-        except ValueError:
-            if debug.enabled:
-                debug('no such int_coord: ', int_coord)
-            return None
+    def invalidate_key_table(self) -> None:
+        '''
+        Drop the resolved key table. Needs to be called after modifying the
+        contents of `keymap` in place; reassigning `keymap` or changing
+        `active_layers` is picked up automatically.
+        '''
+        self._key_table = None
 
+    def _resolve_key(self, idx: int) -> Key:
         key = None
         for layer in self.active_layers:
             try:
@@ -121,6 +258,36 @@ class KMKKeyboard:
 
         return key
 
+    def _build_key_table(self) -> None:
+        coord_mapping = self.coord_mapping
+        table = [None] * (max(coord_mapping) + 1) if coord_mapping else []
+        # Iterate backwards so the first index of duplicate coords wins, as
+        # with `coord_mapping.index()`.
+        for idx in range(len(coord_mapping) - 1, -1, -1):
+            table[coord_mapping[idx]] = self._resolve_key(idx)
+
+        self._key_table = table
+        self._key_table_keymap = self.keymap
+        self._key_table_layers = self.active_layers.copy()
+
+        if debug.enabled:
+            debug('key table rebuilt: active_layers=', self._key_table_layers)
+
+    def _find_key_in_map(self, int_coord: int) -> Key:
+        if (
+            self._key_table is None
+            or self._key_table_keymap is not self.keymap
+            or self._key_table_layers != self.active_layers
+        ):
+            self._build_key_table()
+
+        if 0 <= int_coord < len(self._key_table):
+            return self._key_table[int_coord]
+
+        if debug.enabled:
+            debug('no such int_coord: ', int_coord)
+        return None
+
     def _on_matrix_changed(self, kevent: KeyEvent) -> None:
         int_coord = kevent.key_number
         is_pressed = kevent.pressed
@@ -145,44 +312,41 @@ class KMKKeyboard:
         Resume the processing of buffered, delayed, deferred, etc. key events
         emitted by modules.
 
-        We use a copy of the `_resume_buffer` as a working buffer. The working
-        buffer holds all key events in the correct order for processing. If
-        during processing new events are pushed to the `_resume_buffer`, they
-        are prepended to the working buffer (which may not be emptied), in
-        order to preserve key event order.
-        We also double-buffer `_resume_buffer` with `_resume_buffer_x`, only
-        copying the reference to hopefully safe some time on allocations.
+        Events are replayed in order. If during processing new events are
+        pushed to the `_resume_buffer`, they are moved in front of the
+        remaining ones, in order to preserve key event order.
         '''
 
-        buffer, self._resume_buffer = self._resume_buffer, self._resume_buffer_x
+        buffer = self._resume_buffer
 
         while buffer:
-            ksf = buffer.pop(0)
+            remaining = len(buffer) - 1
+            # The frame goes back to the ring; read it before anything is
+            # pushed again.
+            ksf = buffer.pop()
             key = ksf.key
+            is_pressed = ksf.is_pressed
+            int_coord = ksf.int_coord
+            index = ksf.index
 
             # Handle any unaccounted-for layer shifts by looking up the key resolution again.
-            if ksf.int_coord is not None:
-                if ksf.is_pressed:
-                    key = self._find_key_in_map(ksf.int_coord)
+            if int_coord is not None:
+                if is_pressed:
+                    key = self._find_key_in_map(int_coord)
                 else:
-                    key = self._coordkeys_pressed.pop(ksf.int_coord, key)
+                    key = self._coordkeys_pressed.pop(int_coord, key)
 
             # Resume the processing of the key event and update the HID report
             # when applicable.
-            self.pre_process_key(key, ksf.is_pressed, ksf.int_coord, ksf.index)
+            self.pre_process_key(key, is_pressed, int_coord, index)
 
             if self.hid_pending:
                 self._send_hid()
-                self.hid_pending = False
-
-            # Any newly buffered key events must be prepended to the working
-            # buffer.
-            if self._resume_buffer:
-                self._resume_buffer.extend(buffer)
-                buffer.clear()
-                buffer, self._resume_buffer = self._resume_buffer, buffer
 
-        self._resume_buffer_x = buffer
+            # Any newly buffered key events must be processed before the
+            # remaining ones.
+            if len(buffer) > remaining:
+                buffer.promote(len(buffer) - remaining)
 
     def pre_process_key(
         self,
@@ -212,6 +376,7 @@ class KMKKeyboard:
     def process_key(
         self, key: Key, is_pressed: bool, int_coord: Optional[int] = None
     ) -> None:
+        self.key_changes += 1
         if is_pressed:
             key.on_press(self, int_coord)
         else:
@@ -226,10 +391,7 @@ class KMKKeyboard:
         reprocess: Optional[bool] = False,
     ) -> None:
         index = self.modules.index(module) + (0 if reprocess else 1)
-        ksf = KeyBufferFrame(
-            key=key, is_pressed=is_pressed, int_coord=int_coord, index=index
-        )
-        self._resume_buffer.append(ksf)
+        self._resume_buffer.push(key, is_pressed, int_coord, index)
 
     def remove_key(self, keycode: Key) -> None:
         self.process_key(keycode, False)
@@ -341,83 +503,93 @@ class KMKKeyboard:
         if debug.enabled:
             debug('extensions=', [_.__class__.__name__ for _ in self.extensions])
 
-    def before_matrix_scan(self) -> None:
-        for module in self.modules:
-            try:
-                module.before_matrix_scan(self)
-            except Exception as err:
-                debug_error(module, 'before_matrix_scan', err)
+        self._init_hooks()
 
-        for ext in self.extensions:
-            try:
-                ext.before_matrix_scan(self.sandbox)
-            except Exception as err:
-                debug_error(ext, 'before_matrix_scan', err)
+    def _init_hooks(self) -> None:
+        '''
+        Subscribe every module and extension to the hooks it implements.
+        Hooks inherited from `Module` or `Extension` only raise
+        `NotImplementedError` and are skipped, so they cost nothing per cycle.
+        '''
+        self._hooks = {hook: () for hook in HOOKS}
+        for handler in self.modules + self.extensions:
+            for hook in HOOKS:
+                method = getattr(type(handler), hook, None)
+                if method is None or method is getattr(Module, hook):
+                    continue
+                if method is getattr(Extension, hook):
+                    continue
+                self.subscribe(handler, hook)
 
-    def after_matrix_scan(self) -> None:
-        for module in self.modules:
-            try:
-                module.after_matrix_scan(self)
-            except Exception as err:
-                debug_error(module, 'after_matrix_scan', err)
+        if debug.enabled:
+            for hook, subscribers in self._hooks.items():
+                debug(hook, '=', [_[0].__class__.__name__ for _ in subscribers])
 
-        for ext in self.extensions:
-            try:
-                ext.after_matrix_scan(self.sandbox)
-            except Exception as err:
-                debug_error(ext, 'after_matrix_scan', err)
+    def _hook_rank(self, handler) -> int:
+        # Dispatch order: modules, then extensions, each in list order.
+        for idx, module in enumerate(self.modules):
+            if module is handler:
+                return idx
+        for idx, ext in enumerate(self.extensions):
+            if ext is handler:
+                return len(self.modules) + idx
+        return len(self.modules) + len(self.extensions)
 
-    def before_hid_send(self) -> None:
-        for module in self.modules:
-            try:
-                module.before_hid_send(self)
-            except Exception as err:
-                debug_error(module, 'before_hid_send', err)
+    def subscribe(self, handler, hook: str) -> None:
+        '''
+        Call `handler.<hook>()` from now on. Extensions receive the sandbox,
+        everything else the keyboard. Subscribing twice is a no-op.
+        '''
+        subscribers = self._hooks[hook]
+        for entry in subscribers:
+            if entry[0] is handler:
+                return
+
+        arg = self.sandbox if isinstance(handler, Extension) else self
+        rank = self._hook_rank(handler)
+        idx = 0
+        while idx < len(subscribers) and self._hook_rank(subscribers[idx][0]) <= rank:
+            idx += 1
+
+        # Replace rather than mutate, so that (un)subscribing from within a
+        # hook doesn't disturb the dispatch in progress.
+        subscribers = list(subscribers)
+        subscribers.insert(idx, (handler, getattr(handler, hook), arg))
+        self._hooks[hook] = tuple(subscribers)
+
+    def unsubscribe(self, handler, hook: Optional[str] = None) -> None:
+        '''
+        Stop calling `handler.<hook>()`, or all of its hooks if `hook` is None.
+        '''
+        for name in HOOKS if hook is None else (hook,):
+            self._hooks[name] = tuple(
+                entry for entry in self._hooks[name] if entry[0] is not handler
+            )
 
-        for ext in self.extensions:
+    def _dispatch(self, hook: str) -> None:
+        for handler, method, arg in self._hooks[hook]:
             try:
-                ext.before_hid_send(self.sandbox)
+                method(arg)
             except Exception as err:
-                debug_error(ext, 'before_hid_send', err)
+                debug_error(handler, hook, err)
 
-    def after_hid_send(self) -> None:
-        for module in self.modules:
-            try:
-                module.after_hid_send(self)
-            except Exception as err:
-                debug_error(module, 'after_hid_send', err)
+    def before_matrix_scan(self) -> None:
+        self._dispatch('before_matrix_scan')
 
-        for ext in self.extensions:
-            try:
-                ext.after_hid_send(self.sandbox)
-            except Exception as err:
-                debug_error(ext, 'after_hid_send', err)
+    def after_matrix_scan(self) -> None:
+        self._dispatch('after_matrix_scan')
 
-    def powersave_enable(self) -> None:
-        for module in self.modules:
-            try:
-                module.on_powersave_enable(self)
-            except Exception as err:
-                debug_error(module, 'powersave_enable', err)
+    def before_hid_send(self) -> None:
+        self._dispatch('before_hid_send')
 
-        for ext in self.extensions:
-            try:
-                ext.on_powersave_enable(self.sandbox)
-            except Exception as err:
-                debug_error(ext, 'powersave_enable', err)
+    def after_hid_send(self) -> None:
+        self._dispatch('after_hid_send')
 
-    def powersave_disable(self) -> None:
-        for module in self.modules:
-            try:
-                module.on_powersave_disable(self)
-            except Exception as err:
-                debug_error(module, 'powersave_disable', err)
+    def powersave_enable(self) -> None:
+        self._dispatch('on_powersave_enable')
 
-        for ext in self.extensions:
-            try:
-                ext.on_powersave_disable(self.sandbox)
-            except Exception as err:
-                debug_error(ext, 'powersave_disable', err)
+    def powersave_disable(self) -> None:
+        self._dispatch('on_powersave_disable')
 
     def deinit(self) -> None:
         for module in self.modules:
@@ -441,6 +613,8 @@ class KMKKeyboard:
             )
             while True:
                 self._main_loop()
+                if self.idle_sleep_ms:
+                    self._idle()
         except Exception as err:
             import traceback
 
@@ -480,13 +654,7 @@ class KMKKeyboard:
             gc.collect()
             debug('mem_info used:', gc.mem_alloc(), ' free:', gc.mem_free())
 
-    def _main_loop(self) -> None:
-        self.sandbox.active_layers = self.active_layers.copy()
-
-        self.before_matrix_scan()
-
-        self._process_resume_buffer()
-
+    def _scan_matrix(self) -> None:
         for matrix in self.matrix:
             update = matrix.scan_for_changes()
             if update:
@@ -505,10 +673,60 @@ class KMKKeyboard:
             self.matrix_update_queue.append(self.matrix_update)
             self.matrix_update = None
 
-        # only handle one key per cycle.
-        if self.matrix_update_queue:
+    def _idle(self) -> None:
+        '''
+        Sleep until the next task is due, for at most `idle_sleep_ms`, unless
+        the last cycle left work behind or key events are waiting.
+        '''
+        if self.hid_pending or self.matrix_update_queue or self._resume_buffer:
+            return
+
+        wait = next_due_ms()
+        if wait is None or wait > self.idle_sleep_ms:
+            wait = self.idle_sleep_ms
+
+        # Naps rather than one long sleep so that a key press cuts it short;
+        # the keypad's background scan and USB keep running while asleep.
+        while wait > 0:
+            for matrix in self.matrix:
+                if matrix.pending:
+                    return
+            nap = min(wait, _IDLE_NAP_MS)
+            sleep(nap / 1000)
+            wait -= nap
+
+    def _main_loop(self) -> None:
+        self.sandbox.active_layers = self.active_layers.copy()
+
+        self.before_matrix_scan()
+
+        self._process_resume_buffer()
+
+        self._scan_matrix()
+
+        # Handle up to `matrix_event_budget` keys per cycle. Further events
+        # are only scanned once the previous one has been processed in full,
+        # timeouts, deferred key events and HID report included, so modules
+        # see the same sequence as with one key per cycle. Of the hooks,
+        # `after_matrix_scan` runs again for every rescan in between;
+        # `before_matrix_scan`, `before_hid_send` and `after_hid_send` run
+        # once per cycle.
+        budget = self.matrix_event_budget
+        while self.matrix_update_queue:
             self._handle_matrix_report(self.matrix_update_queue.pop(0))
 
+            budget -= 1
+            if budget <= 0:
+                break
+
+            if self.hid_pending:
+                self._send_hid()
+            self._process_timeouts()
+            if self.hid_pending:
+                self._send_hid()
+            self._process_resume_buffer()
+            self._scan_matrix()
+
         self.before_hid_send()
 
         if self.hid_pending:
@@ -31,6 +31,15 @@ class HoldTapKeyState:
 
 
 class HoldTapKey(Key):
+    __slots__ = (
+        'tap',
+        'hold',
+        'prefer_hold',
+        'tap_interrupted',
+        'tap_time',
+        'repeat',
+    )
+
     def __init__(
         self,
         tap,
@@ -68,12 +77,6 @@ class HoldTap(Module):
     def during_bootup(self, keyboard):
         return
 
-    def before_matrix_scan(self, keyboard):
-        return
-
-    def after_matrix_scan(self, keyboard):
-        return
-
     def process_key(self, keyboard, key, is_pressed, int_coord):
         '''Handle holdtap being interrupted by another key press/release.'''
         current_key = key
@@ -123,12 +126,6 @@ class HoldTap(Module):
 
         return current_key
 
-    def before_hid_send(self, keyboard):
-        return
-
-    def after_hid_send(self, keyboard):
-        return
-
     def on_powersave_enable(self, keyboard):
         return
 
@@ -21,6 +21,8 @@ def tt_key(layer, prefer_hold=True, **kwargs):
 
 
 class LayerKey(Key):
+    __slots__ = ('layer', 'key')
+
     def __init__(self, layer, key=None, **kwargs):
         super().__init__(**kwargs)
         self.layer = layer
@@ -39,33 +41,39 @@ class Layers(HoldTap):
         make_argumented_key(
             names=('MO',),
             constructor=LayerKey,
+            intern=True,
             on_press=self._mo_pressed,
             on_release=self._mo_released,
         )
         make_argumented_key(
             names=('FD',),
             constructor=LayerKey,
+            intern=True,
             on_press=self._fd_pressed,
         )
         make_argumented_key(
             names=('DF',),
             constructor=LayerKey,
+            intern=True,
             on_press=self._df_pressed,
         )
         make_argumented_key(
             names=('LM',),
             constructor=LayerKey,
+            intern=True,
             on_press=self._lm_pressed,
             on_release=self._lm_released,
         )
         make_argumented_key(
             names=('TG',),
             constructor=LayerKey,
+            intern=True,
             on_press=self._tg_pressed,
         )
         make_argumented_key(
             names=('TO',),
             constructor=LayerKey,
+            intern=True,
             on_press=self._to_pressed,
         )
         make_argumented_key(
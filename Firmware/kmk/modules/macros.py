@@ -15,6 +15,15 @@ _ON_RELEASE = const(4)
 
 
 class MacroKey(Key):
+    __slots__ = (
+        'on_press_macro',
+        'on_hold_macro',
+        'on_release_macro',
+        'blocking',
+        'state',
+        '_task',
+    )
+
     def __init__(
         self,
         *args,
@@ -39,6 +48,8 @@ class MacroKey(Key):
 
 
 class UnicodeModeKey(Key):
+    __slots__ = ('mode',)
+
     def __init__(self, mode, **kwargs):
         super().__init__(**kwargs)
         self.mode = mode
@@ -195,12 +206,6 @@ class Macros(Module):
     def during_bootup(self, keyboard):
         return
 
-    def before_matrix_scan(self, keyboard):
-        return
-
-    def after_matrix_scan(self, keyboard):
-        return
-
     def process_key(self, keyboard, key, is_pressed, int_coord):
         # Passthrough if there are no active macros, or the key belongs to an
         # active macro, or all active macros or non-blocking.
@@ -209,12 +214,6 @@ class Macros(Module):
 
         self.key_buffer.append((int_coord, key, is_pressed))
 
-    def before_hid_send(self, keyboard):
-        return
-
-    def after_hid_send(self, keyboard):
-        return
-
     def on_powersave_enable(self, keyboard):
         return
 
@@ -29,6 +29,14 @@ class Scanner:
     def key_count(self):
         raise NotImplementedError
 
+    @property
+    def pending(self):
+        '''
+        True if events are queued for `scan_for_changes`. Scanners that poll
+        their pins only know when they're scanned and always say False.
+        '''
+        return False
+
     def scan_for_changes(self):
         '''
         Scan for key events and return a key report if an event exists.
@@ -3,6 +3,9 @@ Here we're abusing _asyncios TaskQueue to implement a very simple priority
 queue task scheduler.
 Despite documentation, Circuitpython doesn't usually ship with a min-heap
 module; it does however implement a pairing-heap for `TaskQueue` in native code.
+
+With `KMK_SCHEDULER = "wheel"` in settings.toml the timing wheel from
+`kmk.scheduler_wheel` is used instead.
 '''
 
 try:
@@ -10,6 +13,7 @@ try:
 except ImportError:
     pass
 
+from os import getenv
 from supervisor import ticks_ms
 
 from _asyncio import Task, TaskQueue
@@ -73,3 +77,25 @@ def cancel_task(t: [Task, PeriodicTaskMeta]) -> None:
     if isinstance(t, PeriodicTaskMeta):
         t = t._task
     _task_queue.remove(t)
+
+
+def next_due_ms() -> [int, None]:
+    '''
+    Milliseconds until the next task is due, 0 if one is due already and
+    `None` if nothing is scheduled.
+    '''
+    t = _task_queue.peek()
+    if not t:
+        return None
+    return max(0, ticks_diff(t.ph_key, ticks_ms()))
+
+
+if getenv('KMK_SCHEDULER') == 'wheel':
+    from kmk.scheduler_wheel import (  # noqa: F811
+        PeriodicTaskMeta,
+        Task,
+        cancel_task,
+        create_task,
+        get_due_task,
+        next_due_ms,
+    )
@@ -0,0 +1,212 @@
+'''
+A hashed timing wheel with the same API as `kmk.scheduler`.
+
+Tasks hang off one of `_WHEEL_SIZE` slots, one per millisecond, picked by
+their deadline modulo the wheel size; tasks due further out than one turn
+share slots with nearer ones and are skipped until their turn comes. Slots
+are intrusive doubly linked lists through the tasks themselves, so
+scheduling, rescheduling and cancelling are O(1) and don't allocate, and a
+`Task` can be re-armed as often as needed. Tasks that are already due when
+scheduled go to a separate FIFO that `get_due_task` drains first.
+
+`get_due_task` walks the slots from where the previous call stopped up to
+the current tick; the main loop calls it every cycle, so that's usually one
+or two slots. After a long stall the walk is capped at one turn of the
+wheel.
+
+Selected instead of the TaskQueue scheduler with `KMK_SCHEDULER = "wheel"`
+in settings.toml, see `kmk.scheduler`.
+'''
+
+try:
+    from typing import Callable
+except ImportError:
+    pass
+
+from micropython import const
+from supervisor import ticks_ms
+
+from kmk.kmktime import ticks_add, ticks_diff
+
+_WHEEL_SIZE = const(64)
+_WHEEL_MASK = const(_WHEEL_SIZE - 1)
+# Extra list after the wheel slots for tasks that are due already
+_DUE = const(_WHEEL_SIZE)
+_UNQUEUED = const(-1)
+# See kmk.kmktime
+_TICKS_MAX = const((1 << 29) - 1)
+_TICKS_HALFPERIOD = const(1 << 28)
+
+# First and last task of every slot
+_heads = [None] * (_WHEEL_SIZE + 1)
+_tails = [None] * (_WHEEL_SIZE + 1)
+# Number of tasks on the wheel, not counting the due list
+_queued = 0
+# Next tick whose slot hasn't been walked yet
+_cursor = ticks_ms()
+
+
+class Task:
+    __slots__ = ('coro', 'deadline', '_slot', '_prev', '_next')
+
+    def __init__(self, coro: Callable[[None], None]) -> None:
+        self.coro = coro
+        self.deadline = 0
+        self._slot = _UNQUEUED
+        self._prev = None
+        self._next = None
+
+
+def _link(t: Task, slot: int) -> None:
+    t._slot = slot
+    t._next = None
+    t._prev = _tails[slot]
+    if t._prev is None:
+        _heads[slot] = t
+    else:
+        t._prev._next = t
+    _tails[slot] = t
+
+
+def _unlink(t: Task) -> None:
+    global _queued
+
+    slot = t._slot
+    if t._prev is None:
+        _heads[slot] = t._next
+    else:
+        t._prev._next = t._next
+    if t._next is None:
+        _tails[slot] = t._prev
+    else:
+        t._next._prev = t._prev
+    if slot != _DUE:
+        _queued -= 1
+    t._slot = _UNQUEUED
+    t._prev = None
+    t._next = None
+
+
+def _schedule(t: Task, deadline: int) -> None:
+    global _queued
+
+    if t._slot != _UNQUEUED:
+        _unlink(t)
+    t.deadline = deadline
+    if ticks_diff(deadline, _cursor) < 0:
+        _link(t, _DUE)
+    else:
+        _link(t, deadline & _WHEEL_MASK)
+        _queued += 1
+
+
+class PeriodicTaskMeta:
+    def __init__(self, func: Callable[[None], None], period: int) -> None:
+        self._task = Task(self.call)
+        self._coro = func
+        self.period = period
+
+    def call(self) -> None:
+        _schedule(self._task, ticks_add(self._task.deadline, self.period))
+        self._coro()
+
+    def restart(self) -> None:
+        _schedule(self._task, ticks_ms())
+
+
+def create_task(
+    func: [Callable[[None], None], Task, PeriodicTaskMeta],
+    *,
+    after_ms: int = 0,
+    period_ms: int = 0,
+) -> [Task, PeriodicTaskMeta]:
+    if isinstance(func, Task):
+        t = r = func
+    elif isinstance(func, PeriodicTaskMeta):
+        r = func
+        t = r._task
+    elif period_ms:
+        r = PeriodicTaskMeta(func, period_ms)
+        t = r._task
+    else:
+        t = r = Task(func)
+
+    if after_ms > 0:
+        _schedule(t, ticks_add(ticks_ms(), after_ms))
+    elif after_ms == 0:
+        _schedule(t, ticks_ms())
+
+    return r
+
+
+def _pop_due(now: int) -> [Task, None]:
+    global _cursor
+
+    t = _heads[_DUE]
+    if t is not None:
+        _unlink(t)
+        return t
+
+    if not _queued:
+        _cursor = (now + 1) & _TICKS_MAX
+        return None
+
+    lag = ticks_diff(now, _cursor)
+    if lag >= _WHEEL_SIZE:
+        lag = _WHEEL_SIZE - 1
+        _cursor = (now - lag) & _TICKS_MAX
+
+    while lag >= 0:
+        t = _heads[_cursor & _WHEEL_MASK]
+        while t is not None:
+            # Same as ticks_diff(t.deadline, now) <= 0
+            if (now - t.deadline) & _TICKS_MAX < _TICKS_HALFPERIOD:
+                _unlink(t)
+                return t
+            t = t._next
+        _cursor = (_cursor + 1) & _TICKS_MAX
+        lag -= 1
+
+    return None
+
+
+def get_due_task() -> [Callable, None]:
+    now = ticks_ms()
+    while True:
+        t = _pop_due(now)
+        if t is None:
+            break
+        yield t.coro
+
+
+def cancel_task(t: [Task, PeriodicTaskMeta]) -> None:
+    if isinstance(t, PeriodicTaskMeta):
+        t = t._task
+    if t._slot != _UNQUEUED:
+        _unlink(t)
+
+
+def next_due_ms() -> [int, None]:
+    '''
+    Milliseconds until the next task is due, 0 if one is due already and
+    `None` if nothing is scheduled.
+    '''
+    if _heads[_DUE] is not None:
+        return 0
+    if not _queued:
+        return None
+
+    # Walking the slots from the cursor, a task due within the current turn
+    # is never beaten by one in a later slot.
+    nearest = None
+    for lap in range(_WHEEL_SIZE):
+        t = _heads[(_cursor + lap) & _WHEEL_MASK]
+        while t is not None:
+            wait = ticks_diff(t.deadline, _cursor)
+            if nearest is None or wait < nearest:
+                nearest = wait
+            t = t._next
+        if nearest is not None and nearest <= lap:
+            break
+
+    return max(0, ticks_diff(ticks_add(_cursor, nearest), ticks_ms()))
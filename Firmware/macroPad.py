@@ -26,6 +26,11 @@ class Kpad(KMKKeyboard):
             debounce_threshold=1, # Number of samples needed to change state, values greater than 1 enable debouncing. Only applicable for CircuitPython >= 9.2.0
             max_events=64
         )
+        # handle every queued key event of a full 12 key chord in one cycle
+        self.matrix_event_budget = 12
+        # sleep between cycles while idle; short enough that the encoder,
+        # which is polled every cycle, doesn't miss steps
+        self.idle_sleep_ms = 2
 
 
         self.i2c = i2c
@@ -37,14 +42,13 @@ class Kpad(KMKKeyboard):
         if Kpad_oled:
             from display.display import Display, BitmapLogoScene, SelectionScene
             
+            # Scenes are built when first shown, the logo at boot and the
+            # layer picker once the encoder is used
             scenes = [
-                BitmapLogoScene("/display/bmp/kpad_v1_0_kPad.bmp"),
-                SelectionScene(layers_names=self.layer_names)
+                lambda: BitmapLogoScene("/display/bmp/kpad_v1_0_kPad.bmp"),
+                lambda: SelectionScene(layers_names=self.layer_names)
             ]
 
-            for scene in scenes:
-                scene.keyboard = self
-            # Initialize display with all scenes
             self.oled = Display(self.i2c, scenes, width=128, height=32, rotation=180)
             self.extensions.append(self.oled)
 
@@ -6,7 +6,7 @@ from kmk.keys import KC
 import board
 import busio
 import displayio
-import sys
+import usb_cdc
 
 import time
 from kmk.keys import Key
@@ -19,6 +19,10 @@ from kmk.modules.holdtap import HoldTap
 from kmk.modules.macros import Macros
 from display.display import DisplayScene
 from kmk.modules import Module
+from comms import protocol
+from comms.keylookup import resolve_key
+from comms.reader import SerialReader
+from config.store import DEFAULT_PATH, MAX_NAME_BYTES, KeymapStore
 
 # Custom Serial Communication Module
 class SerialCommandModule(Module):
@@ -26,50 +30,85 @@ class SerialCommandModule(Module):
         super().__init__()
         self.last_check = 0
         self.check_interval = 0.05  # Check every 50ms
+        self.read_budget_us = 1000  # Max time spent reading per loop
+        self.reader = None
+        self.verbose = True
+        self.keymap_names = None  # "KC.X" strings per layer, for layer hashes
         
     def during_bootup(self, keyboard):
         """Called during keyboard initialization"""
         self.keyboard = keyboard
+        if usb_cdc.console is not None:
+            self.reader = SerialReader(usb_cdc.console, budget_us=self.read_budget_us)
         print("SerialCommandModule initialized")
         
     def before_matrix_scan(self, keyboard):
         """Called before each matrix scan - perfect for serial processing"""
         current_time = time.monotonic()
-        if current_time - self.last_check > self.check_interval:
+        # Keep reading every loop while a message is only partially in
+        pending = self.reader is not None and self.reader.pending
+        if pending or current_time - self.last_check > self.check_interval:
             self.process_serial_command()
             self.last_check = current_time
 
-    def after_matrix_scan(self, keyboard):
-        """Called after matrix scan - implement to avoid NotImplementedError"""
-        pass
-    
-    def before_hid_send(self, keyboard):
-        """Called before HID report is sent - implement to avoid NotImplementedError"""
-        pass
-    
-    def after_hid_send(self, keyboard):
-        """Called after HID report is sent - implement to avoid NotImplementedError"""
-        pass
-    
     def string_to_keycode(self, key_string):
         """Convert string like 'KC.A' to actual keycode"""
         key_string = key_string.strip()
         if key_string.startswith('KC.'):
             key_name = key_string[3:]
             try:
-                keycode = getattr(KC, key_name)
-                print(f"Converted '{key_string}' to keycode successfully")
+                keycode = resolve_key(key_name)
+                if keycode is None:
+                    keycode = getattr(KC, key_name)
+                self.log(f"Converted '{key_string}' to keycode successfully")
                 return keycode
             except AttributeError:
-                print(f"Warning: Unknown key '{key_string}', using KC.NO")
+                self.log(f"Warning: Unknown key '{key_string}', using KC.NO")
                 return KC.NO
         else:
-            print(f"Warning: Invalid key format '{key_string}', using KC.NO")
+            self.log(f"Warning: Invalid key format '{key_string}', using KC.NO")
             return KC.NO
 
+    def key_name(self, key):
+        """"KC.X" name of a key that is already in the keymap"""
+        name = KC.get_name(key)
+        if name is None:
+            return str(key)
+        return "KC." + name
+
+    def layer_key_names(self):
+        """Key names of every layer, as sent by the GUI or looked up once"""
+        keymap = self.keyboard.keymap
+        if self.keymap_names is None:
+            self.keymap_names = []
+        names = self.keymap_names
+        while len(names) < len(keymap):
+            names.append([self.key_name(key) for key in keymap[len(names)]])
+        return names
+
+    def layer_hashes(self):
+        """Content hash of every layer, the GUI only sends layers that differ"""
+        layer_names = self.keyboard.layer_names
+        return [
+            protocol.layer_hash(layer_names[idx] if idx < len(layer_names) else None, keys)
+            for idx, keys in enumerate(self.layer_key_names())
+        ]
+
+    def ensure_layer(self, layer):
+        """Make sure the keymap and layer names go up to `layer`"""
+        names = self.layer_key_names()
+        keymap = self.keyboard.keymap
+        while len(keymap) <= layer:
+            keymap.append([KC.NO] * len(keymap[0]))
+            names.append(["KC.NO"] * len(keymap[0]))
+
+        layer_names = self.keyboard.layer_names
+        if len(layer_names) <= layer:
+            layer_names.extend([None] * (layer - len(layer_names) + 1))
+
     def update_keymap_from_bindings(self, keybindings, layer=0):
         """Update the keyboard's keymap with new key bindings"""
-        print(f"Updating layer {layer} with {len(keybindings)} key bindings")
+        self.log(f"Updating layer {layer} with {len(keybindings)} key bindings")
         
         new_keycodes = []
         for key_string in keybindings:
@@ -77,25 +116,77 @@ class SerialCommandModule(Module):
             new_keycodes.append(keycode)
         
         # Make sure we have enough layers
-        while len(self.keyboard.keymap) <= layer:
-            self.keyboard.keymap.append([KC.NO] * len(self.keyboard.keymap[0]))
+        self.ensure_layer(layer)
         
         # Update the specific layer
         self.keyboard.keymap[layer] = new_keycodes
-        print(f"Keymap layer {layer} updated with {len(new_keycodes)} keys")
+        self.keymap_names[layer] = [key_string.strip() for key_string in keybindings]
+        self.keyboard.invalidate_key_table()
+        self.keymap_changed()
+        self.log(f"Keymap layer {layer} updated with {len(new_keycodes)} keys")
+
+    def patch_keymap(self, changes, layer_names=()):
+        """
+        Replace single keys in place, `changes` are [layer, index, "KC.X"].
+        Only layers the device has can be patched, new ones are sent whole.
+        """
+        keymap = self.keyboard.keymap
+        keys_per_layer = len(keymap[0])
+        for layer, index, _ in changes:
+            if not 0 <= layer < len(keymap):
+                raise ValueError(f"Layer {layer} out of range")
+            if not 0 <= index < keys_per_layer:
+                raise ValueError(f"Key index {index} out of range on layer {layer}")
+        for layer, name in layer_names:
+            if not 0 <= layer < len(keymap):
+                raise ValueError(f"Layer {layer} out of range")
+            if len((name or "").encode()) > MAX_NAME_BYTES:
+                raise ValueError(f"Name of layer {layer} too long")
+
+        for layer, index, key_string in changes:
+            self.ensure_layer(layer)
+            if not isinstance(keymap[layer], list):
+                keymap[layer] = list(keymap[layer])
+            keymap[layer][index] = self.string_to_keycode(key_string)
+            self.keymap_names[layer][index] = key_string.strip()
+
+        for layer, name in layer_names:
+            self.ensure_layer(layer)
+            self.keyboard.layer_names[layer] = name or None
+
+        if changes:
+            self.keyboard.invalidate_key_table()
+        if changes or layer_names:
+            self.keymap_changed()
+
+    def keymap_changed(self):
+        """Have the new keymap saved to flash once the GUI is done editing"""
+        if hasattr(self.keyboard, 'config_module'):
+            self.keyboard.config_module.schedule_save()
+
+    def log(self, message):
+        """Debug chatter for the JSON protocol, silent while answering frames"""
+        if self.verbose:
+            print(message)
 
     def process_serial_command(self):
         """Process serial commands without blocking"""
-        if not supervisor.runtime.serial_bytes_available:
+        if self.reader is None:
+            return
+        if not self.reader.pending and not supervisor.runtime.serial_bytes_available:
             return
             
         try:
-            command_line = sys.stdin.readline()
-            
-            if not command_line:
+            # Reads for at most reader.budget_us, partial messages are kept
+            message = self.reader.poll()
+            if message is None:
+                return
+
+            if isinstance(message, protocol.Frame):
+                self.process_frame(message)
                 return
-                
-            command_line = command_line.strip()
+
+            command_line = str(message, "utf-8").strip()
             if not command_line:
                 return
 
@@ -110,105 +201,152 @@ class SerialCommandModule(Module):
                 print(json.dumps(error_response))
                 return
 
-            # Process commands
-            action = command.get("action")
-            print(f"[KMK] Processing action: {action}")
-
-            if action == "ping":
-                print("[KMK] Ping received, sending pong")
-                response = {"status": "success", "message": "pong", "timestamp": time.monotonic()}
-                print(json.dumps(response))
-
-            elif action == "set_keybindings":
-                keybindings = command.get("keybindings", [])
-                layer = command.get("layer", 0)
-                layer_name = command.get("layer_name")
-                
-                print(f"[KMK] Setting {len(keybindings)} keybindings on layer {layer}")
+            response = self.execute_command(command)
+            # Echo the request ID so pipelining GUIs can match the response
+            if "request_id" in command:
+                response["request_id"] = command["request_id"]
+            print(json.dumps(response))
 
-                if not keybindings:
-                    response = {"status": "error", "message": "No keybindings provided"}
-                else:
-                    try:
-                        self.update_keymap_from_bindings(keybindings, layer)
-                        
-                        response = {
-                            "status": "success",
-                            "message": f"Updated {len(keybindings)} keys on layer {layer}",
-                            "keybindings_received": keybindings,
-                        }
-                        print(f"[KMK] Successfully updated keymap")
-                    except Exception as e:
-                        print(f"[KMK] Error updating keymap: {str(e)}")
-                        response = {"status": "error", "message": f"Failed to update keymap: {str(e)}"}
-
-                if len(keyboard.layer_names) <= layer:
-                    keyboard.layer_names.extend([None] * (layer - len(keyboard.layer_names) + 1))
-
-                keyboard.layer_names[layer] = layer_name
-
-                print(json.dumps(response))
-
-            elif action == "save_config":
-                if hasattr(self.keyboard, 'config_module'):
-                    success = self.keyboard.config_module.force_save()
-                    if success:
-                        response = {"status": "success", "message": "Configuration saved"}
-                    else:
-                        response = {"status": "error", "message": "Failed to save configuration"}
-                else:
-                    response = {"status": "error", "message": "Config module not available"}
-                print(json.dumps(response))
-
-            elif action == "load_config":
-                if hasattr(self.keyboard, 'config_module'):
-                    success = self.keyboard.config_module.load_config()
-                    if success:
-                        response = {"status": "success", "message": "Configuration loaded"}
-                    else:
-                        response = {"status": "error", "message": "Failed to load configuration"}
-                else:
-                    response = {"status": "error", "message": "Config module not available"}
-                print(json.dumps(response))
+        except Exception as e:
+            print(f"[KMK] Command processing error: {str(e)}")
+            error_response = {"status": "error", "message": f"Command processing error: {str(e)}"}
+            print(json.dumps(error_response))
 
-            elif action == "get_config_info":
-                if hasattr(self.keyboard, 'config_module'):
-                    config_info = self.keyboard.config_module.get_config_info()
-                    response = {"status": "success", "config_info": config_info}
-                else:
-                    response = {"status": "error", "message": "Config module not available"}
-                print(json.dumps(response))
+    def process_frame(self, frame):
+        """Answer a binary frame with a frame"""
+        self.verbose = False
+        try:
+            command = protocol.decode_command(frame.msg_type, frame.payload)
+            response = self.execute_command(command)
+        except Exception as e:
+            response = {"status": "error", "message": f"Command processing error: {str(e)}"}
+        finally:
+            self.verbose = True
+
+        self.reader.stream.write(protocol.encode_frame(
+            protocol.RESPONSE | frame.msg_type,
+            frame.request_id,
+            protocol.encode_response(response),
+        ))
+
+    def execute_command(self, command):
+        """Run a decoded command and return the response"""
+        action = command.get("action")
+        self.log(f"[KMK] Processing action: {action}")
+
+        if action == "ping":
+            self.log("[KMK] Ping received, sending pong")
+            response = {"status": "success", "message": "pong", "timestamp": time.monotonic()}
+
+        elif action == "negotiate":
+            # GUIs that know the binary protocol ask for it, older ones never do
+            response = {
+                "status": "success",
+                "message": "Binary protocol available",
+                "protocol": protocol.VERSION,
+            }
+
+        elif action == "set_keybindings":
+            keybindings = command.get("keybindings", [])
+            layer = command.get("layer", 0)
+            layer_name = command.get("layer_name")
+            name_too_long = len((layer_name or "").encode()) > MAX_NAME_BYTES
+            
+            self.log(f"[KMK] Setting {len(keybindings)} keybindings on layer {layer}")
 
-            elif action == "get_current_keymap":
+            if not keybindings:
+                response = {"status": "error", "message": "No keybindings provided"}
+            elif name_too_long:
+                response = {"status": "error", "message": "Layer name too long"}
+            else:
                 try:
-                    print("[KMK] Getting current keymap")
-                    keymap_strings = []
-                    for layer_idx, layer in enumerate(self.keyboard.keymap):
-                        layer_strings = []
-                        for keycode in layer:
-                            layer_strings.append(str(keycode))
-                        keymap_strings.append(layer_strings)
-
+                    self.update_keymap_from_bindings(keybindings, layer)
+                    
                     response = {
                         "status": "success",
-                        "keymap": keymap_strings,
-                        "layers": len(self.keyboard.keymap)
+                        "message": f"Updated {len(keybindings)} keys on layer {layer}",
+                        "keybindings_received": keybindings,
                     }
+                    self.log(f"[KMK] Successfully updated keymap")
                 except Exception as e:
-                    print(f"[KMK] Error getting keymap: {str(e)}")
-                    response = {"status": "error", "message": f"Failed to get keymap: {str(e)}"}
+                    self.log(f"[KMK] Error updating keymap: {str(e)}")
+                    response = {"status": "error", "message": f"Failed to update keymap: {str(e)}"}
+
+            if not name_too_long:
+                layer_names = self.keyboard.layer_names
+                if len(layer_names) <= layer:
+                    layer_names.extend([None] * (layer - len(layer_names) + 1))
 
-                print(json.dumps(response))
+                layer_names[layer] = layer_name
 
+        elif action == "get_layer_hashes":
+            response = {"status": "success", "hashes": self.layer_hashes()}
+
+        elif action == "patch_keys":
+            changes = command.get("changes", [])
+            try:
+                self.patch_keymap(changes, command.get("layer_names", []))
+                response = {
+                    "status": "success",
+                    "message": f"Patched {len(changes)} keys",
+                    "hashes": self.layer_hashes(),
+                }
+            except Exception as e:
+                self.log(f"[KMK] Error patching keymap: {str(e)}")
+                response = {"status": "error", "message": f"Failed to patch keymap: {str(e)}"}
+
+        elif action == "save_config":
+            if hasattr(self.keyboard, 'config_module'):
+                success = self.keyboard.config_module.force_save()
+                if success:
+                    response = {"status": "success", "message": "Configuration saved"}
+                else:
+                    response = {"status": "error", "message": "Failed to save configuration"}
             else:
-                print(f"[KMK] Unknown action: {action}")
-                response = {"status": "error", "message": f"Unknown action: {action}"}
-                print(json.dumps(response))
+                response = {"status": "error", "message": "Config module not available"}
 
-        except Exception as e:
-            print(f"[KMK] Command processing error: {str(e)}")
-            error_response = {"status": "error", "message": f"Command processing error: {str(e)}"}
-            print(json.dumps(error_response))
+        elif action == "load_config":
+            if hasattr(self.keyboard, 'config_module'):
+                success = self.keyboard.config_module.load_config()
+                if success:
+                    response = {"status": "success", "message": "Configuration loaded"}
+                else:
+                    response = {"status": "error", "message": "Failed to load configuration"}
+            else:
+                response = {"status": "error", "message": "Config module not available"}
+
+        elif action == "get_config_info":
+            if hasattr(self.keyboard, 'config_module'):
+                config_info = self.keyboard.config_module.get_config_info()
+                response = {"status": "success", "config_info": config_info}
+            else:
+                response = {"status": "error", "message": "Config module not available"}
+
+        elif action == "get_current_keymap":
+            try:
+                self.log("[KMK] Getting current keymap")
+                # Names as the GUI sent them, or the canonical KC names
+                keymap_strings = self.layer_key_names()
+                layer_names = self.keyboard.layer_names
+
+                response = {
+                    "status": "success",
+                    "keymap": keymap_strings,
+                    "layers": len(self.keyboard.keymap),
+                    "layer_names": [
+                        layer_names[idx] if idx < len(layer_names) else None
+                        for idx in range(len(keymap_strings))
+                    ],
+                }
+            except Exception as e:
+                self.log(f"[KMK] Error getting keymap: {str(e)}")
+                response = {"status": "error", "message": f"Failed to get keymap: {str(e)}"}
+
+        else:
+            self.log(f"[KMK] Unknown action: {action}")
+            response = {"status": "error", "message": f"Unknown action: {action}"}
+
+        return response
 
 # Initialize hardware and modules
 layer_names = ["temp"]
@@ -250,15 +388,6 @@ class InactivityDetector(Module):
             self.on_inactivity(keyboard)
             self.inactivity_triggered = True
     
-    def after_matrix_scan(self, keyboard):
-        pass
-    
-    def before_hid_send(self, keyboard):
-        pass
-    
-    def after_hid_send(self, keyboard):
-        pass
-    
     def process_key(self, keyboard, key, is_pressed, int_coord):
         if is_pressed:
             self.reset_timer()
@@ -297,9 +426,7 @@ class OLEDLayerKey():
         return False
         
     def on_release(self, keyboard, *args, **kwargs):
-        active_scene = keyboard.oled._get_active_scene()
-        if active_scene:
-            active_scene.forced_draw(keyboard.oled, keyboard)
+        keyboard.oled.redraw()
         
         return False
 
@@ -370,6 +497,13 @@ encoder_handler.map = [
     ((SEL_PRV, SEL_NXT, SELECT),), # Function
 ]
 
+# Restore the keymap last sent from the GUI, boot.py makes the drive writable
+serial_module.keyboard = keyboard
+keyboard.config_module = KeymapStore(
+    keyboard, serial_module, path=os.getenv("MACROPAD_KEYMAP_PATH") or DEFAULT_PATH
+)
+keyboard.config_module.load_config()
+
 # Let KMK handle the main loop - serial processing happens in before_matrix_scan
 if __name__ == '__main__':
     
@@ -13,6 +13,7 @@ from ConfigManager import ConfigManager
 from KeyButton import KeyButton
 from KeySelectorDialog import KeySelectorDialog
 from SerialCommunicator import SerialCommunicator
+from FrameProtocol import layer_hash
 from AutoDetect import AutoDetectWorker
 
 class MacropadGUI(QMainWindow):
@@ -25,6 +26,9 @@ class MacropadGUI(QMainWindow):
         
         # Initialize components
         self.serial_comm = SerialCommunicator()
+        self.command_labels = {}  # request id -> description for the status bar
+        self.command_callbacks = {}  # request id -> called with the response
+        self.device_layers = {}  # layer index -> layer as last sent to the device
         self.config_manager = ConfigManager()
         self.settings = QSettings("MacropadGUI", "Settings")
         
@@ -233,6 +237,7 @@ class MacropadGUI(QMainWindow):
         """Setup signal connections"""
         # Serial communication
         self.serial_comm.message_received.connect(self.handle_device_message)
+        self.serial_comm.command_finished.connect(self.handle_command_finished)
         self.serial_comm.connection_status_changed.connect(self.handle_connection_status)
         
         # UI connections
@@ -339,6 +344,27 @@ class MacropadGUI(QMainWindow):
             msg = message.get("message", "No message")
             self.statusBar().showMessage(f"Device response: {status} - {msg}")
 
+    def handle_command_finished(self, request_id: int, response: dict):
+        """Show the result of a command sent with send_device_command"""
+        label = self.command_labels.pop(request_id, f"Command {request_id}")
+        status = response.get("status", "unknown")
+        msg = response.get("message", "No message")
+        self.statusBar().showMessage(f"{label}: {status} - {msg}")
+        if status != "success":
+            print(f"{label} failed: {msg}")
+
+        callback = self.command_callbacks.pop(request_id, None)
+        if callback is not None:
+            callback(response)
+
+    def send_device_command(self, command: dict, label: str, on_response=None):
+        """Send a command and remember what it was for when its response arrives"""
+        future = self.serial_comm.send_command(command)
+        self.command_labels[future.request_id] = label
+        if on_response is not None:
+            self.command_callbacks[future.request_id] = on_response
+        return future
+
     def auto_detect_device(self):
         """Start auto-detection in a separate thread"""
         if not self.serial_comm.running:
@@ -387,12 +413,12 @@ class MacropadGUI(QMainWindow):
     def ping_device(self):
         """Send a ping command to the device"""
         if self.serial_comm.running:
-            self.serial_comm.send_command({"action": "ping"})
+            self.send_device_command({"action": "ping"}, "Ping")
     
     def get_current_keymap(self):
         """Get the current keymap from the device"""
         if self.serial_comm.running:
-            self.serial_comm.send_command({"action": "get_current_keymap"})
+            self.send_device_command({"action": "get_current_keymap"}, "Get keymap")
     
     def edit_key(self, key_index: int):
         """Open dialog to edit a key"""
@@ -464,33 +490,129 @@ class MacropadGUI(QMainWindow):
     def send_current_layer_to_device(self):
         """Send the current layer configuration to the device"""
         if self.serial_comm.running and self.current_layer_index < len(self.current_layers):
-            layer = self.current_layers[self.current_layer_index]
-            command = {
-                "action": "set_keybindings",
-                "keybindings": layer["keys"],
-                "layer": self.current_layer_index,
-                "layer_name": layer["name"]
-            }
-            self.serial_comm.send_command(command)
-            self.statusBar().showMessage(f"Sent layer '{layer['name']}' to device")
+            self.sync_layers_to_device([self.current_layer_index])
             
             # Auto-save current configuration as "default"
             self.auto_save()
 
     def send_all_layers_to_device(self):
         """Send the all of the layers of the configuration to the device"""
-        for i in range(len(self.current_layers)):
+        if self.serial_comm.running:
+            self.sync_layers_to_device()
+
+    def sync_layers_to_device(self, layer_indexes=None):
+        """Ask the device for its layer hashes, then send only what differs"""
+        if layer_indexes is None:
+            layer_indexes = list(range(len(self.current_layers)))
+        self.send_device_command(
+            {"action": "get_layer_hashes"},
+            "Layer hashes",
+            lambda response: self.apply_layer_hashes(layer_indexes, response),
+        )
+
+    def apply_layer_hashes(self, layer_indexes, response):
+        """Patch or send every layer whose hash doesn't match the device's"""
+        hashes = response.get("hashes") if response.get("status") == "success" else None
+        if hashes is None:
+            # Firmware without layer hashes, send everything
+            hashes = []
+            self.device_layers.clear()
+
+        up_to_date = True
+        unknown = []
+        for i in layer_indexes:
+            if i >= len(self.current_layers):
+                continue
+            layer = self.current_layers[i]
+            device_hash = hashes[i] if i < len(hashes) else None
+            if device_hash == layer_hash(layer["name"], layer["keys"]):
+                self.device_layers[i] = self.copy_layer(layer)
+                continue
+
+            up_to_date = False
+            known = self.device_layers.get(i)
+            if (
+                known is not None
+                and len(known["keys"]) == len(layer["keys"])
+                and device_hash == layer_hash(known["name"], known["keys"])
+            ):
+                self.send_layer_patch(i, known)
+            elif device_hash is not None:
+                # Firmware with layer hashes can also tell us what it has
+                unknown.append(i)
+            else:
+                self.send_layer(i)
+
+        if unknown:
+            self.send_device_command(
+                {"action": "get_current_keymap"},
+                "Current keymap",
+                lambda response: self.apply_device_keymap(unknown, hashes, response),
+            )
+        if up_to_date:
+            self.statusBar().showMessage("Device keymap is up to date")
+
+    def apply_device_keymap(self, layer_indexes, hashes, response):
+        """Diff against the keymap read back from the device"""
+        keymap = response.get("keymap", []) if response.get("status") == "success" else []
+        layer_names = response.get("layer_names", [])
+        for i in layer_indexes:
+            if i >= len(self.current_layers):
+                continue
+            if i < len(keymap):
+                name = layer_names[i] if i < len(layer_names) else None
+                self.device_layers[i] = {"name": name, "keys": keymap[i]}
+            known = self.device_layers.get(i)
+            if (
+                known is not None
+                and len(known["keys"]) == len(self.current_layers[i]["keys"])
+                and hashes[i] == layer_hash(known["name"], known["keys"])
+            ):
+                self.send_layer_patch(i, known)
+            else:
+                self.send_layer(i)
+
+    def send_layer(self, i):
+        """Send a whole layer with set_keybindings"""
+        layer = self.copy_layer(self.current_layers[i])
+        command = {
+            "action": "set_keybindings",
+            "keybindings": layer["keys"],
+            "layer": i,
+            "layer_name": layer["name"]
+        }
+        self.device_layers.pop(i, None)
+        self.send_device_command(
+            command, f"Layer '{layer['name']}'", self.layer_sent_callback(i, layer)
+        )
+        self.statusBar().showMessage(f"Sent layer '{layer['name']}' to device")
+
+    def send_layer_patch(self, i, known):
+        """Send only the keys of layer `i` that differ from `known`"""
+        layer = self.copy_layer(self.current_layers[i])
+        changes = [
+            [i, idx, key]
+            for idx, (key, old_key) in enumerate(zip(layer["keys"], known["keys"]))
+            if key != old_key
+        ]
+        layer_names = [[i, layer["name"]]] if layer["name"] != known["name"] else []
+        command = {"action": "patch_keys", "changes": changes, "layer_names": layer_names}
+        self.device_layers.pop(i, None)
+        self.send_device_command(
+            command, f"Layer '{layer['name']}'", self.layer_sent_callback(i, layer)
+        )
+        self.statusBar().showMessage(f"Sent {len(changes)} changed keys of layer '{layer['name']}'")
+
+    def layer_sent_callback(self, i, layer):
+        """Remember what the device holds once it confirms a layer"""
+        def on_response(response):
+            if response.get("status") == "success":
+                self.device_layers[i] = layer
+        return on_response
 
-            if self.serial_comm.running:
-                layer = self.current_layers[i]
-                command = {
-                    "action": "set_keybindings",
-                    "keybindings": layer["keys"],
-                    "layer": i,
-                    "layer_name": layer["name"]
-                }
-                self.serial_comm.send_command(command)
-                self.statusBar().showMessage(f"Sent layer '{layer['name']}' to device")
+    @staticmethod
+    def copy_layer(layer):
+        return {"name": layer["name"], "keys": list(layer["keys"])}
 
     def auto_save(self):
         """Automatically save current configuration"""
@@ -1,21 +1,54 @@
 import json
+import struct
 import threading
 import time
+from collections import deque
+from concurrent.futures import Future
+
 import serial
 from PyQt6.QtCore import QThread, pyqtSignal
 
+import FrameProtocol
+
+class PendingRequest:
+    """A command waiting for its response"""
+
+    def __init__(self, request_id: int, command: dict, timeout: float, retries: int):
+        self.request_id = request_id
+        self.command = command
+        self.timeout = timeout
+        self.retries = retries
+        self.attempts = 0
+        self.sent_at = 0.0
+        self.future = Future()
+        self.future.request_id = request_id
+
+
 class SerialCommunicator(QThread):
     """Handle serial communication with the macropad in a separate thread"""
     
     message_received = pyqtSignal(dict)
+    command_finished = pyqtSignal(int, dict)  # request id, response
     connection_status_changed = pyqtSignal(bool, str)
+
+    DEFAULT_TIMEOUT = 1.0  # Seconds to wait for a response before resending
+    DEFAULT_RETRIES = 2
+    READ_TIMEOUT = 0.1  # Longest a blocking read waits, bounds timeout checks
     
     def __init__(self):
         super().__init__()
         self.serial_port = None
         self.running = False
-        self.command_queue = []
+        self.command_queue = deque()
+        self.in_flight = {}  # request id -> PendingRequest, in send order
+        self.max_in_flight = 8  # Commands sent ahead of their responses
         self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)  # Wakes the writer thread
+        self.writer = None
+        self.binary = False  # Switched on once the device accepts frames
+        self.request_id = 0
+        self.frame_decoder = FrameProtocol.FrameDecoder()
+        self.text_buffer = bytearray()
         
     def connect_to_device(self, port_name: str) -> bool:
         """Connect to the specified serial port"""
@@ -26,11 +59,21 @@ class SerialCommunicator(QThread):
             self.serial_port = serial.Serial(
                 port_name, 
                 baudrate=115200, 
-                timeout=0.1,
+                timeout=self.READ_TIMEOUT,
                 write_timeout=1.0
             )
             time.sleep(2)  # Give device time to initialize
             self.running = True
+
+            # Ask for the binary protocol first, firmware without it answers
+            # with an error and everything stays JSON
+            self.binary = False
+            self.frame_decoder.reset()
+            self.text_buffer.clear()
+            negotiate = self.send_command(
+                {"action": "negotiate", "protocol": FrameProtocol.VERSION}, first=True
+            )
+            negotiate.add_done_callback(self.handle_negotiation)
             self.connection_status_changed.emit(True, port_name)
             return True
         except Exception as e:
@@ -40,43 +83,183 @@ class SerialCommunicator(QThread):
     def disconnect(self):
         """Disconnect from the device"""
         self.running = False
+        with self.lock:
+            self.wakeup.notify_all()
         if self.serial_port and self.serial_port.is_open:
             self.serial_port.close()
+        self.fail_pending("Disconnected")
         self.connection_status_changed.emit(False, "Disconnected")
     
-    def send_command(self, command: dict):
-        """Queue a command to be sent to the device"""
+    def send_command(
+        self,
+        command: dict,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        first: bool = False,
+    ) -> Future:
+        """
+        Queue a command to be sent to the device. Returns a Future that
+        resolves to the response dict (also emitted as `command_finished`);
+        its `request_id` attribute identifies the command.
+        """
         with self.lock:
-            self.command_queue.append(command)
-    
+            self.request_id = self.request_id % 0xFFFF + 1
+            request = PendingRequest(self.request_id, command, timeout, retries)
+            if first:
+                self.command_queue.appendleft(request)
+            else:
+                self.command_queue.append(request)
+            self.wakeup.notify()
+        return request.future
+
+    def handle_negotiation(self, future: Future):
+        response = future.result()
+        self.binary = (
+            response.get("status") == "success"
+            and response.get("protocol") == FrameProtocol.VERSION
+        )
+
+    def encode_command(self, request: PendingRequest) -> bytes:
+        """Serialize a command for the protocol in use"""
+        if not self.binary:
+            command = dict(request.command, request_id=request.request_id)
+            return (json.dumps(command) + '\n').encode()
+
+        msg_type, payload = FrameProtocol.encode_command(request.command)
+        return FrameProtocol.encode_frame(msg_type, request.request_id, payload)
+
+    def send_pending(self):
+        """Send queued commands while the in-flight window has room, lock held"""
+        while self.command_queue and len(self.in_flight) < self.max_in_flight:
+            request = self.command_queue.popleft()
+            self.in_flight[request.request_id] = request
+            self.transmit(request)
+
+    def write_loop(self):
+        """Writer thread: sends whenever commands are queued or the window frees up"""
+        try:
+            with self.lock:
+                while self.running and self.serial_port and self.serial_port.is_open:
+                    self.send_pending()
+                    self.wakeup.wait()
+        except Exception as e:
+            if self.running:
+                self.running = False
+                self.connection_status_changed.emit(False, f"Communication error: {str(e)}")
+
+    def transmit(self, request: PendingRequest):
+        """Write a command to the port, lock held"""
+        request.attempts += 1
+        request.sent_at = time.monotonic()
+        self.serial_port.write(self.encode_command(request))
+        self.serial_port.flush()
+
+    def check_timeouts(self):
+        """Resend commands whose response is overdue, fail them when out of retries"""
+        now = time.monotonic()
+        expired = []
+        with self.lock:
+            for request in list(self.in_flight.values()):
+                if now - request.sent_at < request.timeout:
+                    continue
+                if request.attempts <= request.retries:
+                    self.transmit(request)
+                else:
+                    del self.in_flight[request.request_id]
+                    expired.append(request)
+
+        for request in expired:
+            self.finish(request, {
+                "status": "error",
+                "message": f"No response after {request.attempts} attempts",
+            })
+
+    def fail_pending(self, message: str):
+        """Fail every queued and in-flight command"""
+        with self.lock:
+            requests = list(self.in_flight.values()) + list(self.command_queue)
+            self.in_flight.clear()
+            self.command_queue.clear()
+        for request in requests:
+            self.finish(request, {"status": "error", "message": message})
+
+    def finish(self, request: PendingRequest, response: dict):
+        response["request_id"] = request.request_id
+        if not request.future.done():
+            request.future.set_result(response)
+        self.command_finished.emit(request.request_id, response)
+
+    def handle_response(self, response: dict):
+        """Match a response to the command that caused it"""
+        with self.lock:
+            request_id = response.get("request_id")
+            if request_id is None and self.in_flight:
+                # Firmware without request IDs answers in order
+                request_id = next(iter(self.in_flight))
+            request = self.in_flight.pop(request_id, None)
+            if request is not None:
+                self.wakeup.notify()
+
+        if request is None:
+            self.message_received.emit(response)
+        else:
+            self.finish(request, response)
+
+    def handle_line(self, line: str):
+        """Handle one line of text output from the device"""
+        try:
+            response = json.loads(line)
+        except json.JSONDecodeError:
+            # Handle non-JSON debug messages
+            if line.startswith('[KMK]'):
+                debug_msg = {"type": "debug", "message": line}
+                self.message_received.emit(debug_msg)
+            return
+
+        if isinstance(response, dict):
+            self.handle_response(response)
+
+    def handle_input(self, data: bytes):
+        """Split received bytes into binary frames and lines of text"""
+        for item in self.frame_decoder.feed(data):
+            if isinstance(item, FrameProtocol.Frame):
+                try:
+                    response = FrameProtocol.decode_response(item.payload)
+                except (ValueError, IndexError, struct.error) as e:
+                    response = {"status": "error", "message": f"Bad response frame: {e}"}
+                response["request_id"] = item.request_id
+                self.handle_response(response)
+                continue
+
+            self.text_buffer.extend(item)
+            while b'\n' in self.text_buffer:
+                line, _, rest = bytes(self.text_buffer).partition(b'\n')
+                self.text_buffer[:] = rest
+                line = line.decode(errors='replace').strip()
+                if line:
+                    self.handle_line(line)
+
     def run(self):
-        """Main communication loop"""
+        """Reader loop: blocks on the port and drains everything that arrived"""
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
         while self.running and self.serial_port and self.serial_port.is_open:
             try:
-                # Send queued commands
-                with self.lock:
-                    if self.command_queue:
-                        command = self.command_queue.pop(0)
-                        command_json = json.dumps(command) + '\n'
-                        self.serial_port.write(command_json.encode())
-                        self.serial_port.flush()
-                
-                # Read responses
-                if self.serial_port.in_waiting > 0:
-                    line = self.serial_port.readline().decode().strip()
-                    if line:
-                        try:
-                            response = json.loads(line)
-                            self.message_received.emit(response)
-                        except json.JSONDecodeError:
-                            # Handle non-JSON debug messages
-                            if line.startswith('[KMK]'):
-                                debug_msg = {"type": "debug", "message": line}
-                                self.message_received.emit(debug_msg)
-                
-                self.msleep(50)  # 50ms polling interval
+                # Returns as soon as a byte arrives, or after READ_TIMEOUT
+                data = self.serial_port.read(max(1, self.serial_port.in_waiting))
+                if data:
+                    self.handle_input(data)
+
+                self.check_timeouts()
                 
             except Exception as e:
                 if self.running:  # Only emit error if we're still supposed to be running
                     self.connection_status_changed.emit(False, f"Communication error: {str(e)}")
                 break
+
+        self.running = False
+        with self.lock:
+            self.wakeup.notify_all()
+        self.writer.join()
+        self.fail_pending("Connection closed")
@@ -0,0 +1,102 @@
+'''
+Boot cost of Kpad with and without the OLED.
+
+Boots a fresh Kpad from macroPad.py (`host.boot_kpad`), every firmware module
+imported again, `--repeat` times per configuration and reports:
+
+- `host`: what constructing and booting the keyboard costs on the host,
+- `bus_ms`: simulated time spent talking to the panel during boot, the shim's
+  I2C takes bus time to write, and `bus_bytes` written,
+- `heap_kib`: memory still allocated once booted, measured with tracemalloc
+  (module code and shim bookkeeping included, so compare the two),
+- `scenes_loaded`: display scenes built and loaded during boot.
+
+With the OLED, `first_selection` is what showing the layer picker costs the
+first time and once it has been loaded: switching to it and rendering it.
+
+    python bench_boot.py --repeat 20 -o boot.json
+'''
+
+import contextlib
+import gc
+import io
+import tracemalloc
+from time import perf_counter_ns
+
+import benchmark
+import host
+
+
+def boot(oled):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return host.boot_kpad(oled=oled)
+
+
+def measure_heap(oled):
+    gc.collect()
+    tracemalloc.start()
+    keyboard = boot(oled)
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keyboard
+    return current
+
+
+def show_selection(keyboard):
+    '''Host ns to switch to the layer picker and render it.'''
+    oled = keyboard.oled
+    t0 = perf_counter_ns()
+    oled.set_scene(1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(10):
+            keyboard._main_loop()
+            if not (oled._draw_pending or oled._display.pending):
+                break
+    return perf_counter_ns() - t0
+
+
+def measure(oled, repeat):
+    import supervisor
+
+    host_ns = []
+    for _ in range(repeat):
+        t0 = perf_counter_ns()
+        keyboard = boot(oled)
+        host_ns.append(perf_counter_ns() - t0)
+
+    results = {
+        'host': benchmark.summarize(host_ns),
+        'bus_ms': round(supervisor.clock.now_ns() / 1e6, 3),
+        'bus_bytes': keyboard.i2c.bytes_written,
+        'heap_kib': round(measure_heap(oled) / 1024, 1),
+    }
+    if oled:
+        # Let the boot frame go out first
+        host.run(keyboard, 20)
+        loads = keyboard.oled.loads
+        first = show_selection(keyboard)
+        keyboard.oled.set_scene(0)
+        host.run(keyboard, 20)
+        again = show_selection(keyboard)
+        results['scenes_loaded'] = loads
+        results['first_selection_us'] = round(first / 1e3, 1)
+        results['selection_again_us'] = round(again / 1e3, 1)
+    return results
+
+
+def main():
+    parser = benchmark.argument_parser(__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    host.install()
+    results = {
+        'no_oled': measure(False, args.repeat),
+        'oled': measure(True, args.repeat),
+    }
+    benchmark.emit('boot', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+'''
+Chord latency with one matrix event per loop versus batched event handling.
+
+Runs the chord scenarios of bench_loop.py once per `matrix_event_budget` and
+emits both result sets side by side.
+
+    python bench_chords.py --budget 1 --budget 12
+'''
+
+import contextlib
+import io
+
+import bench_loop
+import benchmark
+import host
+
+
+def main():
+    parser = benchmark.argument_parser(__doc__.splitlines()[1])
+    parser.add_argument('--budget', type=int, action='append', default=None)
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--step-ms', type=float, default=1)
+    args = parser.parse_args()
+
+    host.install()
+    results = {}
+    for budget in args.budget or (1, 12):
+        keyboard = bench_loop.boot(budget=budget)
+        runs = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name in ('chord3', 'chord6'):
+                (chord,) = bench_loop.SCENARIOS[name]
+                latency_ns, latency_loops = bench_loop.measure_latency(
+                    keyboard, chord, args.repeats, args.step_ms
+                )
+                runs[name] = {
+                    'latency': benchmark.summarize(latency_ns),
+                    'latency_loops': benchmark.summarize(
+                        latency_loops, unit='loops', scale=1
+                    ),
+                }
+        results[f'budget_{budget}'] = runs
+    benchmark.emit('chords', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+'''
+OLED refresh cost: bytes written to the SSD1306 per frame, and what the
+display costs the keyboard.
+
+Boots Firmware/main.py with the OLED, gives it `--layers` named layers and
+scrolls through them with the encoder's SEL_NXT / SEL_PRV, selecting one
+every few steps with SELECT, the way the layer picker is used. After every
+scroll step a key is tapped, pressed at a random point in the following
+10 ms while the display is busy. Reported per `Display.render_budget_us`:
+
+- every `Renderer.refresh()`: bytes sent (commands and control bytes
+  included), the time those take on a 400 kHz I2C bus and the host cost of
+  rendering, next to what sending the whole frame would take,
+- the display's own counters: render jobs run and deferred, and time spent
+  in display I/O, and how often label text was laid out,
+- how long main loop cycles take and the latency from a key event to its
+  report, in simulated time; the shim's I2C takes bus time to write.
+
+`governor` leaves the keyboard idle, then types on it, once on the layer
+picker, which typing doesn't change, and once on `ShowcaseScene`, which
+shows the keys pressed. It reports how often the active scene is checked
+for redrawing per simulated second and how many of those checks drew a
+frame (`Display.frames_drawn` and `frames_skipped`), and how long after
+idling a scroll step takes to reach the panel.
+
+    python bench_display.py --steps 200 --budget 0 --budget 1000 -o display.json
+'''
+
+import contextlib
+import io
+import random
+from time import perf_counter_ns
+
+import benchmark
+import host
+
+I2C_HZ = 400_000
+# Bits per byte on I2C: 8 data bits and the acknowledge
+I2C_BITS = 9
+
+
+def boot(layers):
+    with contextlib.redirect_stdout(io.StringIO()):
+        namespace = host.load_main()
+    keyboard = namespace['keyboard']
+    keyboard.keymap = [list(keyboard.keymap[0]) for _ in range(layers)]
+    keyboard.layer_names[:] = [f'Layer {idx + 1}' for idx in range(layers)]
+    return namespace, keyboard
+
+
+def text_layouts(oled):
+    '''Times label text was laid out, summed over every scene.'''
+    count = 0
+    # Scenes never shown are still the function that makes them
+    groups = [getattr(scene, 'scene_group', None) for scene in oled._scenes]
+    groups = [group for group in groups if group is not None]
+    while groups:
+        for node in groups.pop():
+            if hasattr(node, 'layouts'):
+                count += node.layouts
+            elif hasattr(node, '__iter__'):
+                groups.append(node)
+    return count
+
+
+def bus_us(count):
+    return count * I2C_BITS * 1e6 / I2C_HZ
+
+
+def run(steps=200, layers=8, budget=1000, seed=1):
+    import supervisor
+    import usb_hid
+
+    namespace, keyboard = boot(layers)
+    oled = keyboard.oled
+    oled.render_budget_us = budget
+    renderer = oled._display
+    full_frame = renderer.pages * (7 + renderer.width + 1)
+    clock = supervisor.clock
+    device = usb_hid.Device.KEYBOARD
+
+    frames = []
+    refresh = renderer.refresh
+
+    def recording_refresh(*args):
+        t0 = perf_counter_ns()
+        count = refresh(*args)
+        frames.append((count, perf_counter_ns() - t0))
+        return count
+
+    renderer.refresh = recording_refresh
+
+    cycles = []
+    latency = []
+
+    def loop():
+        t0 = clock.now_ns()
+        keyboard._main_loop()
+        clock.advance(1)
+        cycles.append(clock.now_ns() - t0)
+
+    # Simulated time of every report, the shim's only has milliseconds
+    sent_ns = []
+    send_report = device.send_report
+
+    def recording_send_report(*args, **kwargs):
+        sent_ns.append(clock.now_ns())
+        return send_report(*args, **kwargs)
+
+    device.send_report = recording_send_report
+
+    def until_report(event, delay_ms):
+        # The key changes state at t0, but is only scanned once the cycle
+        # running then is over.
+        t0 = clock.now_ns() + delay_ms * 1_000_000
+        while clock.now_ns() < t0:
+            loop()
+        seen = len(sent_ns)
+        event(keyboard, key_number)
+        for _ in range(100):
+            loop()
+            if len(sent_ns) > seen:
+                latency.append(sent_ns[seen] - t0)
+                return
+
+    rng = random.Random(seed)
+    keys = (namespace['SEL_NXT'], namespace['SEL_PRV'])
+    select = namespace['SELECT']
+    with contextlib.redirect_stdout(io.StringIO()):
+        host.run(keyboard, 100)
+        for step in range(steps):
+            rng.choice(keys).on_press(keyboard)
+            key_number = rng.randrange(12)
+            until_report(host.press, rng.uniform(0, 10))
+            until_report(host.release, rng.uniform(20, 60))
+            for _ in range(20):
+                loop()
+            if step % 5 == 4:
+                select.on_press(keyboard)
+                host.run(keyboard, 20)
+                select.on_release(keyboard)
+                host.run(keyboard, 60)
+    del device.send_report
+
+    sent = [count for count, _ in frames if count]
+    return {
+        'render_budget_us': budget,
+        'refreshes': len(frames),
+        'refreshes_sending': len(sent),
+        'full_frame_bytes': full_frame,
+        'full_frame_bus_us': round(bus_us(full_frame), 1),
+        'frame_bytes': benchmark.summarize(sent, unit='bytes', scale=1),
+        'frame_bus': benchmark.summarize([bus_us(count) * 1000 for count in sent]),
+        'render': benchmark.summarize([ns for _, ns in frames]),
+        'bytes_sent': renderer.bytes_sent,
+        'bytes_if_full_frames': full_frame * len(sent),
+        'jobs': oled.jobs,
+        'deferrals': oled.deferrals,
+        'io_ms': round(oled.io_ns / 1e6, 3),
+        'text_layouts': text_layouts(oled),
+        'frames_drawn': oled.frames_drawn,
+        'frames_skipped': oled.frames_skipped,
+        'cycle': benchmark.summarize(cycles),
+        'key_latency': benchmark.summarize(latency),
+    }
+
+
+def governor(idle_ms=5000, taps=20, seed=1):
+    import supervisor
+
+    namespace, keyboard = boot(8)
+    oled = keyboard.oled
+    renderer = oled._display
+    clock = supervisor.clock
+    rng = random.Random(seed)
+
+    def checks(section, ms):
+        drawn, skipped = oled.frames_drawn, oled.frames_skipped
+        section()
+        drawn = oled.frames_drawn - drawn
+        skipped = oled.frames_skipped - skipped
+        return {
+            'checks_per_sec': round((drawn + skipped) * 1000 / ms, 1),
+            'frames_drawn': drawn,
+            'frames_skipped': skipped,
+        }
+
+    def typing():
+        for _ in range(taps):
+            host.tap(keyboard, rng.randrange(12))
+            host.run(keyboard, 80)
+
+    def scene(scene_num):
+        oled.set_scene(scene_num)
+        host.run(keyboard, 100)
+        return {
+            'idle': checks(lambda: host.run(keyboard, idle_ms), idle_ms),
+            'typing': checks(typing, taps * 100),
+        }
+
+    from display.display import ShowcaseScene
+
+    # Not one of Kpad's scenes, shown after them
+    oled._scenes.append(ShowcaseScene())
+    oled._factories.append(None)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        selection = scene(1)
+        showcase = scene(2)
+
+        # A scroll step from the encoder after a while without input
+        oled.set_scene(1)
+        host.run(keyboard, idle_ms)
+        frames = renderer.frames
+        t0 = clock.now_ns()
+        keyboard.tap_key(namespace['SEL_NXT'])
+        for _ in range(idle_ms):
+            host.run(keyboard)
+            if renderer.frames != frames:
+                break
+        scroll_ms = (clock.now_ns() - t0) / 1e6
+
+    return {
+        'selection': selection,
+        'showcase': showcase,
+        'scroll_after_idle_ms': round(scroll_ms, 3),
+    }
+
+
+def main():
+    parser = benchmark.argument_parser(__doc__.splitlines()[1])
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--layers', type=int, default=8)
+    parser.add_argument(
+        '--budget',
+        type=int,
+        action='append',
+        default=None,
+        help='Display.render_budget_us to compare (repeatable)',
+    )
+    args = parser.parse_args()
+
+    host.install()
+    results = {
+        f'budget_{budget}us': run(args.steps, args.layers, budget)
+        for budget in args.budget or (0, 1000)
+    }
+    results['governor'] = governor()
+    benchmark.emit('display', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+'''
+HID report construction throughput.
+
+Boots Firmware/main.py on the host shim and drives its HID helper directly,
+`create_report(keys)` followed by `send()` as `KMKKeyboard._send_hid` does,
+over scripted sequences of pressed-key sets:
+
+- `roll`: rolling over the letters, one key in and one key out per update,
+- `chord6`: six keys going down and up together,
+- `modifiers`: shift toggling under a held key,
+- `hold`: the same keys on every update, nothing to send.
+
+Reports updates per second, per-update cost, how many reports reached the
+device and the heap `create_report` needs.
+
+`typing` then plays a seeded stream of overlapping presses and releases
+through the whole main loop once per `KMKKeyboard.hid_coalesce_ms` window
+and counts the reports sent and the updates merged into them.
+
+    python bench_hid.py --repeat 2000 --window 0 --window 8 -o hid.json
+'''
+
+import contextlib
+import io
+import random
+import tracemalloc
+
+import benchmark
+import host
+
+
+def scenarios():
+    from kmk.keys import KC
+
+    letters = [KC[chr(ord('A') + idx)] for idx in range(26)]
+    roll = []
+    for idx, key in enumerate(letters):
+        roll.append({letters[idx - 1], key})
+        roll.append({key})
+    chord = set(letters[:6])
+    held = {KC.LSFT, KC.A, KC.S}
+    return {
+        'roll': roll,
+        'chord6': [chord, set()],
+        'modifiers': [{KC.A, KC.LSFT}, {KC.A}],
+        'hold': [held],
+    }
+
+
+def measure(hid, device, states, repeat):
+    create_report = hid.create_report
+    send = hid.send
+
+    def update():
+        for keys in states:
+            create_report(keys)
+            send()
+
+    # Settle into the scenario so the first state isn't a transition from
+    # whatever ran before.
+    update()
+    seen = len(device.reports)
+    samples = benchmark.time_calls(update, repeat)
+    reports = len(device.reports) - seen
+    device.reports.clear()
+
+    # Heap used by building the reports, leaving out what the shim's
+    # `send_report` keeps of every report it captures.
+    def build():
+        for keys in states:
+            create_report(keys)
+
+    build()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    build()
+    build_peak = tracemalloc.get_traced_memory()[1] - start
+    tracemalloc.stop()
+    send()
+    device.reports.clear()
+
+    updates = repeat * len(states)
+    total_ns = sum(samples)
+    return {
+        'updates': updates,
+        'updates_per_sec': round(updates / (total_ns / 1e9)),
+        'reports': reports,
+        'reports_per_sec': round(reports / (total_ns / 1e9)),
+        'update': benchmark.summarize([s / len(states) for s in samples]),
+        'create_report_peak_bytes': build_peak,
+    }
+
+
+def measure_typing(window, events=2000, seed=1):
+    with contextlib.redirect_stdout(io.StringIO()):
+        keyboard = host.load_main()['keyboard']
+    keyboard.hid_coalesce_ms = window
+    hid = keyboard._hid_helper
+    sent = hid.reports_sent
+
+    rng = random.Random(seed)
+    key_count = sum(m.key_count for m in keyboard.matrix)
+    down = set()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(events):
+            key_number = rng.randrange(key_count)
+            if key_number in down:
+                host.release(keyboard, key_number)
+                down.discard(key_number)
+            elif len(down) < 4:
+                host.press(keyboard, key_number)
+                down.add(key_number)
+            host.run(keyboard, rng.choice((1, 1, 2, 3, 10)))
+        for key_number in down:
+            host.release(keyboard, key_number)
+            host.run(keyboard, 2)
+        host.run(keyboard, 50)
+
+    return {
+        'events': events,
+        'reports_sent': hid.reports_sent - sent,
+        'reports_coalesced': hid.reports_coalesced,
+    }
+
+
+def run(repeat=2000, windows=(0, 8)):
+    import usb_hid
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        keyboard = host.load_main()['keyboard']
+    hid = keyboard._hid_helper
+    results = {'hid': repr(hid)}
+    for name, states in scenarios().items():
+        results[name] = measure(hid, usb_hid.Device.KEYBOARD, states, repeat)
+    hid.create_report(set())
+    hid.send()
+
+    results['typing'] = {
+        f'window_{window}ms': measure_typing(window) for window in windows
+    }
+    return results
+
+
+def main():
+    parser = benchmark.argument_parser(__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument(
+        '--window',
+        type=int,
+        action='append',
+        default=None,
+        help='KMKKeyboard.hid_coalesce_ms for `typing` (repeatable)',
+    )
+    args = parser.parse_args()
+
+    host.install()
+    benchmark.emit('hid', run(args.repeat, args.window or (0, 8)), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+'''
+Idle sleep, `KMKKeyboard.idle_sleep_ms`, against a main loop that spins.
+
+Boots Firmware/main.py and drives it the way `KMKKeyboard.go()` does, main
+loop and then `_idle()`, once per `idle_sleep_ms` setting. Simulated time
+moves by the host cost of every main loop cycle (times `--cpu-scale`, for a
+slower chip) and by whatever the firmware sleeps, so asleep and awake time
+add up to the run's length.
+
+- `idle`: nobody touches the keys,
+- `typing`: single key taps spread out at human pace; key events are
+  injected at their due time, during naps too, like the keypad's background
+  scan would.
+
+Reports loop iterations and naps per simulated second, the share of time
+spent awake (the proxy for current draw: the chip idles at a fraction of
+its active current while sleeping) and, for `typing`, latency from a key
+event to the report reflecting it.
+
+    python bench_idle.py --sleep 0 --sleep 5 -o idle.json
+'''
+
+import contextlib
+import io
+import random
+from time import perf_counter_ns
+
+import benchmark
+import host
+from bench_loop import key_codes
+
+
+class Driver:
+    '''Runs a booted keyboard like `go()` on the simulated clock.'''
+
+    def __init__(self, keyboard, cpu_scale):
+        import supervisor
+        import usb_hid
+
+        import kmk.kmk_keyboard
+
+        self.keyboard = keyboard
+        self.clock = supervisor.clock
+        self.cpu_scale = cpu_scale
+        self.script = []
+        self.delivered = []
+        self.loops = 0
+        self.naps = 0
+        self.asleep_ns = 0
+        # Simulated time at the end of the cycle that sent each report
+        self.device = usb_hid.Device.KEYBOARD
+        self.sent_ns = []
+        kmk.kmk_keyboard.sleep = self._sleep
+
+    def _sleep(self, seconds):
+        self.naps += 1
+        ns = int(seconds * 1e9)
+        self.clock.advance_ns(ns)
+        self.asleep_ns += ns
+        self._deliver()
+
+    def _deliver(self):
+        now = self.clock.now_ns()
+        while self.script and self.script[0][0] <= now:
+            due_ns, key_number, pressed = self.script.pop(0)
+            if pressed:
+                host.press(self.keyboard, key_number)
+            else:
+                host.release(self.keyboard, key_number)
+            self.delivered.append((due_ns, key_number, pressed))
+
+    def run(self, ms):
+        keyboard = self.keyboard
+        clock = self.clock
+        reports = self.device.reports
+        sent_ns = self.sent_ns
+        until_ns = clock.now_ns() + ms * 1_000_000
+        while clock.now_ns() < until_ns:
+            self._deliver()
+            t0 = perf_counter_ns()
+            keyboard._main_loop()
+            clock.advance_ns(int((perf_counter_ns() - t0) * self.cpu_scale))
+            self.loops += 1
+            while len(sent_ns) < len(reports):
+                sent_ns.append(clock.now_ns())
+            if keyboard.idle_sleep_ms:
+                keyboard._idle()
+
+
+def boot(sleep_ms, cpu_scale):
+    with contextlib.redirect_stdout(io.StringIO()):
+        keyboard = host.load_main()['keyboard']
+    keyboard.idle_sleep_ms = sleep_ms
+    return Driver(keyboard, cpu_scale)
+
+
+def power(driver, ms):
+    seconds = ms / 1000
+    return {
+        'loops_per_sec': round(driver.loops / seconds),
+        'naps_per_sec': round(driver.naps / seconds),
+        'awake_pct': round(100 - driver.asleep_ns / (ms * 1e4), 2),
+    }
+
+
+def measure_idle(sleep_ms, ms, cpu_scale):
+    driver = boot(sleep_ms, cpu_scale)
+    with contextlib.redirect_stdout(io.StringIO()):
+        driver.run(ms)
+    return power(driver, ms)
+
+
+def measure_typing(sleep_ms, taps, cpu_scale, seed=1):
+    driver = boot(sleep_ms, cpu_scale)
+    codes = {k: c for k, c in key_codes(driver.keyboard).items() if c}
+    rng = random.Random(seed)
+    due_ns = driver.clock.now_ns()
+    for _ in range(taps):
+        key_number = rng.choice(sorted(codes))
+        due_ns += rng.randrange(40, 200) * 1_000_000
+        driver.script.append((due_ns, key_number, True))
+        due_ns += rng.randrange(30, 120) * 1_000_000
+        driver.script.append((due_ns, key_number, False))
+
+    device = driver.device
+    seen = len(device.reports)
+    start_ns = driver.clock.now_ns()
+    ms = (due_ns - start_ns) // 1_000_000 + 100
+    with contextlib.redirect_stdout(io.StringIO()):
+        driver.run(ms)
+
+    # Taps don't overlap, so reports and events pair up in order.
+    latency_ns = []
+    reports = device.reports[seen:]
+    sent_ns = driver.sent_ns[seen:]
+    for event, sent, ns in zip(driver.delivered, reports, sent_ns):
+        event_ns, key_number, pressed = event
+        assert (codes[key_number] in sent.report[1:]) == pressed
+        latency_ns.append(ns - event_ns)
+
+    return {
+        'taps': taps,
+        'reports': len(reports),
+        **power(driver, ms),
+        'latency': benchmark.summarize(latency_ns),
+    }
+
+
+def run(sleeps=(0, 5), idle_ms=2000, taps=50, cpu_scale=1):
+    results = {'cpu_scale': cpu_scale, 'idle': {}, 'typing': {}}
+    for sleep_ms in sleeps:
+        label = f'sleep_{sleep_ms}ms'
+        results['idle'][label] = measure_idle(sleep_ms, idle_ms, cpu_scale)
+        results['typing'][label] = measure_typing(sleep_ms, taps, cpu_scale)
+    return results
+
+
+def main():
+    parser = benchmark.argument_parser(__doc__.splitlines()[1])
+    parser.add_argument(
+        '--sleep',
+        type=int,
+        action='append',
+        default=None,
+        help='KMKKeyboard.idle_sleep_ms to compare (repeatable)',
+    )
+    parser.add_argument('--idle-ms', type=int, default=2000)
+    parser.add_argument('--taps', type=int, default=50)
+    parser.add_argument(
+        '--cpu-scale',
+        type=float,
+        default=1,
+        help='how much slower than the host the firmware runs',
+    )
+    args = parser.parse_args()
+
+    host.install()
+    results = run(args.sleep or (0, 5), args.idle_ms, args.taps, args.cpu_scale)
+    benchmark.emit('idle', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
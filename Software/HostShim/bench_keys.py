@@ -0,0 +1,136 @@
+'''
+RAM and lookup cost of the `KC` key table (`kmk.keys.KeyAttrDict`).
+
+Boots main.py, then defines every key comms/keytable.py knows about and
+reports the heap taken by `gc.mem_free()` per name, including the key
+objects, and the part of it allocated by `KeyAttrDict` itself, and how long
+`KC` takes for cached names, for names it has to generate and for names
+that aren't keys at all.
+
+`keymap` is the heap taken by a 12 key x `--layers` keymap of the kinds of
+keys the GUI and main.py use: plain keys, shortcuts like `KC.LCTL(KC.C)`,
+layer keys, hold-taps and macros, with the same shortcuts and layer keys
+repeated on every layer.
+
+    python bench_keys.py --layers 8 -o keys.json
+'''
+
+import contextlib
+import gc
+import inspect
+import io
+import tracemalloc
+
+import benchmark
+import host
+
+
+def keymap_layer(KC, layer, layers):
+    return [
+        KC.A, KC.B, KC.ENTER, KC.ESC,
+        KC.LCTL(KC.C), KC.LCTL(KC.V), KC.LCTL(KC.LSFT(KC.Z)), KC.LGUI(KC.TAB),
+        KC.MO((layer + 1) % layers), KC.DF(0),
+        KC.HT(KC.SPACE, KC.LSFT), KC.MACRO('hello'),
+    ]  # fmt: skip
+
+
+def measure_keymap(layers):
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        namespace = host.load_main()
+    from kmk.keys import KC
+
+    keyboard = namespace['keyboard']
+    # Every key used, so only the keymap's own keys are counted
+    keymap_layer(KC, 0, layers)
+    gc.collect()
+    free = gc.mem_free()
+    keymap = [keymap_layer(KC, layer, layers) for layer in range(layers)]
+    gc.collect()
+    used = free - gc.mem_free()
+    tracemalloc.stop()
+
+    keyboard.keymap = keymap
+    keyboard.invalidate_key_table()
+    return {
+        'layers': layers,
+        'distinct_keys': len({id(key) for layer in keymap for key in layer}),
+        'bytes': used,
+        'bytes_per_key': round(used / (layers * 12), 1),
+    }
+
+
+def run(repeat=2000, layers=8):
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        host.load_main()
+
+    from kmk.keys import KC, KeyAttrDict
+
+    from comms.keytable import NAMES
+
+    lines, first = inspect.getsourcelines(KeyAttrDict)
+    source = inspect.getsourcefile(KeyAttrDict)
+
+    def table_bytes():
+        snapshot = tracemalloc.take_snapshot()
+        return sum(
+            stat.size
+            for stat in snapshot.statistics('lineno')
+            if stat.traceback[0].filename == source
+            and first <= stat.traceback[0].lineno < first + len(lines)
+        )
+
+    gc.collect()
+    before_names = len(list(KC))
+    free = gc.mem_free()
+    table = table_bytes()
+    for name in NAMES:
+        KC[name]
+    gc.collect()
+    used = free - gc.mem_free()
+    table = table_bytes() - table
+    tracemalloc.stop()
+
+    names = list(KC)
+    keys = {id(KC.get_cached(name)) for name in names}
+    added_names = len(names) - before_names
+
+    # Again without tracemalloc slowing every allocation down
+    with contextlib.redirect_stdout(io.StringIO()):
+        host.load_main()
+    from kmk.keys import KC
+
+    generate = benchmark.time_calls(lambda: [KC[name] for name in NAMES], 1)
+    cached = benchmark.time_calls(lambda: KC['ENTER'], repeat)
+    deep = benchmark.time_calls(lambda: KC['QUESTION'], repeat)
+    miss = benchmark.time_calls(lambda: KC.get('NOT_A_KEY'), repeat)
+
+    return {
+        'names': len(names),
+        'keys': len(keys),
+        'added_names': added_names,
+        'added_bytes': used,
+        'bytes_per_name': round(used / added_names, 1),
+        'table_bytes': table,
+        'table_bytes_per_name': round(table / added_names, 1),
+        'generate_all_us': round(generate[0] / 1e3, 1),
+        'hit': benchmark.summarize(cached),
+        'hit_last_generator': benchmark.summarize(deep),
+        'miss': benchmark.summarize(miss),
+        'keymap': measure_keymap(layers),
+    }
+
+
+def main():
+    parser = benchmark.argument_parser(__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--layers', type=int, default=8)
+    args = parser.parse_args()
+
+    host.install()
+    benchmark.emit('keys', run(args.repeat, args.layers), args.output)
+
+
+if __name__ == '__main__':
+    main()
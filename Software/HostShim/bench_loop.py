@@ -0,0 +1,214 @@
+'''
+Scan-to-HID benchmark for `KMKKeyboard._main_loop`.
+
+Boots Firmware/main.py (Layers, EncoderHandler, HoldTap, Macros,
+SerialCommandModule, InactivityDetector, Display and MediaKeys) on the host
+shim, feeds it scripted `keypad.Event` streams and reports as JSON:
+
+- idle loop rate and per-iteration cost, and which modules each hook reaches,
+- p50/p99 latency from injecting an event to the USB report reflecting it,
+  both in host time and in loop iterations,
+- heap growth per keypress.
+
+    python bench_loop.py -o before.json
+    python bench_loop.py --drop InactivityDetector -o without_inactivity.json
+'''
+
+import contextlib
+import io
+from time import perf_counter_ns
+
+import benchmark
+import host
+
+
+def boot(drop=(), budget=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        keyboard = host.load_main()['keyboard']
+    if budget is not None:
+        keyboard.matrix_event_budget = budget
+    dropped = [
+        handler
+        for handler in keyboard.modules + keyboard.extensions
+        if type(handler).__name__ in drop
+    ]
+    keyboard.modules[:] = [m for m in keyboard.modules if m not in dropped]
+    keyboard.extensions[:] = [e for e in keyboard.extensions if e not in dropped]
+    # The hook registry was built while booting
+    for handler in dropped:
+        keyboard.unsubscribe(handler)
+    return keyboard
+
+
+def key_codes(keyboard):
+    '''HID usage code sent for each key number on the base layer.'''
+    codes = {}
+    for key_number in range(sum(m.key_count for m in keyboard.matrix)):
+        key = keyboard._find_key_in_map(key_number)
+        codes[key_number] = getattr(key, 'code', None)
+    return codes
+
+
+def measure_idle(keyboard, iterations, step_ms):
+    import supervisor
+
+    clock = supervisor.clock
+    main_loop = keyboard._main_loop
+
+    def step():
+        main_loop()
+        clock.advance(step_ms)
+
+    samples = benchmark.time_calls(step, iterations)
+    total = sum(samples)
+    return {
+        'iterations': iterations,
+        'loops_per_sec': round(iterations / (total / 1e9)),
+        **benchmark.summarize(samples),
+    }
+
+
+def _settle(keyboard, step_ms, loops=5):
+    host.run(keyboard, loops, step_ms)
+
+
+def measure_latency(keyboard, chord, repeats, step_ms, max_loops=1000):
+    '''Latency until every key of `chord` shows up in (or leaves) a report.'''
+    import supervisor
+    import usb_hid
+
+    clock = supervisor.clock
+    device = usb_hid.Device.KEYBOARD
+    codes = key_codes(keyboard)
+    latency_ns = []
+    latency_loops = []
+
+    for _ in range(repeats):
+        for pressed in (True, False):
+            seen = len(device.reports)
+            waiting = {codes[k] for k in chord}
+            t0 = perf_counter_ns()
+            for key_number in chord:
+                if pressed:
+                    host.press(keyboard, key_number)
+                else:
+                    host.release(keyboard, key_number)
+
+            loops = 0
+            while waiting and loops < max_loops:
+                keyboard._main_loop()
+                clock.advance(step_ms)
+                loops += 1
+                if len(device.reports) == seen:
+                    continue
+                for sent in device.reports[seen:]:
+                    for code in tuple(waiting):
+                        if (code in sent.report[1:]) == pressed:
+                            waiting.discard(code)
+                            latency_ns.append(sent.ns - t0)
+                            latency_loops.append(loops)
+                seen = len(device.reports)
+
+            _settle(keyboard, step_ms)
+
+    return latency_ns, latency_loops
+
+
+def measure_allocations(keyboard, chord, repeats, step_ms):
+    peaks = []
+    blocks = 0
+    for _ in range(repeats):
+        with benchmark.AllocationProbe() as probe:
+            for key_number in chord:
+                host.press(keyboard, key_number)
+            _settle(keyboard, step_ms)
+            for key_number in chord:
+                host.release(keyboard, key_number)
+            _settle(keyboard, step_ms)
+        peaks.append(probe.peak_bytes)
+        blocks += probe.net_blocks
+    keypresses = repeats * len(chord)
+    return {
+        'alloc_peak_bytes_p50': benchmark.percentile(peaks, 50),
+        'alloc_net_blocks_per_keypress': round(blocks / keypresses, 2),
+    }
+
+
+def measure_scenario(keyboard, chord, repeats, step_ms):
+    latency_ns, latency_loops = measure_latency(keyboard, chord, repeats, step_ms)
+    return {
+        'keys': list(chord),
+        'keypresses': repeats * len(chord),
+        'latency': benchmark.summarize(latency_ns),
+        'latency_loops': benchmark.summarize(latency_loops, unit='loops', scale=1),
+        **measure_allocations(keyboard, chord, min(repeats, 20), step_ms),
+    }
+
+
+SCENARIOS = {
+    'tap': ((0,), (5,), (11,)),
+    'chord3': ((0, 1, 2),),
+    'chord6': ((0, 1, 2, 3, 4, 5),),
+}
+
+
+def run(
+    iterations=20000, repeats=200, step_ms=1, drop=(), scenarios=None, budget=None
+):
+    keyboard = boot(drop, budget)
+    results = {
+        'modules': [type(m).__name__ for m in keyboard.modules],
+        'extensions': [type(e).__name__ for e in keyboard.extensions],
+        'matrix_event_budget': keyboard.matrix_event_budget,
+        'hooks': {
+            hook: [type(entry[0]).__name__ for entry in subscribers]
+            for hook, subscribers in getattr(keyboard, '_hooks', {}).items()
+        },
+        'step_ms': step_ms,
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+        results['idle'] = measure_idle(keyboard, iterations, step_ms)
+        for name in scenarios or SCENARIOS:
+            for chord in SCENARIOS[name]:
+                label = name if len(SCENARIOS[name]) == 1 else f'{name}_{chord[0]}'
+                results[label] = measure_scenario(keyboard, chord, repeats, step_ms)
+    return results
+
+
+def main():
+    parser = benchmark.argument_parser(__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--step-ms', type=float, default=1)
+    parser.add_argument(
+        '--drop',
+        action='append',
+        default=[],
+        metavar='CLASS',
+        help='remove a module or extension by class name (repeatable)',
+    )
+    parser.add_argument(
+        '--scenario', action='append', choices=sorted(SCENARIOS), default=None
+    )
+    parser.add_argument(
+        '--budget',
+        type=int,
+        default=None,
+        help='override KMKKeyboard.matrix_event_budget (events per loop)',
+    )
+    args = parser.parse_args()
+
+    host.install()
+    results = run(
+        args.iterations,
+        args.repeats,
+        args.step_ms,
+        args.drop,
+        args.scenario,
+        args.budget,
+    )
+    benchmark.emit('loop', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+'''
+Cost of turning the GUI's "KC.X" names into keys.
+
+Resolves a 12 key x 8 layer payload, mixing letters, digits, punctuation,
+modifiers, navigation and media keys, with `getattr(KC, name)` as main.py
+used to and with `comms.keylookup.resolve_key`. `cold` is the first payload
+after boot, when most keys don't exist yet and have to be generated, `warm`
+repeats it once every key is cached.
+
+    python bench_resolve.py -o resolve.json
+'''
+
+import contextlib
+import io
+import tracemalloc
+
+import benchmark
+import host
+
+LAYERS = 8
+KEYS_PER_LAYER = 12
+
+
+def payload():
+    from comms.keytable import NAMES
+
+    # Spread over the whole table, like a keymap using all kinds of keys
+    step = len(NAMES) // (LAYERS * KEYS_PER_LAYER)
+    return [NAMES[idx * step] for idx in range(LAYERS * KEYS_PER_LAYER)]
+
+
+def resolvers():
+    from kmk.keys import KC
+
+    from comms.keylookup import resolve_key
+
+    return {
+        'getattr': lambda name: getattr(KC, name),
+        'keytable': resolve_key,
+    }
+
+
+def measure(name, repeat):
+    with contextlib.redirect_stdout(io.StringIO()):
+        host.load_main()
+    resolve = resolvers()[name]
+    names = payload()
+
+    def run():
+        for key_name in names:
+            resolve(key_name)
+
+    cold = benchmark.time_calls(run, 1)
+    warm = benchmark.time_calls(run, repeat)
+
+    tracemalloc.start()
+    run()
+    allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'cold_us': round(cold[0] / 1e3, 3),
+        'warm': benchmark.summarize(warm),
+        'warm_peak_bytes': allocated,
+    }
+
+
+def run(repeat=200):
+    results = {'keys': LAYERS * KEYS_PER_LAYER}
+    for name in ('getattr', 'keytable'):
+        results[name] = measure(name, repeat)
+    return results
+
+
+def main():
+    parser = benchmark.argument_parser(__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    host.install()
+    benchmark.emit('resolve', run(args.repeat), args.output)
+
+
+if __name__ == '__main__':
+    main()
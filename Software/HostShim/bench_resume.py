@@ -0,0 +1,86 @@
+'''
+Heap cost of replaying buffered key events (`_process_resume_buffer`).
+
+Boots Kpad with HoldTap on every key and rolls over hold-tap keys, so each
+press is buffered while the hold-tap is undecided and replayed once it
+resolves. Reports per-keypress allocations during those bursts and how often
+the resume buffer had to grow.
+
+    python bench_resume.py -o resume.json
+'''
+
+import contextlib
+import io
+
+import benchmark
+import host
+
+
+def boot():
+    host.reset()
+    # boot_kpad() resets again, which would orphan the keys created here.
+    with contextlib.redirect_stdout(io.StringIO()):
+        from kmk.keys import KC
+        from kmk.modules.holdtap import HoldTap
+
+        holdtap = HoldTap()
+        mods = (KC.LSFT, KC.LCTL, KC.LALT, KC.LGUI)
+        taps = (KC.A, KC.B, KC.C, KC.D, KC.E, KC.F, KC.G, KC.H, KC.I, KC.J, KC.K, KC.L)
+        keymap = [[KC.HT(tap, mods[i % 4]) for i, tap in enumerate(taps)]]
+
+        reset, host.reset = host.reset, lambda: None
+        try:
+            return host.boot_kpad(keymap=keymap, modules=[holdtap])
+        finally:
+            host.reset = reset
+
+
+def roll(keyboard, keys, step_ms):
+    '''Press `keys` in quick succession, then release them in order.'''
+    for key_number in keys:
+        host.press(keyboard, key_number)
+        host.run(keyboard, 10, step_ms)
+    for key_number in keys:
+        host.release(keyboard, key_number)
+        host.run(keyboard, 2, step_ms)
+    host.run(keyboard, 300, step_ms)
+
+
+def run(repeats=50, width=6, step_ms=1):
+    keyboard = boot()
+    keys = tuple(range(width))
+    roll(keyboard, keys, step_ms)
+
+    peaks = []
+    blocks = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            with benchmark.AllocationProbe() as probe:
+                roll(keyboard, keys, step_ms)
+            peaks.append(probe.peak_bytes)
+            blocks += probe.net_blocks
+
+    buffer = keyboard._resume_buffer
+    return {
+        'rollover_width': width,
+        'keypresses': repeats * width,
+        'reports': len(host.reports()),
+        'alloc_peak_bytes_p50': benchmark.percentile(peaks, 50),
+        'alloc_net_blocks_per_keypress': round(blocks / (repeats * width), 2),
+        'resume_buffer_overflows': getattr(buffer, 'overflows', None),
+    }
+
+
+def main():
+    parser = benchmark.argument_parser(__doc__.splitlines()[1])
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--width', type=int, default=6)
+    parser.add_argument('--step-ms', type=float, default=1)
+    args = parser.parse_args()
+
+    host.install()
+    benchmark.emit('resume', run(args.repeats, args.width, args.step_ms), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+'''
+Timer cost, `kmk.scheduler`'s TaskQueue heap versus `kmk.scheduler_wheel`.
+
+`churn` drives both implementations directly the way HoldTap and Combos use
+them: a few hundred timers are pending in the background, and every
+simulated millisecond new timeouts are created, most of them cancelled again
+before they fire, and due tasks are run. Reports the cost of
+`create_task`, `cancel_task` and a `get_due_task` pass.
+
+`combos` boots Kpad with a Combos chord on every pair of neighbouring keys
+and HoldTap on the bottom row, once per scheduler (`KMK_SCHEDULER`), plays
+the same seeded typing stream through the main loop and reports the loop
+cost, and whether both produced the same HID reports.
+
+    python bench_scheduler.py -o scheduler.json
+'''
+
+import contextlib
+import io
+import os
+import random
+from time import perf_counter_ns
+
+import benchmark
+import host
+
+SCHEDULERS = ('heap', 'wheel')
+
+
+def _noop():
+    pass
+
+
+def churn(scheduler, ms=5000, per_ms=3, background=200):
+    import supervisor
+
+    clock = supervisor.clock
+    rng = random.Random(1)
+    create_task = scheduler.create_task
+    cancel_task = scheduler.cancel_task
+    get_due_task = scheduler.get_due_task
+
+    for _ in range(background):
+        create_task(_noop, after_ms=rng.randrange(1, 2000))
+
+    create_ns = []
+    cancel_ns = []
+    due_ns = []
+    fired = 0
+    for _ in range(ms):
+        for _ in range(per_ms):
+            after_ms = rng.choice((50, 200, 300))
+            t0 = perf_counter_ns()
+            task = create_task(_noop, after_ms=after_ms)
+            create_ns.append(perf_counter_ns() - t0)
+            if rng.random() < 0.8:
+                t0 = perf_counter_ns()
+                cancel_task(task)
+                cancel_ns.append(perf_counter_ns() - t0)
+
+        t0 = perf_counter_ns()
+        for func in get_due_task():
+            func()
+            fired += 1
+        due_ns.append(perf_counter_ns() - t0)
+        clock.advance(1)
+
+    return {
+        'fired': fired,
+        'create': benchmark.summarize(create_ns),
+        'cancel': benchmark.summarize(cancel_ns),
+        'get_due_task': benchmark.summarize(due_ns),
+    }
+
+
+def boot(scheduler):
+    os.environ['KMK_SCHEDULER'] = scheduler
+    host.reset()
+    # boot_kpad() resets again, which would orphan the keys created here.
+    with contextlib.redirect_stdout(io.StringIO()):
+        from kmk.keys import KC
+        from kmk.modules.combos import Chord, Combos
+        from kmk.modules.holdtap import HoldTap
+
+        holdtap = HoldTap()
+        taps = (KC.A, KC.B, KC.C, KC.D, KC.E, KC.F, KC.G, KC.H)
+        mods = (KC.LSFT, KC.LCTL, KC.LALT, KC.LGUI)
+        keys = list(taps) + [
+            KC.HT(tap, mod) for tap, mod in zip((KC.I, KC.J, KC.K, KC.L), mods)
+        ]
+        combos = Combos()
+        combos.combos = [
+            Chord((keys[idx], keys[idx + 1]), KC.F1, timeout=50)
+            for idx in range(len(taps) - 1)
+        ]
+
+        reset, host.reset = host.reset, lambda: None
+        try:
+            return host.boot_kpad(keymap=[keys], modules=[combos, holdtap])
+        finally:
+            host.reset = reset
+
+
+def measure_combos(scheduler, events):
+    keyboard = boot(scheduler)
+    main_loop = keyboard._main_loop
+
+    import supervisor
+
+    clock = supervisor.clock
+    rng = random.Random(2)
+    key_count = sum(m.key_count for m in keyboard.matrix)
+    down = set()
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(events):
+            key_number = rng.randrange(key_count)
+            if key_number in down:
+                host.release(keyboard, key_number)
+                down.discard(key_number)
+            elif len(down) < 3:
+                host.press(keyboard, key_number)
+                down.add(key_number)
+            for _ in range(rng.choice((5, 20, 40, 80))):
+                t0 = perf_counter_ns()
+                main_loop()
+                samples.append(perf_counter_ns() - t0)
+                clock.advance(1)
+        for key_number in down:
+            host.release(keyboard, key_number)
+        host.run(keyboard, 500)
+
+    return host.reports(), {
+        'loops': len(samples),
+        'loop': benchmark.summarize(samples),
+        'total_ms': round(sum(samples) / 1e6, 3),
+    }
+
+
+def run(ms=5000, events=1000):
+    host.install()
+    results = {'churn': {}, 'combos': {}}
+
+    os.environ.pop('KMK_SCHEDULER', None)
+    host.reset()
+    import kmk.scheduler
+    import kmk.scheduler_wheel
+
+    for name, scheduler in zip(SCHEDULERS, (kmk.scheduler, kmk.scheduler_wheel)):
+        results['churn'][name] = churn(scheduler, ms)
+
+    reports = {}
+    for name in SCHEDULERS:
+        reports[name], results['combos'][name] = measure_combos(name, events)
+    results['combos']['reports'] = len(reports['heap'])
+    results['combos']['reports_match'] = reports['heap'] == reports['wheel']
+    os.environ.pop('KMK_SCHEDULER', None)
+    return results
+
+
+def main():
+    parser = benchmark.argument_parser(__doc__.splitlines()[1])
+    parser.add_argument('--ms', type=int, default=5000)
+    parser.add_argument('--events', type=int, default=1000)
+    args = parser.parse_args()
+
+    benchmark.emit('scheduler', run(args.ms, args.events), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+'''
+Serial command throughput, line-delimited JSON versus binary frames.
+
+Boots Firmware/main.py on the host shim behind a pseudo-terminal pair: a
+device thread shuttles bytes between the pty and the shim's USB console while
+running the keyboard loop in real time, and the main thread plays the GUI
+using Software/GUI/FrameProtocol.py. Each protocol pushes the same workload
+(every layer via `set_keybindings`, then `get_current_keymap`) and reports
+bytes on the wire, wall time until the last response and time spent in
+`SerialCommandModule.process_serial_command`. `delta` is what a reconnect
+costs once the device holds the same layers (`get_layer_hashes` only) and
+what a single key edit costs (`patch_keys`), both over binary frames.
+
+`stall` trickles the same JSON workload into the console a chunk per loop
+iteration, on simulated time, and reports how long single loop iterations
+take while commands are only partially received.
+
+    python bench_serial.py --layers 6 -o serial.json
+'''
+
+import contextlib
+import io
+import json
+import os
+import select
+import sys
+import threading
+import tty
+from time import perf_counter_ns
+
+import benchmark
+import host
+
+GUI = os.path.normpath(os.path.join(host.HERE, '..', 'GUI'))
+
+
+class _ConsoleWriter(io.TextIOBase):
+    '''`sys.stdout` for the device thread: `print` ends up on the console.'''
+
+    def __init__(self, console):
+        self._console = console
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self._console.write(text.encode())
+        return len(text)
+
+
+class Device(threading.Thread):
+    def __init__(self, keyboard, fd):
+        super().__init__(daemon=True)
+        self.keyboard = keyboard
+        self.fd = fd
+        self.stop = threading.Event()
+
+    def run(self):
+        import usb_cdc
+
+        console = usb_cdc.console
+        main_loop = self.keyboard._main_loop
+        with contextlib.redirect_stdout(_ConsoleWriter(console)):
+            while not self.stop.is_set():
+                readable, _, _ = select.select((self.fd,), (), (), 0)
+                if readable:
+                    console.feed(os.read(self.fd, 4096))
+                main_loop()
+                if console.tx:
+                    os.write(self.fd, bytes(console.tx))
+                    console.tx.clear()
+
+
+def instrument(module):
+    '''Accumulate the time spent in `module.process_serial_command`.'''
+    process = module.process_serial_command
+    module.busy_ns = 0
+
+    def timed():
+        t0 = perf_counter_ns()
+        try:
+            process()
+        finally:
+            module.busy_ns += perf_counter_ns() - t0
+
+    module.process_serial_command = timed
+
+
+def workload(layers):
+    import FrameProtocol
+
+    names = FrameProtocol.KEY_NAMES
+    commands = []
+    for layer in range(layers):
+        keys = ['KC.' + names[(layer * 12 + idx) % len(names)] for idx in range(12)]
+        commands.append(
+            {
+                'action': 'set_keybindings',
+                'keybindings': keys,
+                'layer': layer,
+                'layer_name': f'Layer {layer}',
+            }
+        )
+    commands.append({'action': 'get_current_keymap'})
+    return commands
+
+
+def exchange(fd, commands, binary, timeout_s=30):
+    '''Send every command at once and wait for all the responses.'''
+    import FrameProtocol
+
+    if binary:
+        frames = []
+        for request_id, command in enumerate(commands):
+            msg_type, payload = FrameProtocol.encode_command(command)
+            frames.append(FrameProtocol.encode_frame(msg_type, request_id, payload))
+        data = b''.join(frames)
+    else:
+        data = b''.join((json.dumps(c) + '\n').encode() for c in commands)
+
+    decoder = FrameProtocol.FrameDecoder()
+    text = bytearray()
+    received = 0
+    responses = 0
+    t0 = perf_counter_ns()
+    os.write(fd, data)
+    deadline = t0 + timeout_s * 1e9
+    while responses < len(commands) and perf_counter_ns() < deadline:
+        readable, _, _ = select.select((fd,), (), (), 0.1)
+        if not readable:
+            continue
+        chunk = os.read(fd, 65536)
+        received += len(chunk)
+        for item in decoder.feed(chunk):
+            if isinstance(item, FrameProtocol.Frame):
+                responses += 1
+                continue
+            text.extend(item)
+            *lines, rest = bytes(text).split(b'\n')
+            text[:] = rest
+            responses += sum(1 for line in lines if line.startswith(b'{'))
+
+    return {
+        'commands': len(commands),
+        'responses': responses,
+        'bytes_to_device': len(data),
+        'bytes_from_device': received,
+        'wall_ms': round((perf_counter_ns() - t0) / 1e6, 3),
+    }
+
+
+def measure_stall(layers, chunk_size=64, step_ms=1):
+    import supervisor
+    import usb_cdc
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        namespace = host.load_main()
+    keyboard = namespace['keyboard']
+    console = usb_cdc.console
+    clock = supervisor.clock
+    data = b''.join((json.dumps(c) + '\n').encode() for c in workload(layers))
+
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        for start in range(0, len(data), chunk_size):
+            console.feed(data[start : start + chunk_size])
+            samples += benchmark.time_calls(keyboard._main_loop, 1)
+            clock.advance(step_ms)
+        loops = 0
+        while console.in_waiting and loops < 10000:
+            samples += benchmark.time_calls(keyboard._main_loop, 1)
+            clock.advance(step_ms)
+            loops += 1
+        host.run(keyboard, 200, step_ms)
+
+    return {
+        'bytes': len(data),
+        'chunk_size': chunk_size,
+        'responses': out.getvalue().count('{"status"'),
+        'loops': len(samples),
+        **benchmark.summarize(samples),
+    }
+
+
+def run(layers=6, check_interval=None):
+    import supervisor
+
+    stall = measure_stall(layers)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        namespace = host.load_main()
+    keyboard = namespace['keyboard']
+    module = namespace['serial_module']
+    if check_interval is not None:
+        module.check_interval = check_interval
+    instrument(module)
+    supervisor.clock.realtime = True
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    tty.setraw(master)
+    device = Device(keyboard, slave)
+    device.start()
+
+    commands = workload(layers)
+    results = {'layers': layers, 'check_interval_s': module.check_interval}
+    try:
+        for name, binary in (('json', False), ('binary', True)):
+            module.busy_ns = 0
+            results[name] = exchange(master, commands, binary)
+            results[name]['firmware_busy_us'] = round(module.busy_ns / 1e3, 1)
+        results['delta'] = {
+            'hashes': exchange(master, [{'action': 'get_layer_hashes'}], True),
+            'patch': exchange(
+                master,
+                [{'action': 'patch_keys', 'changes': [[layers - 1, 0, 'KC.ENTER']]}],
+                True,
+            ),
+        }
+    finally:
+        device.stop.set()
+        device.join()
+        os.close(master)
+        os.close(slave)
+    results['stall'] = stall
+    return results
+
+
+def main():
+    parser = benchmark.argument_parser(__doc__.splitlines()[1])
+    parser.add_argument('--layers', type=int, default=6)
+    parser.add_argument(
+        '--check-interval',
+        type=float,
+        default=None,
+        help='override SerialCommandModule.check_interval (seconds)',
+    )
+    args = parser.parse_args()
+
+    host.install()
+    sys.path.insert(0, GUI)
+    benchmark.emit('serial', run(args.layers, args.check_interval), args.output)
+
+
+if __name__ == '__main__':
+    main()
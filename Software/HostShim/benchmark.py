@@ -0,0 +1,114 @@
+'''
+Helpers shared by the `bench_*.py` scripts: percentiles, allocation probes and
+JSON output, so results from different builds can be diffed directly.
+'''
+
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import tracemalloc
+from time import perf_counter_ns
+
+import host
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(values, unit='us', scale=1e-3):
+    '''p50/p99/max of `values` (ns by default) converted with `scale`.'''
+    if not values:
+        return {}
+    return {
+        f'p50_{unit}': round(percentile(values, 50) * scale, 3),
+        f'p99_{unit}': round(percentile(values, 99) * scale, 3),
+        f'max_{unit}': round(max(values) * scale, 3),
+    }
+
+
+class AllocationProbe:
+    '''Measures heap growth of a code section with tracemalloc.
+
+    `peak_bytes` is the high-water mark above the starting point, i.e. the
+    transient memory a burst needs (shim bookkeeping such as captured HID
+    reports included). `net_blocks` counts blocks allocated from firmware
+    code that outlived the section.
+    '''
+
+    _filters = (tracemalloc.Filter(True, host.FIRMWARE + '/*'),)
+
+    def __init__(self):
+        self.peak_bytes = 0
+        self.net_blocks = 0
+
+    def _firmware_blocks(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces(self._filters)
+        return sum(stat.count for stat in snapshot.statistics('filename'))
+
+    def __enter__(self):
+        gc.collect()
+        tracemalloc.start()
+        self._start_blocks = self._firmware_blocks()
+        tracemalloc.reset_peak()
+        self._start_bytes = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *args):
+        self.peak_bytes = tracemalloc.get_traced_memory()[1] - self._start_bytes
+        gc.collect()
+        self.net_blocks = self._firmware_blocks() - self._start_blocks
+        tracemalloc.stop()
+
+
+def time_calls(func, count):
+    '''Per-call durations in ns.'''
+    samples = []
+    append = samples.append
+    for _ in range(count):
+        t0 = perf_counter_ns()
+        func()
+        append(perf_counter_ns() - t0)
+    return samples
+
+
+def firmware_revision():
+    try:
+        return subprocess.run(
+            ('git', 'describe', '--always', '--dirty'),
+            cwd=host.FIRMWARE,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def argument_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        '-o', '--output', help='write the JSON results here instead of stdout'
+    )
+    return parser
+
+
+def emit(name, results, output=None):
+    document = {
+        'benchmark': name,
+        'firmware_revision': firmware_revision(),
+        'python': platform.python_version(),
+        'results': results,
+    }
+    text = json.dumps(document, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
@@ -0,0 +1,121 @@
+'''
+Host stand-in for CircuitPython's native `_asyncio` module.
+
+`TaskQueue` is a pairing heap ordered by `ticks_diff` of `Task.ph_key`, with
+the same semantics as the C implementation: `push_head` is an alias of
+`push_sorted`, a missing key means "now", and removing a task that isn't
+queued is a no-op.
+'''
+
+from supervisor import ticks_ms
+
+_TICKS_MAX = (1 << 29) - 1
+_TICKS_HALFPERIOD = 1 << 28
+
+
+def _ticks_diff(new, start):
+    return ((new - start + _TICKS_HALFPERIOD) & _TICKS_MAX) - _TICKS_HALFPERIOD
+
+
+class Task:
+    def __init__(self, coro, globals=None):
+        self.coro = coro
+        self.data = None
+        self.state = True
+        self.ph_key = 0
+        # Pairing heap links: `ph_prev` is the parent for a first child and
+        # the left sibling otherwise; None means "not queued".
+        self.ph_child = None
+        self.ph_next = None
+        self.ph_prev = None
+
+    def done(self):
+        return not self.state
+
+    def cancel(self):
+        self.state = False
+
+
+def _lt(a, b):
+    return _ticks_diff(a.ph_key, b.ph_key) < 0
+
+
+def _meld(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if _lt(b, a):
+        a, b = b, a
+    b.ph_next = a.ph_child
+    if a.ph_child is not None:
+        a.ph_child.ph_prev = b
+    b.ph_prev = a
+    a.ph_child = b
+    a.ph_next = None
+    a.ph_prev = None
+    return a
+
+
+def _merge_pairs(first):
+    pairs = []
+    node = first
+    while node is not None:
+        a = node
+        b = a.ph_next
+        node = b.ph_next if b is not None else None
+        a.ph_next = a.ph_prev = None
+        if b is not None:
+            b.ph_next = b.ph_prev = None
+        pairs.append(_meld(a, b))
+
+    heap = None
+    while pairs:
+        heap = _meld(pairs.pop(), heap)
+    return heap
+
+
+class TaskQueue:
+    def __init__(self):
+        self.heap = None
+
+    def peek(self):
+        return self.heap
+
+    def push_sorted(self, task, key=None):
+        task.data = None
+        task.ph_key = ticks_ms() & _TICKS_MAX if key is None else key
+        task.ph_child = task.ph_next = task.ph_prev = None
+        self.heap = _meld(self.heap, task)
+
+    push_head = push_sorted
+    push = push_sorted
+
+    def pop_head(self):
+        task = self.heap
+        if task is not None:
+            self.heap = _merge_pairs(task.ph_child)
+            task.ph_child = task.ph_next = task.ph_prev = None
+        return task
+
+    pop = pop_head
+
+    def remove(self, task):
+        if task is self.heap:
+            self.pop_head()
+            return
+
+        prev = task.ph_prev
+        if prev is None:
+            return
+
+        if prev.ph_child is task:
+            prev.ph_child = task.ph_next
+        else:
+            prev.ph_next = task.ph_next
+        if task.ph_next is not None:
+            task.ph_next.ph_prev = prev
+
+        subtree = _merge_pairs(task.ph_child)
+        task.ph_child = task.ph_next = task.ph_prev = None
+        self.heap = _meld(self.heap, subtree)
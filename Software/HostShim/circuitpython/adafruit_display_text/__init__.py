@@ -0,0 +1,42 @@
+'''Host stand-in for the `adafruit_display_text` library.'''
+
+import displayio
+
+
+class LabelBase(displayio.Group):
+    def __init__(
+        self,
+        font,
+        *,
+        text='',
+        color=0xFFFFFF,
+        background_color=None,
+        scale=1,
+        anchor_point=None,
+        anchored_position=None,
+        **kwargs,
+    ):
+        super().__init__(scale=scale, x=kwargs.get('x', 0), y=kwargs.get('y', 0))
+        self.font = font
+        self.color = color
+        self.background_color = background_color
+        self.anchor_point = anchor_point
+        self.anchored_position = anchored_position
+        # Number of text layouts performed, i.e. how often `text` was set.
+        self.layouts = 0
+        self._text = ''
+        self.text = text
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        self.layouts += 1
+        self._text = text
+
+    @property
+    def bounding_box(self):
+        width, height = self.font.get_bounding_box()
+        return (0, 0, width * len(self._text), height)
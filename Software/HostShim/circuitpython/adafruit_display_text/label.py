@@ -0,0 +1,5 @@
+from adafruit_display_text import LabelBase
+
+
+class Label(LabelBase):
+    pass
@@ -0,0 +1,10 @@
+'''Host stand-in for the `adafruit_displayio_ssd1306` driver.'''
+
+import displayio
+
+
+class SSD1306(displayio.Display):
+    def __init__(self, bus, **kwargs):
+        kwargs.setdefault('width', 128)
+        kwargs.setdefault('height', 32)
+        super().__init__(bus, b'', **kwargs)
@@ -0,0 +1,23 @@
+'''Host stand-in for the `adafruit_pixelbuf` library.'''
+
+
+class PixelBuf:
+    def __init__(self, size, *, byteorder='BGR', brightness=1.0, auto_write=False, **kwargs):
+        self._pixels = [(0, 0, 0)] * size
+        self.brightness = brightness
+        self.auto_write = auto_write
+
+    def __len__(self):
+        return len(self._pixels)
+
+    def __getitem__(self, index):
+        return self._pixels[index]
+
+    def __setitem__(self, index, value):
+        self._pixels[index] = value
+
+    def fill(self, color):
+        self._pixels = [color] * len(self._pixels)
+
+    def show(self):
+        pass
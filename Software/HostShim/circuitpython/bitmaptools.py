@@ -0,0 +1,38 @@
+'''Host stand-in for CircuitPython's `bitmaptools` module (the parts used).'''
+
+
+def blit(
+    dest_bitmap,
+    source_bitmap,
+    x,
+    y,
+    *,
+    x1=0,
+    y1=0,
+    x2=None,
+    y2=None,
+    skip_source_index=None,
+    skip_dest_index=None,
+):
+    x2 = source_bitmap.width if x2 is None else x2
+    y2 = source_bitmap.height if y2 is None else y2
+    for src_y in range(y1, y2):
+        dest_y = y + src_y - y1
+        if not 0 <= dest_y < dest_bitmap.height:
+            continue
+        for src_x in range(x1, x2):
+            dest_x = x + src_x - x1
+            if not 0 <= dest_x < dest_bitmap.width:
+                continue
+            value = source_bitmap[src_x, src_y]
+            if value == skip_source_index:
+                continue
+            if dest_bitmap[dest_x, dest_y] == skip_dest_index:
+                continue
+            dest_bitmap[dest_x, dest_y] = value
+
+
+def fill_region(dest_bitmap, x1, y1, x2, y2, value):
+    for y in range(max(y1, 0), min(y2, dest_bitmap.height)):
+        for x in range(max(x1, 0), min(x2, dest_bitmap.width)):
+            dest_bitmap[x, y] = value
@@ -0,0 +1,26 @@
+'''Host stand-in for the Seeeduino XIAO RP2040 `board` module.'''
+
+from microcontroller import Pin
+
+D0 = A0 = Pin('D0')
+D1 = A1 = Pin('D1')
+D2 = A2 = Pin('D2')
+D3 = A3 = Pin('D3')
+D4 = SDA = Pin('D4')
+D5 = SCL = Pin('D5')
+D6 = TX = Pin('D6')
+D7 = RX = Pin('D7')
+D8 = SCK = Pin('D8')
+D9 = MISO = Pin('D9')
+D10 = MOSI = Pin('D10')
+NEOPIXEL = Pin('NEOPIXEL')
+NEOPIXEL_POWER = Pin('NEOPIXEL_POWER')
+LED = LED_RED = Pin('LED_RED')
+LED_GREEN = Pin('LED_GREEN')
+LED_BLUE = Pin('LED_BLUE')
+
+
+def I2C():
+    import busio
+
+    return busio.I2C(SCL, SDA)
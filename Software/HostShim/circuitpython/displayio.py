@@ -0,0 +1,187 @@
+'''
+Host stand-in for CircuitPython's `displayio` module.
+
+Only the object model is reproduced (groups, tile grids, bitmaps); nothing is
+rasterised. Displays count refreshes so scene cost can be compared.
+'''
+
+import struct
+
+import storage
+
+
+class Bitmap:
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        self._data = bytearray(width * height)
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            index = index[1] * self.width + index[0]
+        return self._data[index]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, tuple):
+            index = index[1] * self.width + index[0]
+        self._data[index] = value
+
+    def fill(self, value):
+        for idx in range(len(self._data)):
+            self._data[idx] = value
+
+
+class Palette:
+    def __init__(self, color_count, *, dither=False):
+        self._colors = [0] * color_count
+        self._transparent = set()
+
+    def __len__(self):
+        return len(self._colors)
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, value):
+        self._colors[index] = value
+
+    def make_transparent(self, index):
+        self._transparent.add(index)
+
+    def make_opaque(self, index):
+        self._transparent.discard(index)
+
+
+class ColorConverter:
+    def __init__(self, *, input_colorspace=None, dither=False):
+        pass
+
+
+class OnDiskBitmap:
+    def __init__(self, file):
+        if isinstance(file, str):
+            with open(storage.host_path(file), 'rb') as f:
+                header = f.read(26)
+        else:
+            header = file.read(26)
+        if header[:2] != b'BM':
+            raise ValueError('Invalid BMP file')
+        self.width, height = struct.unpack_from('<ii', header, 18)
+        self.height = abs(height)
+        self.pixel_shader = ColorConverter()
+
+
+class TileGrid:
+    def __init__(
+        self,
+        bitmap,
+        *,
+        pixel_shader,
+        width=1,
+        height=1,
+        tile_width=None,
+        tile_height=None,
+        default_tile=0,
+        x=0,
+        y=0,
+    ):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.width = width
+        self.height = height
+        self.tile_width = bitmap.width if tile_width is None else tile_width
+        self.tile_height = bitmap.height if tile_height is None else tile_height
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._tiles = [default_tile] * (width * height)
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            index = index[1] * self.width + index[0]
+        return self._tiles[index]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, tuple):
+            index = index[1] * self.width + index[0]
+        self._tiles[index] = value
+
+
+class Group:
+    def __init__(self, *, scale=1, x=0, y=0):
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._layers = []
+
+    def append(self, layer):
+        self._layers.append(layer)
+
+    def insert(self, index, layer):
+        self._layers.insert(index, layer)
+
+    def index(self, layer):
+        return self._layers.index(layer)
+
+    def pop(self, i=-1):
+        return self._layers.pop(i)
+
+    def remove(self, layer):
+        self._layers.remove(layer)
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __getitem__(self, index):
+        return self._layers[index]
+
+    def __setitem__(self, index, value):
+        self._layers[index] = value
+
+    def __delitem__(self, index):
+        del self._layers[index]
+
+    def __iter__(self):
+        return iter(self._layers)
+
+
+CIRCUITPYTHON_TERMINAL = Group()
+
+
+class Display:
+    def __init__(
+        self,
+        display_bus,
+        init_sequence=b'',
+        *,
+        width,
+        height,
+        rotation=0,
+        auto_refresh=True,
+        **kwargs,
+    ):
+        self.bus = display_bus
+        self.width = width
+        self.height = height
+        self.rotation = rotation
+        self.auto_refresh = auto_refresh
+        self.root_group = CIRCUITPYTHON_TERMINAL
+        self.brightness = 1.0
+        self.refreshes = 0
+        self.is_awake = True
+
+    def refresh(self, *, target_frames_per_second=None, minimum_frames_per_second=0):
+        self.refreshes += 1
+        return True
+
+    def sleep(self):
+        self.is_awake = False
+
+    def wake(self):
+        self.is_awake = True
+
+
+def release_displays():
+    pass
@@ -0,0 +1,13 @@
+'''Host stand-in for CircuitPython's `i2cdisplaybus` module.'''
+
+
+class I2CDisplayBus:
+    def __init__(self, i2c_bus, *, device_address, reset=None):
+        self.i2c_bus = i2c_bus
+        self.device_address = device_address
+
+    def send(self, command, data):
+        self.i2c_bus.writeto(self.device_address, bytes((command,)) + bytes(data))
+
+    def reset(self):
+        pass
@@ -0,0 +1,151 @@
+'''
+Host stand-in for CircuitPython's `keypad` module.
+
+The scanners never touch pins; the host injects key transitions with
+`press()`/`release()`, which queue events exactly like the native background
+scanner would.
+'''
+
+from collections import deque
+
+from supervisor import ticks_ms
+
+
+class Event:
+    def __init__(self, key_number=0, pressed=True, timestamp=None):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.timestamp = ticks_ms() if timestamp is None else timestamp
+
+    @property
+    def released(self) -> bool:
+        return not self.pressed
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Event)
+            and self.key_number == other.key_number
+            and self.pressed == other.pressed
+        )
+
+    def __hash__(self):
+        return self.key_number << 1 | self.pressed
+
+    def __repr__(self):
+        return '<Event: key_number {} {}>'.format(
+            self.key_number, 'pressed' if self.pressed else 'released'
+        )
+
+
+class EventQueue:
+    def __init__(self, max_events=64):
+        self._events = deque()
+        self._max_events = max_events
+        self.overflowed = False
+
+    def get(self):
+        if self._events:
+            return self._events.popleft()
+
+    def get_into(self, event) -> bool:
+        if not self._events:
+            return False
+        src = self._events.popleft()
+        event.key_number = src.key_number
+        event.pressed = src.pressed
+        event.timestamp = src.timestamp
+        return True
+
+    def clear(self) -> None:
+        self._events.clear()
+        self.overflowed = False
+
+    def __bool__(self):
+        return bool(self._events)
+
+    def __len__(self):
+        return len(self._events)
+
+    def put(self, key_number, pressed) -> bool:
+        if len(self._events) >= self._max_events:
+            self.overflowed = True
+            return False
+        self._events.append(Event(key_number, pressed))
+        return True
+
+
+class _Scanner:
+    def __init__(self, key_count, max_events=64):
+        self.key_count = key_count
+        self.events = EventQueue(max_events)
+        self._state = [False] * key_count
+
+    def reset(self) -> None:
+        for key_number, pressed in enumerate(self._state):
+            if pressed:
+                self.events.put(key_number, True)
+
+    def deinit(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
+
+    def press(self, key_number) -> None:
+        if not self._state[key_number]:
+            self._state[key_number] = True
+            self.events.put(key_number, True)
+
+    def release(self, key_number) -> None:
+        if self._state[key_number]:
+            self._state[key_number] = False
+            self.events.put(key_number, False)
+
+
+class Keys(_Scanner):
+    def __init__(
+        self,
+        pins,
+        *,
+        value_when_pressed,
+        pull=True,
+        interval=0.02,
+        max_events=64,
+        debounce_threshold=1,
+    ):
+        super().__init__(len(pins), max_events)
+
+
+class KeyMatrix(_Scanner):
+    def __init__(
+        self,
+        row_pins,
+        column_pins,
+        columns_to_anodes=True,
+        interval=0.02,
+        max_events=64,
+        debounce_threshold=1,
+    ):
+        super().__init__(len(row_pins) * len(column_pins), max_events)
+
+
+class ShiftRegisterKeys(_Scanner):
+    def __init__(
+        self,
+        *,
+        clock,
+        data,
+        latch,
+        value_to_latch=True,
+        key_count,
+        value_when_pressed,
+        interval=0.02,
+        max_events=64,
+        debounce_threshold=1,
+    ):
+        if not isinstance(key_count, int):
+            key_count = sum(key_count)
+        super().__init__(key_count, max_events)
@@ -0,0 +1,45 @@
+'''Host stand-in for CircuitPython's `microcontroller` module.'''
+
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+        # Logic level seen by an input, settable from the host.
+        self.level = True
+
+    def __repr__(self):
+        return 'board.' + self.name
+
+
+class RunMode:
+    NORMAL = 0
+    SAFE_MODE = 1
+    UF2 = 2
+    BOOTLOADER = 3
+
+
+class _Processor:
+    frequency = 125_000_000
+    temperature = 25.0
+    voltage = 3.3
+
+
+cpu = _Processor()
+nvm = bytearray(4096)
+
+reset_requested = False
+next_run_mode = RunMode.NORMAL
+
+
+def reset():
+    global reset_requested
+    reset_requested = True
+
+
+def on_next_reset(run_mode):
+    global next_run_mode
+    next_run_mode = run_mode
+
+
+def delay_us(delay):
+    pass
@@ -0,0 +1,17 @@
+'''Host stand-in for the MicroPython `micropython` module.'''
+
+
+def const(value):
+    return value
+
+
+def native(func):
+    return func
+
+
+def viper(func):
+    return func
+
+
+def opt_level(level=None):
+    return 0
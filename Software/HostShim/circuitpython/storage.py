@@ -0,0 +1,40 @@
+'''
+Host stand-in for CircuitPython's `storage` module.
+
+`ROOT` is the host directory standing in for the CIRCUITPY drive; use
+`host_path()` to map absolute device paths onto it.
+'''
+
+import os
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '../../../Firmware'))
+
+
+def host_path(path: str) -> str:
+    if path.startswith('/'):
+        return os.path.join(ROOT, path[1:])
+    return path
+
+
+class _Mount:
+    label = 'CIRCUITPY'
+    readonly = True
+
+
+_mount = _Mount()
+
+
+def getmount(path):
+    return _mount
+
+
+def remount(path, readonly=False, *, disable_concurrent_write_protection=False):
+    _mount.readonly = readonly
+
+
+def disable_usb_drive():
+    pass
+
+
+def enable_usb_drive():
+    pass
@@ -0,0 +1,74 @@
+'''
+Host stand-in for CircuitPython's `supervisor` module.
+
+Time is driven by `clock`, which only moves when the host tells it to (or
+follows the host's wall clock when `clock.realtime` is set), so firmware runs
+are reproducible.
+'''
+
+from time import perf_counter_ns
+
+import usb_cdc
+
+_TICKS_PERIOD = 1 << 29
+
+
+class HostClock:
+    def __init__(self):
+        self.realtime = False
+        self._ns = 0
+        self._origin = perf_counter_ns()
+
+    def reset(self, ms=0):
+        self.realtime = False
+        self._ns = ms * 1_000_000
+        self._origin = perf_counter_ns()
+
+    def now_ns(self) -> int:
+        if self.realtime:
+            return self._ns + perf_counter_ns() - self._origin
+        return self._ns
+
+    def now_ms(self) -> int:
+        return self.now_ns() // 1_000_000
+
+    def advance(self, ms: float) -> None:
+        self._ns += int(ms * 1_000_000)
+
+    def advance_ns(self, ns: int) -> None:
+        self._ns += ns
+
+
+clock = HostClock()
+
+
+def ticks_ms() -> int:
+    return clock.now_ms() % _TICKS_PERIOD
+
+
+class _Runtime:
+    usb_connected = True
+    serial_connected = True
+    autoreload = True
+
+    @property
+    def serial_bytes_available(self) -> int:
+        return usb_cdc.console.in_waiting if usb_cdc.console else 0
+
+
+runtime = _Runtime()
+
+reload_requested = False
+
+
+def reload() -> None:
+    global reload_requested
+    reload_requested = True
+
+
+def set_next_code_file(filename, **kwargs) -> None:
+    pass
+
+
+def disable_autoreload() -> None:
+    runtime.autoreload = False
@@ -0,0 +1,46 @@
+'''
+Host stand-in for CircuitPython's `terminalio` module.
+
+`FONT` has the built-in font's 6x12 cell and a glyph for every printable
+ASCII character. The glyph shapes are made up, but every character has its
+own, so changing text changes pixels.
+'''
+
+from collections import namedtuple
+
+import displayio
+
+Glyph = namedtuple(
+    'Glyph',
+    ('bitmap', 'tile_index', 'width', 'height', 'dx', 'dy', 'shift_x', 'shift_y'),
+)
+
+_WIDTH = 6
+_HEIGHT = 12
+_FIRST = 0x20
+_LAST = 0x7E
+
+
+class _BuiltinFont:
+    def __init__(self):
+        count = _LAST - _FIRST + 1
+        self.bitmap = displayio.Bitmap(_WIDTH * count, _HEIGHT, 2)
+        for idx in range(1, count):
+            pattern = ((idx + _FIRST) * 2654435761) & 0xFFFFFFFF
+            # 4x8 pixels, one column of margin left and right, 2 rows on top
+            for bit in range(32):
+                if pattern >> bit & 1:
+                    self.bitmap[idx * _WIDTH + 1 + bit % 4, 2 + bit // 4] = 1
+
+    def get_bounding_box(self):
+        return (_WIDTH, _HEIGHT)
+
+    def get_glyph(self, codepoint):
+        if not _FIRST <= codepoint <= _LAST:
+            return None
+        return Glyph(
+            self.bitmap, codepoint - _FIRST, _WIDTH, _HEIGHT, 0, 0, _WIDTH, 0
+        )
+
+
+FONT = _BuiltinFont()
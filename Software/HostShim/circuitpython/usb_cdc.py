@@ -0,0 +1,64 @@
+'''
+Host stand-in for CircuitPython's `usb_cdc` module.
+
+`console.feed()` queues bytes as if the host PC had written them to the serial
+port; everything the firmware writes is collected in `console.tx`.
+'''
+
+
+class Serial:
+    def __init__(self):
+        self.connected = False
+        self.out_waiting = 0
+        self.timeout = None
+        self.write_timeout = None
+        self.rx = bytearray()
+        self.tx = bytearray()
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.rx)
+
+    def feed(self, data) -> None:
+        if isinstance(data, str):
+            data = data.encode()
+        self.rx.extend(data)
+
+    def read(self, size=1) -> bytes:
+        data = bytes(self.rx[:size])
+        del self.rx[:size]
+        return data
+
+    def readinto(self, buf) -> int:
+        size = min(len(buf), len(self.rx))
+        buf[:size] = self.rx[:size]
+        del self.rx[:size]
+        return size
+
+    def readline(self, size=-1) -> bytes:
+        end = self.rx.find(b'\n')
+        end = len(self.rx) if end < 0 else end + 1
+        if 0 <= size < end:
+            end = size
+        return self.read(end)
+
+    def write(self, data) -> int:
+        self.tx.extend(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def reset_input_buffer(self) -> None:
+        self.rx.clear()
+
+    def reset_output_buffer(self) -> None:
+        self.tx.clear()
+
+
+console = Serial()
+data = None
+
+
+def enable(*, console=True, data=False) -> None:
+    globals()['data'] = Serial() if data else None
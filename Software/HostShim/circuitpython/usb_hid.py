@@ -0,0 +1,83 @@
+'''
+Host stand-in for CircuitPython's `usb_hid` module.
+
+Every report the firmware sends is captured in `Device.reports` together with
+the simulated tick and the host clock, so latency can be measured.
+'''
+
+from collections import namedtuple
+from time import perf_counter_ns
+
+from supervisor import ticks_ms
+
+SentReport = namedtuple('SentReport', ('ticks', 'ns', 'report'))
+
+
+class Device:
+    def __init__(
+        self,
+        *,
+        report_descriptor=b'',
+        usage_page,
+        usage,
+        report_ids=(0,),
+        in_report_lengths=(0,),
+        out_report_lengths=(0,),
+    ):
+        self.report_descriptor = report_descriptor
+        self.usage_page = usage_page
+        self.usage = usage
+        self.report_ids = report_ids
+        self.in_report_lengths = in_report_lengths
+        self.out_report_lengths = out_report_lengths
+        self.reports = []
+        self.last_received_report = None
+
+    def send_report(self, report, report_id=None):
+        length = self.in_report_lengths[0]
+        if len(report) != length:
+            raise ValueError(f'Buffer incorrect size. Should be {length} bytes.')
+        self.reports.append(SentReport(ticks_ms(), perf_counter_ns(), bytes(report)))
+
+    def get_last_received_report(self, report_id=None):
+        return self.last_received_report
+
+    def __repr__(self):
+        return f'<Device usage_page={self.usage_page:#x} usage={self.usage:#x}>'
+
+
+Device.KEYBOARD = Device(
+    usage_page=0x01,
+    usage=0x06,
+    report_ids=(1,),
+    in_report_lengths=(8,),
+    out_report_lengths=(1,),
+)
+Device.MOUSE = Device(
+    usage_page=0x01,
+    usage=0x02,
+    report_ids=(2,),
+    in_report_lengths=(4,),
+)
+Device.CONSUMER_CONTROL = Device(
+    usage_page=0x0C,
+    usage=0x01,
+    report_ids=(3,),
+    in_report_lengths=(2,),
+)
+
+devices = (Device.KEYBOARD, Device.MOUSE, Device.CONSUMER_CONTROL)
+
+
+def enable(requested_devices, boot_device=0):
+    global devices
+    devices = tuple(requested_devices)
+
+
+def disable():
+    global devices
+    devices = ()
+
+
+def get_boot_device():
+    return 0
@@ -0,0 +1,155 @@
+'''
+Generate Firmware/comms/keytable.py, the sorted key name table that
+comms/keylookup.py resolves names with.
+
+Every string constant in kmk/keys.py is offered to `KEY_GENERATORS` to find
+the names they accept, aliases included, and each name is then looked up in
+an empty `KC` to record the first generator that makes it; keys that
+main.py's modules and extensions register with `make_key` are picked up by
+booting main.py on the shim. With `--mpy`, the table is also compiled with
+mpy-cross so it can be copied to the board as bytecode instead of source.
+
+    python gen_keytable.py [--mpy]
+'''
+
+import argparse
+import ast
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import host
+
+OUTPUT = os.path.join(host.FIRMWARE, 'comms', 'keytable.py')
+FROM_KC = 0xFF
+PER_LINE = 8
+
+HEADER = '''\
+"""
+Sorted KMK key names for comms/keylookup.py.
+
+Generated by Software/HostShim/gen_keytable.py, do not edit. Freeze it into
+the firmware or compile it with mpy-cross so the tables stay in flash.
+"""
+
+# len(kmk.keys.KEY_GENERATORS) when this was generated
+GENERATOR_COUNT = {count}
+
+NAMES = (
+{names}
+)  # fmt: skip
+
+# Index into KEY_GENERATORS of the function making each key, 0xFF for keys
+# registered by modules and extensions
+GENERATORS = (
+{generators}
+)  # fmt: skip
+'''
+
+
+def candidates():
+    '''Every string constant in kmk/keys.py, plus single letters.'''
+    with open(os.path.join(host.FIRMWARE, 'kmk', 'keys.py')) as f:
+        tree = ast.parse(f.read())
+    names = {
+        node.value
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Constant) and isinstance(node.value, str)
+    }
+    names.update('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz')
+    return names
+
+
+def collect():
+    '''Map each key name to the index of its generator, or FROM_KC.'''
+    with contextlib.redirect_stdout(io.StringIO()):
+        host.load_main()
+    from kmk.keys import KC, KEY_GENERATORS, Key
+
+    registered = {name for name in KC if isinstance(KC.get_cached(name), Key)}
+
+    # Aliases made along with a candidate, like the N0-N9 spelled by
+    # f-strings, are names too. The table being regenerated mustn't decide
+    # which generator runs.
+    KC.set_generator_index(None)
+    names = candidates() | registered
+    for name in sorted(names):
+        KC.clear()
+        for generator in KEY_GENERATORS:
+            if generator(name):
+                break
+        names.update(KC)
+
+    # Every name is looked up in an empty KC the way KeyAttrDict does it,
+    # trying the generators in order. Generators also accept substrings of
+    # their tables and register aliases along with a name, so what counts
+    # is whether the name itself is cached afterwards.
+    table = {}
+    for name in sorted(names):
+        KC.clear()
+        for idx, generator in enumerate(KEY_GENERATORS):
+            generator(name)
+            if KC.get_cached(name) is not None:
+                table[name] = idx
+                break
+        if name not in table and name in registered:
+            table[name] = FROM_KC
+    check(table)
+    return table, len(KEY_GENERATORS)
+
+
+def check(table):
+    '''Every generator in the table makes its name on its own.'''
+    from kmk.keys import KC, KEY_GENERATORS
+
+    for name, idx in table.items():
+        if idx == FROM_KC:
+            continue
+        KC.clear()
+        KEY_GENERATORS[idx](name)
+        if KC.get_cached(name) is None:
+            raise RuntimeError(f'generator {idx} does not make {name!r}')
+    KC.clear()
+
+
+def render(table, count):
+    names = sorted(table)
+    name_lines = []
+    generator_lines = []
+    for start in range(0, len(names), PER_LINE):
+        chunk = names[start : start + PER_LINE]
+        name_lines.append('    ' + ' '.join(json.dumps(n) + ',' for n in chunk))
+        generator_lines.append(
+            '    ' + ' '.join('0x{:02x},'.format(table[n]) for n in chunk)
+        )
+    return HEADER.format(
+        count=count,
+        names='\n'.join(name_lines),
+        generators='\n'.join(generator_lines),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--mpy', action='store_true', help='also run mpy-cross')
+    args = parser.parse_args()
+
+    host.install()
+    table, count = collect()
+    with open(OUTPUT, 'w') as f:
+        f.write(render(table, count))
+    print(f'{len(table)} names written to {OUTPUT}')
+
+    if args.mpy:
+        mpy_cross = shutil.which('mpy-cross')
+        if mpy_cross is None:
+            sys.exit('mpy-cross not found on PATH')
+        subprocess.run([mpy_cross, OUTPUT], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+'''
+Boot and drive the Kpad firmware on CPython.
+
+The modules in `circuitpython/` stand in for the CircuitPython natives the
+firmware imports (`supervisor`, `keypad`, `_asyncio`, `usb_hid`, ...). Time is
+simulated: `supervisor.ticks_ms`, `time.monotonic` and `time.sleep` all follow
+`supervisor.clock`, which only moves when the harness advances it, so a run is
+reproducible while host-side cost is still measured with `perf_counter_ns`.
+Absolute paths on the CIRCUITPY drive, like `/display/bmp/...`, open the
+files under Firmware/.
+
+    import host
+
+    host.install()
+    keyboard = host.boot_kpad()
+    host.tap(keyboard, 0)
+    print(host.reports())
+'''
+
+import builtins
+import gc
+import io
+import os
+import runpy
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SHIM = os.path.join(HERE, 'circuitpython')
+FIRMWARE = os.path.normpath(os.path.join(HERE, '..', '..', 'Firmware'))
+
+# Heap size of the RP2040 port, used to report `gc.mem_free()`.
+HEAP_SIZE = 192 * 1024
+
+# Firmware packages and modules that must be re-imported for a clean boot.
+_FIRMWARE_MODULES = ('kmk', 'display', 'macroPad', 'comms', 'config')
+
+_installed = False
+
+
+class _ConsoleStdin(io.TextIOBase):
+    '''`sys.stdin` as seen by code.py: reads from the shim's USB console.'''
+
+    def __init__(self, console):
+        self._console = console
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._console.in_waiting
+        return self._console.read(size).decode()
+
+    def readline(self, size=-1):
+        return self._console.readline(size).decode()
+
+
+_host_open = builtins.open
+
+
+def _device_open(file, *args, **kwargs):
+    '''`open()` that finds absolute CIRCUITPY paths under Firmware/.'''
+    if isinstance(file, str) and file.startswith('/') and not os.path.exists(file):
+        import storage
+
+        file = storage.host_path(file)
+    return _host_open(file, *args, **kwargs)
+
+
+def install() -> None:
+    '''Put the shim and the firmware on `sys.path` and bind time to the clock.'''
+    global _installed
+    if _installed:
+        return
+
+    sys.path[:0] = [SHIM, FIRMWARE]
+
+    import supervisor
+    import usb_cdc
+
+    clock = supervisor.clock
+    time.monotonic = lambda: clock.now_ns() / 1e9
+    time.monotonic_ns = clock.now_ns
+    time.sleep = lambda seconds: clock.advance(seconds * 1000)
+    sys.stdin = _ConsoleStdin(usb_cdc.console)
+    builtins.open = _device_open
+
+    gc.mem_alloc = lambda: tracemalloc.get_traced_memory()[0]
+    gc.mem_free = lambda: HEAP_SIZE - gc.mem_alloc()
+
+    # Where main.py keeps its keymap (see Firmware/config/store.py): survives
+    # `reset()` like flash survives a power cycle, but not the process.
+    os.environ.setdefault(
+        'MACROPAD_KEYMAP_PATH',
+        os.path.join(tempfile.mkdtemp(prefix='macropad-'), 'keymap.bin'),
+    )
+
+    _installed = True
+
+
+def reset() -> None:
+    '''Forget every firmware module and all shim state, like a power cycle.'''
+    install()
+
+    for name in list(sys.modules):
+        if name.split('.')[0] in _FIRMWARE_MODULES:
+            del sys.modules[name]
+
+    import supervisor
+    import usb_cdc
+    import usb_hid
+
+    supervisor.clock.reset()
+    supervisor.reload_requested = False
+    usb_cdc.console.reset_input_buffer()
+    usb_cdc.console.reset_output_buffer()
+    usb_hid.devices = (
+        usb_hid.Device.KEYBOARD,
+        usb_hid.Device.MOUSE,
+        usb_hid.Device.CONSUMER_CONTROL,
+    )
+    for device in usb_hid.devices:
+        device.reports.clear()
+
+
+def start(keyboard, **go_args):
+    '''Run `KMKKeyboard.go()`'s initialisation without entering the loop.'''
+    keyboard._init(**go_args)
+    # USB HID is set up by a periodic task; run the first loop so that the
+    # report devices are bound before the harness starts pressing keys.
+    keyboard._main_loop()
+    return keyboard
+
+
+def boot_kpad(oled=False, layer_names=None, keymap=None, modules=(), **go_args):
+    '''Fresh `Kpad` from macroPad.py, booted and ready for `run()`.'''
+    reset()
+
+    import busio
+
+    import board
+    from kmk.keys import KC
+    from macroPad import Kpad
+
+    i2c = busio.I2C(scl=board.SCL, sda=board.SDA, frequency=400000)
+    keyboard = Kpad(i2c, layer_names or ['temp'], oled)
+    keyboard.modules.extend(modules)
+    keyboard.keymap = keymap or [
+        [
+            KC.A, KC.B, KC.C,
+            KC.D, KC.E, KC.F,
+            KC.G, KC.H, KC.I,
+            KC.J, KC.K, KC.L,
+        ]
+    ]  # fmt: skip
+    return start(keyboard, **go_args)
+
+
+def load_main(**go_args):
+    '''Execute Firmware/main.py up to `keyboard.go()` and boot its keyboard.
+
+    Returns the module namespace; `namespace['keyboard']` is booted.
+    '''
+    reset()
+    namespace = runpy.run_path(os.path.join(FIRMWARE, 'main.py'), run_name='code')
+    start(namespace['keyboard'], **go_args)
+    return namespace
+
+
+def run(keyboard, iterations=1, step_ms=1) -> None:
+    '''Run the main loop, advancing simulated time by `step_ms` per iteration.'''
+    import supervisor
+
+    clock = supervisor.clock
+    main_loop = keyboard._main_loop
+    for _ in range(iterations):
+        main_loop()
+        clock.advance(step_ms)
+
+
+def keypad(keyboard, key_number):
+    '''The shim scanner responsible for `key_number`, and its local number.'''
+    for matrix in keyboard.matrix:
+        if matrix.offset <= key_number < matrix.offset + matrix.key_count:
+            return matrix.keypad, key_number - matrix.offset
+    raise IndexError(key_number)
+
+
+def press(keyboard, key_number) -> None:
+    scanner, local = keypad(keyboard, key_number)
+    scanner.press(local)
+
+
+def release(keyboard, key_number) -> None:
+    scanner, local = keypad(keyboard, key_number)
+    scanner.release(local)
+
+
+def tap(keyboard, key_number, hold_ms=20, step_ms=1) -> None:
+    press(keyboard, key_number)
+    run(keyboard, max(1, hold_ms // step_ms), step_ms)
+    release(keyboard, key_number)
+    run(keyboard, max(1, hold_ms // step_ms), step_ms)
+
+
+def reports(device=None):
+    '''Reports captured on `device` (default: the keyboard) as hex strings.'''
+    import usb_hid
+
+    if device is None:
+        device = usb_hid.Device.KEYBOARD
+    return [r.report.hex() for r in device.reports]
+
+
+def serial_write(data) -> None:
+    '''Write to the firmware's USB console as the GUI would.'''
+    import usb_cdc
+
+    usb_cdc.console.feed(data)
+
+
+if __name__ == '__main__':
+    install()
+    kb = boot_kpad()
+    for key_number in range(kb.matrix[0].key_count):
+        tap(kb, key_number)
+    for report in reports():
+        print(report)